@@ -0,0 +1,83 @@
+"""
+Deferred, coalesced background work.
+
+`submit(items)` adds items to a pending set and returns immediately. One
+worker thread waits `delay_ms` (so a burst of submissions lands in the same
+pass), takes everything pending and runs `process(items)` once; it keeps
+looping while new items arrive. `flush()` blocks until nothing is pending or
+running (shutdown, tests, and callers that need the result on disk).
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Hashable, Iterable
+
+
+class CoalescingWorker:
+    def __init__(self, process: Callable[[list[Any]], Any], delay_ms: float = 500.0, name: str = "worker") -> None:
+        self.process = process
+        self.delay_seconds = max(0.0, float(delay_ms)) / 1000
+        self.name = name
+        self._pending: dict[Hashable, None] = {}
+        self._running = False
+        self._thread: threading.Thread | None = None
+        self._cond = threading.Condition()
+        self.counters = {"passes": 0, "items": 0, "failures": 0}
+
+    @property
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def submit(self, items: Iterable[Hashable]) -> None:
+        with self._cond:
+            before = len(self._pending)
+            self._pending.update(dict.fromkeys(items))
+            if len(self._pending) == before:
+                return
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name=f"{self.name}-worker", daemon=True)
+                self._thread.start()
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until all submitted items are processed. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._running:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _loop(self) -> None:
+        while True:
+            time.sleep(self.delay_seconds)
+            with self._cond:
+                items = list(self._pending)
+                self._pending.clear()
+                if not items:
+                    self._thread = None
+                    self._cond.notify_all()
+                    return
+                self._running = True
+            try:
+                self.process(items)
+                failed = False
+            except Exception as exc:
+                print(f"[{self.name.upper()}] Background pass failed: {exc}")
+                failed = True
+            with self._cond:
+                self._running = False
+                self.counters["passes"] += 1
+                self.counters["items"] += len(items)
+                self.counters["failures"] += int(failed)
+                self._cond.notify_all()
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            out: dict[str, Any] = dict(self.counters)
+            out["pending"] = len(self._pending)
+        out["delay_ms"] = self.delay_seconds * 1000
+        return out
@@ -0,0 +1,127 @@
+"""
+Search embedding matrices persisted as `.npy` files next to the registry and
+memory-mapped at load time.
+
+`load_embedding_matrix(matrix, field, ids, vectors_dir)` takes the raw matrix
+streamed out of the registry (`RegistryStore.read_columns`) and rewrites the
+file only when the fingerprint (ids, shape, first and last column) no longer
+matches, so a restart on an unchanged library serves the matrix from the page
+cache. Rows whose vector is missing, has the wrong dimension or holds
+non-finite values are left as zeros (they score 0 against any query). The
+file is written under a lock, so server workers all map the same copy and the
+OS page cache holds it once.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from file_lock import file_lock
+
+MATRIX_FILENAMES = {
+    "image_embedding": "search_image_matrix.npy",
+    "text_embedding": "search_text_matrix.npy",
+}
+EMBEDDING_FIELDS = tuple(MATRIX_FILENAMES)
+
+
+def _vectors(records: list[dict[str, Any]], field: str) -> list[Any]:
+    return [rec.get(field) if isinstance(rec.get(field), list) else [] for rec in records]
+
+
+def matrix_fingerprint(matrix: np.ndarray, field: str, ids: list[str]) -> str:
+    """Cheap identity of a raw embedding matrix: ids, shape and the first/last column."""
+    digest = hashlib.sha1(f"{field}:{matrix.shape}".encode("utf-8"))
+    digest.update("\n".join(ids).encode("utf-8"))
+    if matrix.shape[1]:
+        digest.update(np.ascontiguousarray(matrix[:, 0]).tobytes())
+        digest.update(np.ascontiguousarray(matrix[:, -1]).tobytes())
+    return digest.hexdigest()
+
+
+def stack_vectors(records: list[dict[str, Any]], field: str, dim: int | None = None) -> np.ndarray:
+    """Raw float32 rows of `field`; `dim` defaults to the first non-empty vector's length.
+
+    Rows with the wrong length or non-numeric values are zero.
+    """
+    vectors = _vectors(records, field)
+    if dim is None:
+        dim = next((len(v) for v in vectors if v), 0)
+    if vectors and all(len(v) == dim for v in vectors):
+        try:
+            return np.array(vectors, dtype=np.float32).reshape(len(vectors), dim)
+        except (TypeError, ValueError):
+            pass
+    matrix = np.zeros((len(records), dim), dtype=np.float32)
+    for i, vec in enumerate(vectors):
+        if len(vec) == dim:
+            try:
+                matrix[i] = vec
+            except (TypeError, ValueError):
+                pass
+    return matrix
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Zero non-finite rows and L2-normalize the rest, in place."""
+    with np.errstate(invalid="ignore", over="ignore"):
+        matrix[~np.isfinite(matrix).all(axis=1)] = 0.0
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-8
+    return matrix
+
+
+def dense_matrix(records: list[dict[str, Any]], field: str, dim: int | None = None) -> np.ndarray:
+    """L2-normalized float32 rows of `field` (see `stack_vectors`)."""
+    return normalize_rows(stack_vectors(records, field, dim))
+
+
+def load_embedding_matrix(matrix: np.ndarray, field: str, ids: list[str], vectors_dir: Path | None = None) -> np.ndarray:
+    """Normalized form of the raw `matrix`, memory-mapped from its `.npy` file when `vectors_dir` is given.
+
+    `matrix` is normalized in place when the file has to be (re)written; when
+    the fingerprint matches, the caller can drop it and keep the mapping.
+    """
+    if vectors_dir is None:
+        return normalize_rows(matrix)
+    path = Path(vectors_dir) / MATRIX_FILENAMES[field]
+    fingerprint = matrix_fingerprint(matrix, field, ids)
+    mapped = _map_if_current(path, fingerprint, matrix.shape)
+    if mapped is not None:
+        return mapped
+
+    matrix = normalize_rows(matrix)
+    try:
+        # Server workers reloading together write the file once and all map that copy.
+        with file_lock(path.with_suffix(".lock")):
+            mapped = _map_if_current(path, fingerprint, matrix.shape)
+            if mapped is not None:
+                return mapped
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp.npy")
+            np.save(tmp, matrix)
+            # The old fingerprint goes first so no reader matches it against the new file.
+            path.with_suffix(".fingerprint").unlink(missing_ok=True)
+            os.replace(tmp, path)
+            path.with_suffix(".fingerprint").write_text(fingerprint, encoding="utf-8")
+            print(f"[INDEX] Wrote {path.name} ({matrix.shape[0]}x{matrix.shape[1]})")
+            return np.load(path, mmap_mode="r")
+    except (OSError, TimeoutError) as exc:
+        print(f"[INDEX] Could not persist {path.name} ({exc}); keeping it in memory.")
+        return matrix
+
+
+def _map_if_current(path: Path, fingerprint: str, shape: tuple[int, ...]) -> np.ndarray | None:
+    try:
+        if path.with_suffix(".fingerprint").read_text(encoding="utf-8") != fingerprint:
+            return None
+        mapped = np.load(path, mmap_mode="r")
+        if mapped.shape == shape:
+            return mapped
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as exc:
+        print(f"[INDEX] Could not map {path.name} ({exc}); rebuilding.")
+    return None
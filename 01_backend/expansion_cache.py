@@ -0,0 +1,158 @@
+"""
+Query expansion cache: bounded LRU + TTL, persisted to disk, single-flight.
+
+`get_or_compute(key, fallback, compute)` returns a cached expansion, or runs
+`compute` on a worker thread and waits at most `budget_seconds` for it. When
+the budget runs out the caller gets `fallback` (the raw query) right away; the
+call keeps running and its result still lands in the cache for the next
+request. Concurrent misses for the same key share one call.
+
+Writes are debounced: `put` only schedules a save, and one CoalescingWorker
+thread rewrites the file at most once per `save_delay_ms`, from a copy taken
+under the lock at write time. A single writer means an older copy can never
+replace a newer one; `flush()` waits for the pending write (exit, tests).
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from pathlib import Path
+from typing import Any, Callable
+
+from coalescing_worker import CoalescingWorker
+
+LATENCY_WINDOW = 1024
+
+
+class ExpansionCache:
+    def __init__(
+        self,
+        path: Path | None,
+        max_entries: int = 4096,
+        ttl_seconds: float = 7 * 24 * 3600,
+        budget_seconds: float = 1.5,
+        workers: int = 4,
+        save_delay_ms: float = 1000.0,
+    ) -> None:
+        self.path = Path(path) if path is not None else None
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self.budget_seconds = float(budget_seconds)
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._inflight: dict[str, Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="expand")
+        self._latencies_ms: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.counters = {"hits": 0, "misses": 0, "coalesced": 0, "timeouts": 0, "errors": 0, "evictions": 0}
+        self._writer = CoalescingWorker(lambda _: self._save(), save_delay_ms, name="expansion")
+        self._load()
+        if self.path is not None:
+            atexit.register(self.flush, 5.0)
+
+    def _load(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as exc:
+            print(f"[BACKEND] Ignoring unreadable expansion cache {self.path.name}: {exc}")
+            return
+        now = time.time()
+        for key, (value, expires_at) in data.items():
+            if expires_at > now:
+                self._entries[key] = (value, expires_at)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _save(self) -> None:
+        # Runs on the writer thread only.
+        with self._lock:
+            payload = json.dumps({key: [value, expires_at] for key, (value, expires_at) in self._entries.items()})
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.replace(tmp, self.path)
+        except OSError as exc:
+            print(f"[BACKEND] Could not persist expansion cache: {exc}")
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until scheduled writes are on disk. Returns False on timeout."""
+        return self._writer.flush(timeout)
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.time() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters["evictions"] += 1
+        if self.path is not None:
+            self._writer.submit(("save",))
+
+    def _run(self, key: str, compute: Callable[[], str]) -> str:
+        start = time.perf_counter()
+        try:
+            value = compute()
+            self.put(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._latencies_ms.append((time.perf_counter() - start) * 1000)
+                self._inflight.pop(key, None)
+
+    def get_or_compute(self, key: str, fallback: str, compute: Callable[[], str]) -> tuple[str, str]:
+        """(value, status) with status one of hit, miss, coalesced, timeout, error."""
+        cached = self.get(key)
+        with self._lock:
+            if cached is not None:
+                self.counters["hits"] += 1
+                return cached, "hit"
+            future = self._inflight.get(key)
+            status = "coalesced" if future is not None else "miss"
+            if future is None:
+                future = self._inflight[key] = self._executor.submit(self._run, key, compute)
+            self.counters["misses" if status == "miss" else status] += 1
+        try:
+            return future.result(timeout=self.budget_seconds), status
+        except FutureTimeout:
+            with self._lock:
+                self.counters["timeouts"] += 1
+            return fallback, "timeout"
+        except Exception:
+            with self._lock:
+                self.counters["errors"] += 1
+            return fallback, "error"
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self._latencies_ms)
+            out: dict[str, Any] = dict(self.counters, entries=len(self._entries), inflight=len(self._inflight))
+        out["writes"] = self._writer.stats()["passes"]
+        if latencies:
+            out["expansion_ms"] = {
+                "count": len(latencies),
+                "p50": round(latencies[len(latencies) // 2], 1),
+                "p99": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 1),
+                "max": round(latencies[-1], 1),
+            }
+        return out
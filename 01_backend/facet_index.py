@@ -0,0 +1,147 @@
+"""
+Facet row sets for search filter pushdown.
+
+Every row gets an integer value code per field in FACET_FIELDS. Rows are kept
+grouped by code in CSR form (stable argsort + offsets), so the rows carrying
+one value are a single sorted slice. `rows_for(filters)` returns the sorted
+rows matching every filtered field (values within a field are OR-ed) in time
+proportional to the matching rows, not the library size. Codes follow
+append/delete; the grouping is rebuilt lazily on the next lookup.
+
+Values are indexed as the graph UI shows them (`display_value`, shared with
+Step13's `build_node`), so a filter built from a displayed value such as
+"Uncategorized" matches the records it was shown for.
+"""
+from __future__ import annotations
+
+from typing import Any, Iterable
+
+import numpy as np
+
+FACET_FIELDS = ("final_category", "lod_label", "provider", "family_name")
+
+Filters = dict[str, list[str]]
+# Shown for a missing key (an explicit null stays null, as in the graph nodes).
+DISPLAY_DEFAULTS = {"family_name": "Generic Family", "provider": "Unknown"}
+
+
+def lod_label(rec: dict[str, Any]) -> str:
+    """The record's `lod_label`, or one derived from its numeric LOD."""
+    label = rec.get("lod_label")
+    if label:
+        return label
+    lod_num = rec.get("lod") or rec.get("level_of_detail")
+    if not lod_num:
+        return "Unknown"
+    try:
+        val = int(lod_num)
+    except (ValueError, TypeError):
+        return str(lod_num)
+    if val <= 100:
+        return "Low"
+    if val <= 200:
+        return "Medium"
+    if val <= 300:
+        return "Medium-High"
+    if val <= 400:
+        return "High"
+    return "Very High"
+
+
+def display_value(rec: dict[str, Any], field: str) -> Any:
+    """`field` of `rec` as the graph nodes show it."""
+    if field == "lod_label":
+        return lod_label(rec)
+    if field == "final_category":
+        return rec.get("final_category") or "Uncategorized"
+    return rec.get(field, DISPLAY_DEFAULTS.get(field))
+
+
+def facet_value(rec: dict[str, Any], field: str) -> str:
+    value = display_value(rec, field)
+    return "" if value is None else str(value)
+
+
+def filters_key(filters: Filters | None) -> tuple:
+    """Hashable, order-independent form of `filters` (for cache keys and batching)."""
+    return tuple(sorted((field, tuple(sorted(values))) for field, values in (filters or {}).items()))
+
+
+def contains(sorted_rows: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """Boolean mask: which of `rows` occur in the sorted array `sorted_rows`."""
+    if not len(sorted_rows):
+        return np.zeros(len(rows), dtype=bool)
+    pos = np.minimum(np.searchsorted(sorted_rows, rows), len(sorted_rows) - 1)
+    return sorted_rows[pos] == rows
+
+
+class _Facet:
+    def __init__(self) -> None:
+        self.values: dict[str, int] = {}
+        self.codes = np.zeros(0, dtype=np.int32)
+        self._groups: tuple[np.ndarray, np.ndarray] | None = None
+
+    def copy(self) -> "_Facet":
+        clone = _Facet()
+        clone.values, clone.codes, clone._groups = dict(self.values), self.codes, self._groups
+        return clone
+
+    def add(self, values: list[str]) -> None:
+        codes = [self.values.setdefault(value, len(self.values)) for value in values]
+        self.codes = np.concatenate([self.codes, np.array(codes, dtype=np.int32)])
+        self._groups = None
+
+    def remove(self, rows: int | np.ndarray) -> None:
+        self.codes = np.delete(self.codes, rows)
+        self._groups = None
+
+    def rows(self, values: Iterable[str]) -> np.ndarray:
+        groups = self._groups
+        if groups is None:
+            offsets = np.zeros(len(self.values) + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum(np.bincount(self.codes, minlength=len(self.values)))
+            groups = self._groups = (np.argsort(self.codes, kind="stable").astype(np.int64), offsets)
+        order, offsets = groups
+        spans = [order[offsets[code]:offsets[code + 1]] for code in (self.values.get(v) for v in set(values)) if code is not None]
+        if not spans:
+            return np.zeros(0, dtype=np.int64)
+        return spans[0] if len(spans) == 1 else np.sort(np.concatenate(spans))
+
+
+class FacetIndex:
+    def __init__(self, records: Iterable[dict[str, Any]] = ()) -> None:
+        self.facets = {field: _Facet() for field in FACET_FIELDS}
+        self.count = 0
+        self.add(list(records))
+
+    def copy(self) -> "FacetIndex":
+        """Index to mutate for a new snapshot (value maps copied, code arrays shared)."""
+        clone = FacetIndex()
+        clone.facets = {field: facet.copy() for field, facet in self.facets.items()}
+        clone.count = self.count
+        return clone
+
+    def add(self, records: list[dict[str, Any]]) -> None:
+        """Index `records` as rows count, count + 1, ... (appended after existing rows)."""
+        for field, facet in self.facets.items():
+            facet.add([facet_value(rec, field) for rec in records])
+        self.count += len(records)
+
+    def remove(self, rows: int | np.ndarray) -> None:
+        """Drop `rows` and shift later rows down (mirrors np.delete on the embedding matrix)."""
+        rows = np.unique(np.atleast_1d(np.asarray(rows, dtype=np.int64)))
+        for facet in self.facets.values():
+            facet.remove(rows)
+        self.count -= len(rows)
+
+    def rows_for(self, filters: Filters | None) -> np.ndarray | None:
+        """Sorted rows matching all `filters`, or None when there is nothing to filter on."""
+        if not filters:
+            return None
+        spans = sorted((self.facets[field].rows(values) for field, values in filters.items()), key=len)
+        rows = spans[0]
+        for other in spans[1:]:
+            if not len(rows):
+                break
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        return rows
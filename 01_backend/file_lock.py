@@ -0,0 +1,144 @@
+"""
+Cross-process lock files for writers sharing `00_data/vectors/`.
+
+With several server workers, two processes can rebuild the same `.npy`
+matrix or rewrite `graph_data.json` at once. `file_lock(path)` serializes
+them with an O_CREAT | O_EXCL lock file (portable, no fcntl), waiting instead
+of skipping. The file holds "pid host token"; the holder refreshes its mtime
+every `stale_seconds / 4`, so a lock is only broken when its pid is gone on
+this host or its heartbeat stopped for `stale_seconds` (crash, other host).
+Breaking and releasing first rename the file to a unique name and check the
+token, so a waiter never removes a lock that someone else just created.
+"""
+from __future__ import annotations
+
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+STALE_LOCK_SECONDS = 600
+POLL_SECONDS = 0.05
+HOST = socket.gethostname()
+
+
+def pid_alive(pid: int) -> bool:
+    if pid <= 0:
+        return False
+    if pid == os.getpid():
+        return True
+    if sys.platform == "win32":
+        import ctypes
+
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return ctypes.get_last_error() == 5  # ERROR_ACCESS_DENIED: exists, owned by someone else
+        try:
+            code = ctypes.c_ulong()
+            return not kernel32.GetExitCodeProcess(handle, ctypes.byref(code)) or code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _read_owner(path: Path) -> str:
+    try:
+        return path.read_text(encoding="utf-8")
+    except (OSError, UnicodeDecodeError):
+        return ""
+
+
+def _is_stale(path: Path, owner: str, stale_seconds: float) -> bool:
+    try:
+        if time.time() - path.stat().st_mtime > stale_seconds:
+            return True
+    except FileNotFoundError:
+        return False
+    parts = owner.split()
+    # An empty owner is a lock whose creator has not written it yet.
+    return len(parts) == 3 and parts[1] == HOST and parts[0].isdigit() and not pid_alive(int(parts[0]))
+
+
+def _remove_if_owner(path: Path, owner: str) -> bool:
+    """Atomically take `path` aside and delete it if it still holds `owner`; put it back otherwise."""
+    aside = path.with_name(f"{path.name}.{uuid.uuid4().hex}.break")
+    for _ in range(40):
+        try:
+            os.rename(path, aside)
+            break
+        except FileNotFoundError:
+            return False
+        except PermissionError:
+            # Windows refuses to rename a file another process is reading right now.
+            time.sleep(POLL_SECONDS)
+    else:
+        return False
+    if _read_owner(aside) == owner:
+        aside.unlink(missing_ok=True)
+        return True
+    # Someone else's fresh lock: restore it unless yet another one appeared meanwhile.
+    try:
+        os.link(aside, path)
+    except OSError:
+        pass
+    aside.unlink(missing_ok=True)
+    return False
+
+
+@contextmanager
+def file_lock(
+    path: Path, timeout: float = 120.0, stale_seconds: float = STALE_LOCK_SECONDS, blocking: bool = True
+) -> Iterator[bool]:
+    """Hold `path` as an exclusive lock file.
+
+    Blocking mode raises TimeoutError after `timeout` seconds. With
+    `blocking=False` it tries once and yields False when the lock is held.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    owner = f"{os.getpid()} {HOST} {uuid.uuid4().hex}"
+    deadline = time.monotonic() + (timeout if blocking else 0.0)
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            held_by = _read_owner(path)
+            if _is_stale(path, held_by, stale_seconds) and _remove_if_owner(path, held_by):
+                print(f"[LOCK] Broke stale {path.name} held by {held_by or '(no owner)'}")
+                continue
+            if time.monotonic() >= deadline:
+                if not blocking:
+                    yield False
+                    return
+                raise TimeoutError(f"{path.name} is held by another process")
+            time.sleep(POLL_SECONDS)
+    stop = threading.Event()
+
+    def heartbeat() -> None:
+        while not stop.wait(max(1.0, stale_seconds / 4)):
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+
+    try:
+        os.write(fd, owner.encode("utf-8"))
+        os.close(fd)
+        threading.Thread(target=heartbeat, name=f"{path.name}-heartbeat", daemon=True).start()
+        yield True
+    finally:
+        stop.set()
+        _remove_if_owner(path, owner)
@@ -0,0 +1,145 @@
+"""
+Compact columnar binary graph payload.
+
+Layout of `graph_columns.bin` (little-endian):
+
+    b"LODG" | uint32 version | uint32 header_len | header JSON (padded to 8 bytes) | column data
+
+Every column is 8-byte aligned so the frontend can view it as a typed array
+without copying. Columns:
+- `x`, `y`: float32 coordinates
+- `neighbor_offsets` (int32, count + 1) + `neighbors` (int32): CSR neighbor lists
+- `id_offsets` (int32, count + 1) + `id_bytes` (uint8): UTF-8 node ids
+- `final_category`, `lod_label`, `provider`: dictionary-encoded codes (uint16/uint32)
+  with the dictionary stored in the header
+
+Display-only fields go to `graph_metadata.json` (one entry per node, aligned
+with node order) so first paint does not wait on them. Both files are written
+with precompressed `.gz` (and `.br` when `brotli` is installed) siblings.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import struct
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MAGIC = b"LODG"
+VERSION = 1
+ALIGN = 8
+BINARY_FILENAME = "graph_columns.bin"
+METADATA_FILENAME = "graph_metadata.json"
+CATEGORICAL_COLUMNS = ("final_category", "lod_label", "provider")
+METADATA_FIELDS = (
+    "name",
+    "family_name",
+    "img",
+    "full_description",
+    "confidence_level",
+    "original_file",
+    "file_size_kb",
+    "possible_categories",
+    "category_candidates",
+)
+
+
+def _pad(n: int) -> int:
+    return (ALIGN - n % ALIGN) % ALIGN
+
+
+def _csr(lists: list[list[int]]) -> tuple[np.ndarray, np.ndarray]:
+    offsets = np.zeros(len(lists) + 1, dtype=np.int32)
+    offsets[1:] = np.cumsum([len(lst) for lst in lists], dtype=np.int64)
+    flat = np.fromiter((j for lst in lists for j in lst), dtype=np.int32, count=int(offsets[-1]))
+    return offsets, flat
+
+
+def _dictionary_encode(values: list[Any]) -> tuple[np.ndarray, list[str]]:
+    dictionary: dict[str, int] = {}
+    codes = [dictionary.setdefault(str(v) if v is not None else "", len(dictionary)) for v in values]
+    dtype = np.uint16 if len(dictionary) <= np.iinfo(np.uint16).max else np.uint32
+    return np.asarray(codes, dtype=dtype), list(dictionary)
+
+
+def encode_graph_columns(nodes: list[dict[str, Any]], meta: dict[str, Any] | None = None) -> bytes:
+    arrays: dict[str, np.ndarray] = {
+        "x": np.asarray([n.get("x", 0.0) for n in nodes], dtype=np.float32),
+        "y": np.asarray([n.get("y", 0.0) for n in nodes], dtype=np.float32),
+    }
+    neighbor_lists = [[j for j in n.get("neighbors") or [] if isinstance(j, int)] for n in nodes]
+    arrays["neighbor_offsets"], arrays["neighbors"] = _csr(neighbor_lists)
+
+    id_bytes = [str(n.get("id", "")).encode("utf-8") for n in nodes]
+    arrays["id_offsets"] = np.zeros(len(nodes) + 1, dtype=np.int32)
+    arrays["id_offsets"][1:] = np.cumsum([len(b) for b in id_bytes], dtype=np.int64)
+    arrays["id_bytes"] = np.frombuffer(b"".join(id_bytes), dtype=np.uint8)
+
+    dictionaries: dict[str, list[str]] = {}
+    for name in CATEGORICAL_COLUMNS:
+        arrays[name], dictionaries[name] = _dictionary_encode([n.get(name) for n in nodes])
+
+    columns: dict[str, dict[str, Any]] = {}
+    offset = 0
+    for name, arr in arrays.items():
+        columns[name] = {"dtype": arr.dtype.name, "offset": offset, "length": int(arr.size)}
+        if name in dictionaries:
+            columns[name]["dictionary"] = dictionaries[name]
+        offset += arr.nbytes + _pad(arr.nbytes)
+
+    header = json.dumps({"count": len(nodes), "meta": meta or {}, "columns": columns}).encode("utf-8")
+    header += b" " * _pad(len(MAGIC) + 8 + len(header))
+
+    parts = [MAGIC, struct.pack("<II", VERSION, len(header)), header]
+    for arr in arrays.values():
+        raw = arr.astype(arr.dtype.newbyteorder("<"), copy=False).tobytes()
+        parts.append(raw)
+        parts.append(b"\0" * _pad(len(raw)))
+    return b"".join(parts)
+
+
+def decode_graph_columns(payload: bytes) -> dict[str, Any]:
+    if payload[:4] != MAGIC:
+        raise ValueError("Not a LODG graph payload")
+    version, header_len = struct.unpack_from("<II", payload, 4)
+    if version != VERSION:
+        raise ValueError(f"Unsupported graph payload version {version}")
+    body_start = 12 + header_len
+    header = json.loads(payload[12:body_start].decode("utf-8"))
+    out: dict[str, Any] = {"count": header["count"], "meta": header.get("meta", {}), "columns": {}}
+    for name, col in header["columns"].items():
+        dtype = np.dtype(col["dtype"]).newbyteorder("<")
+        out["columns"][name] = np.frombuffer(payload, dtype=dtype, count=col["length"], offset=body_start + col["offset"])
+        if "dictionary" in col:
+            out.setdefault("dictionaries", {})[name] = col["dictionary"]
+    return out
+
+
+def _write_with_compressed(path: Path, data: bytes) -> None:
+    variants = [(path, data), (path.with_name(path.name + ".gz"), gzip.compress(data, compresslevel=9, mtime=0))]
+    br_path = path.with_name(path.name + ".br")
+    if brotli is not None:
+        variants.append((br_path, brotli.compress(data, quality=11)))
+    else:
+        br_path.unlink(missing_ok=True)
+    for target, blob in variants:
+        tmp = target.with_name(target.name + ".tmp")
+        tmp.write_bytes(blob)
+        os.replace(tmp, target)
+
+
+def write_graph_payload(nodes: list[dict[str, Any]], meta: dict[str, Any] | None, vectors_dir: Path) -> Path:
+    vectors_dir = Path(vectors_dir)
+    binary_path = vectors_dir / BINARY_FILENAME
+    _write_with_compressed(binary_path, encode_graph_columns(nodes, meta))
+    metadata = [{"id": n.get("id"), **{k: n.get(k) for k in METADATA_FIELDS}} for n in nodes]
+    _write_with_compressed(vectors_dir / METADATA_FILENAME, json.dumps(metadata).encode("utf-8"))
+    return binary_path
@@ -0,0 +1,107 @@
+"""
+Neighbor-list repair after graph nodes are deleted.
+
+Node neighbor lists are handled as CSR arrays (offsets + flat node indices).
+`remap_neighbors` renumbers them for the surviving nodes in one vectorized
+pass: deleted targets, out-of-range entries, self references and duplicates
+are dropped and the original order is kept. `refill_neighbors` tops the lists
+that lost entries back up to k from an exact top-k over the embedding matrix,
+scoring only those rows, so the related-items panel stays complete without a
+graph prep rerun.
+"""
+from __future__ import annotations
+
+from itertools import chain
+from typing import Any
+
+import numpy as np
+
+REFILL_CHUNK = 256
+
+
+def neighbors_csr(nodes: list[dict[str, Any]]) -> tuple[np.ndarray, np.ndarray]:
+    """(offsets, flat) of every node's `neighbors`; entries that are not integers are dropped."""
+    lists = [node.get("neighbors") if isinstance(node.get("neighbors"), list) else [] for node in nodes]
+    counts = np.fromiter(map(len, lists), dtype=np.int64, count=len(lists))
+    try:
+        flat = np.fromiter(chain.from_iterable(lists), dtype=np.int64, count=int(counts.sum()))
+    except (TypeError, ValueError):
+        lists = [[v for v in lst if isinstance(v, int) and not isinstance(v, bool)] for lst in lists]
+        counts = np.fromiter(map(len, lists), dtype=np.int64, count=len(lists))
+        flat = np.fromiter(chain.from_iterable(lists), dtype=np.int64, count=int(counts.sum()))
+    offsets = np.zeros(len(nodes) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(counts)
+    return offsets, flat
+
+
+def _owners(offsets: np.ndarray) -> np.ndarray:
+    return np.repeat(np.arange(len(offsets) - 1, dtype=np.int64), np.diff(offsets))
+
+
+def remap_neighbors(offsets: np.ndarray, flat: np.ndarray, kept: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """CSR lists of the `kept` nodes (ascending old indices), renumbered to their new positions."""
+    n_old = len(offsets) - 1
+    new_index = np.full(n_old, -1, dtype=np.int64)
+    new_index[kept] = np.arange(len(kept), dtype=np.int64)
+    owner = new_index[_owners(offsets)]
+    in_range = (flat >= 0) & (flat < n_old)
+    target = np.where(in_range, new_index[np.where(in_range, flat, 0)], -1)
+    keep = (owner >= 0) & (target >= 0) & (target != owner)
+    owner, target = owner[keep], target[keep]
+    # First occurrence of each (owner, target) pair, in the original order.
+    _, first = np.unique(owner * max(len(kept), 1) + target, return_index=True)
+    first.sort()
+    owner, target = owner[first], target[first]
+    new_offsets = np.zeros(len(kept) + 1, dtype=np.int64)
+    new_offsets[1:] = np.cumsum(np.bincount(owner, minlength=len(kept)))
+    return new_offsets, target
+
+
+def refill_neighbors(
+    offsets: np.ndarray,
+    flat: np.ndarray,
+    nodes_to_fill: np.ndarray,
+    rows: np.ndarray,
+    matrix: np.ndarray,
+    k: int,
+    chunk: int = REFILL_CHUNK,
+) -> tuple[tuple[np.ndarray, np.ndarray], int]:
+    """Replace the lists of `nodes_to_fill` by their exact top-k graph nodes.
+
+    `rows[i]` is node i's row in `matrix` (L2-normalized embeddings), or -1
+    when it has none; such nodes are neither refilled nor returned as
+    neighbors. Returns the new CSR arrays and the number of refilled nodes.
+    """
+    has_row = rows >= 0
+    nodes_to_fill = nodes_to_fill[has_row[nodes_to_fill]]
+    if not len(nodes_to_fill) or k <= 0:
+        return (offsets, flat), 0
+    row_to_node = np.full(len(matrix), -1, dtype=np.int64)
+    row_to_node[rows[has_row]] = np.flatnonzero(has_row)
+    candidate = row_to_node >= 0
+    k = min(k, int(candidate.sum()) - 1)
+    if k <= 0:
+        return (offsets, flat), 0
+
+    fills = []
+    for start in range(0, len(nodes_to_fill), chunk):
+        block = nodes_to_fill[start:start + chunk]
+        scores = np.asarray(matrix @ np.asarray(matrix[rows[block]]).T)
+        scores[~candidate] = -np.inf
+        scores[rows[block], np.arange(len(block))] = -np.inf
+        top = np.argpartition(-scores, k - 1, axis=0)[:k]
+        top_scores = np.take_along_axis(scores, top, axis=0)
+        order = np.lexsort((top, -top_scores), axis=0)
+        fills.append(row_to_node[np.take_along_axis(top, order, axis=0)].T)
+    filled = np.concatenate(fills)
+
+    refill = np.zeros(len(offsets) - 1, dtype=bool)
+    refill[nodes_to_fill] = True
+    owners = _owners(offsets)
+    keep = ~refill[owners]
+    all_owners = np.concatenate([owners[keep], np.repeat(nodes_to_fill, k)])
+    all_targets = np.concatenate([flat[keep], filled.ravel()])
+    order = np.argsort(all_owners, kind="stable")
+    new_offsets = np.zeros_like(offsets)
+    new_offsets[1:] = np.cumsum(np.bincount(all_owners, minlength=len(offsets) - 1))
+    return (new_offsets, all_targets[order]), len(nodes_to_fill)
@@ -0,0 +1,283 @@
+"""
+Quadtree tile pyramid over the normalized [-1, 1] graph coordinates.
+
+Level z has 2^z x 2^z tiles; tile (x, y) covers
+[-1 + x * 2 / 2^z, -1 + (x + 1) * 2 / 2^z) on each axis (y grows upward).
+Levels below `max_zoom` keep one representative node per sub-cell
+(2^cell_bits x 2^cell_bits cells per tile): the node with the highest kNN
+in-degree. Level `max_zoom` holds every node.
+
+Each level is stored as two aligned arrays sorted by tile key
+(`keys{z}`, `members{z}`), so serving a tile is one searchsorted. The node
+ids, coordinates and in-degrees are stored too, so an incremental update can
+find the tiles whose nodes were added, removed, moved or changed in-degree.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from graph_payload import BINARY_FILENAME, decode_graph_columns
+
+TILES_FILENAME = "graph_tiles.npz"
+DEFAULT_MAX_ZOOM = 6
+DEFAULT_CELL_BITS = 4
+# Tile keys (x * 2**z + y) stay within int64 up to here; requests beyond it are never valid.
+ZOOM_LIMIT = 30
+
+
+def tile_keys(coords: np.ndarray, z: int) -> np.ndarray:
+    n = 1 << z
+    t = np.clip(((np.asarray(coords, dtype=np.float64) + 1.0) / 2.0 * n).astype(np.int64), 0, n - 1)
+    return t[:, 0] * n + t[:, 1]
+
+
+def node_importance(neighbor_lists: list[list[int]], count: int) -> np.ndarray:
+    flat = np.fromiter((j for lst in neighbor_lists for j in lst if 0 <= j < count), dtype=np.int64)
+    return np.bincount(flat, minlength=count).astype(np.int64)
+
+
+def _level(coords: np.ndarray, importance: np.ndarray, z: int, max_zoom: int, cell_bits: int, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    keys = tile_keys(coords[rows], z)
+    if z < max_zoom and len(rows):
+        cells = tile_keys(coords[rows], z + cell_bits)
+        order = np.lexsort((rows, -importance[rows], cells))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = cells[order][1:] != cells[order][:-1]
+        chosen = order[first]
+        rows, keys = rows[chosen], keys[chosen]
+    order = np.lexsort((rows, keys))
+    return keys[order], rows[order]
+
+
+def build_tile_pyramid(coords: np.ndarray, importance: np.ndarray, max_zoom: int = DEFAULT_MAX_ZOOM, cell_bits: int = DEFAULT_CELL_BITS) -> list[tuple[np.ndarray, np.ndarray]]:
+    rows = np.arange(len(coords), dtype=np.int64)
+    return [_level(coords, importance, z, max_zoom, cell_bits, rows) for z in range(max_zoom + 1)]
+
+
+def update_tile_pyramid(
+    levels: list[tuple[np.ndarray, np.ndarray]],
+    old_ids: np.ndarray,
+    new_ids: np.ndarray,
+    coords: np.ndarray,
+    importance: np.ndarray,
+    max_zoom: int,
+    cell_bits: int,
+    old_importance: np.ndarray,
+    old_coords: np.ndarray,
+) -> list[tuple[np.ndarray, np.ndarray]]:
+    """Rebuild only tiles touched by added/removed/moved nodes or in-degree changes; clean tiles are index-remapped.
+
+    A kept node whose in-degree changed can win or lose its cell's
+    representative slot, so its tiles are rebuilt like those of added nodes.
+    A kept node that moved (re-placed under its id) dirties its old tiles too.
+    """
+    new_pos = {rid: i for i, rid in enumerate(new_ids.tolist())}
+    old_to_new = np.array([new_pos.get(rid, -1) for rid in old_ids.tolist()], dtype=np.int64)
+    old_set = set(old_ids.tolist())
+    added = np.array([i for i, rid in enumerate(new_ids.tolist()) if rid not in old_set], dtype=np.int64)
+    kept = old_to_new >= 0
+    reweighted = old_to_new[kept][old_importance[kept] != importance[old_to_new[kept]]]
+    moved_old = np.flatnonzero(kept)[np.any(old_coords[kept] != coords[old_to_new[kept]], axis=1)]
+    touched = np.concatenate([added, reweighted, old_to_new[moved_old]])
+
+    out = []
+    for z, (keys, members) in enumerate(levels):
+        remapped = old_to_new[members] if len(members) else members
+        dirty = set(keys[remapped < 0].tolist())
+        if len(touched):
+            dirty.update(tile_keys(coords[touched], z).tolist())
+        if len(moved_old):
+            dirty.update(tile_keys(old_coords[moved_old], z).tolist())
+        if not dirty:
+            out.append((keys, remapped))
+            continue
+        dirty_arr = np.fromiter(dirty, dtype=np.int64)
+        clean = ~np.isin(keys, dirty_arr)
+        rows = np.flatnonzero(np.isin(tile_keys(coords, z), dirty_arr))
+        d_keys, d_members = _level(coords, importance, z, max_zoom, cell_bits, rows)
+        all_keys = np.concatenate([keys[clean], d_keys])
+        all_members = np.concatenate([remapped[clean], d_members])
+        order = np.lexsort((all_members, all_keys))
+        out.append((all_keys[order], all_members[order]))
+    return out
+
+
+def save_tile_pyramid(
+    path: Path,
+    levels: list[tuple[np.ndarray, np.ndarray]],
+    ids: np.ndarray,
+    max_zoom: int,
+    cell_bits: int,
+    importance: np.ndarray,
+    coords: np.ndarray,
+) -> None:
+    arrays: dict[str, np.ndarray] = {
+        "ids": np.asarray(ids, dtype=str),
+        "coords": np.asarray(coords, dtype=np.float64).reshape(-1, 2),
+        "importance": np.asarray(importance, dtype=np.int64),
+        "params": np.array([max_zoom, cell_bits], dtype=np.int64),
+    }
+    for z, (keys, members) in enumerate(levels):
+        arrays[f"keys{z}"] = keys
+        arrays[f"members{z}"] = members
+    tmp = path.with_name(path.name + ".tmp.npz")
+    np.savez(tmp, **arrays)
+    os.replace(tmp, path)
+
+
+def load_tile_pyramid(path: Path) -> tuple[list[tuple[np.ndarray, np.ndarray]], np.ndarray, int, int]:
+    with np.load(path) as data:
+        max_zoom, cell_bits = (int(v) for v in data["params"])
+        levels = [(data[f"keys{z}"], data[f"members{z}"]) for z in range(max_zoom + 1)]
+        return levels, data["ids"], max_zoom, cell_bits
+
+
+def load_tile_importance(path: Path) -> np.ndarray | None:
+    """In-degrees the pyramid was built with (None for files written before they were stored)."""
+    with np.load(path) as data:
+        return data["importance"] if "importance" in data.files else None
+
+
+def load_tile_coords(path: Path) -> np.ndarray | None:
+    """Node coordinates the pyramid was built with (None for files written before they were stored)."""
+    with np.load(path) as data:
+        return data["coords"] if "coords" in data.files else None
+
+
+def write_tile_pyramid(
+    nodes: list[dict[str, Any]],
+    vectors_dir: Path,
+    max_zoom: int = DEFAULT_MAX_ZOOM,
+    cell_bits: int = DEFAULT_CELL_BITS,
+    incremental: bool = True,
+) -> Path:
+    """Build (or incrementally update from the stored ids, coordinates and in-degrees) the pyramid for `nodes`."""
+    path = Path(vectors_dir) / TILES_FILENAME
+    coords = np.array([[n.get("x", 0.0), n.get("y", 0.0)] for n in nodes], dtype=np.float64).reshape(-1, 2)
+    ids = np.array([str(n.get("id", "")) for n in nodes], dtype=str)
+    importance = node_importance([n.get("neighbors") or [] for n in nodes], len(nodes))
+
+    levels = None
+    if incremental and path.exists():
+        try:
+            old_levels, old_ids, old_zoom, old_bits = load_tile_pyramid(path)
+            old_importance = load_tile_importance(path)
+            old_coords = load_tile_coords(path)
+            if (old_zoom, old_bits) == (max_zoom, cell_bits) and old_importance is not None and old_coords is not None:
+                levels = update_tile_pyramid(
+                    old_levels, old_ids, ids, coords, importance, max_zoom, cell_bits, old_importance, old_coords
+                )
+        except Exception as exc:
+            print(f"[TILES] Could not update existing pyramid ({exc}); rebuilding.")
+    if levels is None:
+        levels = build_tile_pyramid(coords, importance, max_zoom, cell_bits)
+    save_tile_pyramid(path, levels, ids, max_zoom, cell_bits, importance, coords)
+    return path
+
+
+class GraphTileCache:
+    """Serves tiles from graph_tiles.npz + graph_columns.bin, reloading when either file changes.
+
+    The two files are replaced one after the other, so a reload only pairs
+    them when the pyramid's node ids equal the payload's; otherwise the last
+    matching pair keeps being served until the second file lands. A reload
+    swaps in one immutable `(stamp, levels, max_zoom, columns, ids)` state, and
+    each request builds its ETag and tile from the single state it took.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._state: tuple | None = None
+        self._id_positions: tuple[tuple, dict[str, int]] | None = None
+
+    def _ensure_loaded(self, vectors_dir: Path) -> tuple | None:
+        """Current (stamp, levels, max_zoom, columns, ids), or None when no tiles are available."""
+        tiles_path = Path(vectors_dir) / TILES_FILENAME
+        columns_path = Path(vectors_dir) / BINARY_FILENAME
+        if not tiles_path.exists() or not columns_path.exists():
+            return None
+        stamp = (str(vectors_dir), tiles_path.stat().st_mtime_ns, columns_path.stat().st_mtime_ns)
+        with self._lock:
+            if self._state is None or stamp != self._state[0]:
+                levels, tile_ids, max_zoom, _ = load_tile_pyramid(tiles_path)
+                columns = decode_graph_columns(columns_path.read_bytes())
+                id_offsets, id_bytes = columns["columns"]["id_offsets"], columns["columns"]["id_bytes"]
+                ids = [id_bytes[id_offsets[i]:id_offsets[i + 1]].tobytes().decode("utf-8") for i in range(columns["count"])]
+                if tile_ids.tolist() == ids:
+                    self._state = (stamp, levels, max_zoom, columns, ids)
+            return self._state
+
+    @staticmethod
+    def _etag(state: tuple, z: int, x: int, y: int) -> str:
+        stamp = state[0]
+        return f"{stamp[1]:x}-{stamp[2]:x}-{z}-{x}-{y}"
+
+    def etag(self, vectors_dir: Path, z: int, x: int, y: int) -> str | None:
+        state = self._ensure_loaded(vectors_dir)
+        return None if state is None else self._etag(state, z, x, y)
+
+    def neighbor_ids(self, vectors_dir: Path, node_id: str) -> list[str] | None:
+        """Precomputed kNN list (best first) of `node_id` from the graph payload, or None if unknown."""
+        state = self._ensure_loaded(vectors_dir)
+        if state is None:
+            return None
+        _, _, _, columns, ids = state
+        with self._lock:
+            if self._id_positions is None or self._id_positions[0] is not state:
+                self._id_positions = (state, {nid: i for i, nid in enumerate(ids)})
+            positions = self._id_positions[1]
+        pos = positions.get(node_id)
+        if pos is None:
+            return None
+        cols = columns["columns"]
+        span = cols["neighbors"][cols["neighbor_offsets"][pos]:cols["neighbor_offsets"][pos + 1]]
+        return [ids[j] for j in span.tolist() if 0 <= j < len(ids)]
+
+    def get_tile(self, vectors_dir: Path, z: int, x: int, y: int) -> dict[str, Any] | None:
+        tile = self.get_tile_with_etag(vectors_dir, z, x, y)
+        return None if tile is None else tile[0]
+
+    def get_tile_with_etag(self, vectors_dir: Path, z: int, x: int, y: int) -> tuple[dict[str, Any], str] | None:
+        """(tile, ETag) built from one loaded state, or None if the tile does not exist."""
+        if z < 0 or z > ZOOM_LIMIT:
+            return None
+        state = self._ensure_loaded(vectors_dir)
+        if state is None:
+            return None
+        _, levels, max_zoom, columns, ids = state
+        if z > max_zoom:
+            return None
+        n = 1 << z
+        if not (0 <= x < n and 0 <= y < n):
+            return None
+        keys, members = levels[z]
+        key = x * n + y
+        rows = members[np.searchsorted(keys, key, "left"):np.searchsorted(keys, key, "right")]
+
+        cols = columns["columns"]
+        dicts = columns.get("dictionaries", {})
+        nodes = []
+        for i in rows.tolist():
+            node = {
+                "idx": i,
+                "id": ids[i],
+                "x": float(cols["x"][i]),
+                "y": float(cols["y"][i]),
+            }
+            for name, dictionary in dicts.items():
+                node[name] = dictionary[int(cols[name][i])]
+            nodes.append(node)
+        tile = {
+            "z": z,
+            "x": x,
+            "y": y,
+            "maxZoom": max_zoom,
+            "complete": z == max_zoom,
+            "nodes": nodes,
+        }
+        return tile, self._etag(state, z, x, y)
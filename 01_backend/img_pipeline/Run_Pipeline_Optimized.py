@@ -43,6 +43,7 @@ Image.MAX_IMAGE_PIXELS = None
 # Add project root to path
 ROOT_DIR = Path(__file__).parent.parent.parent
 sys.path.append(str(ROOT_DIR))
+sys.path.append(str(ROOT_DIR / "01_backend"))
 
 def clean_vram():
     """Force VRAM cleanup"""
@@ -475,10 +476,23 @@ def main():
     gpu_start = gpu_mem_snapshot()
     logger.info(">>> STAGE 6: FINALIZING <<<")
     batch_records = []
+    from config import load_config
+    from thumbnails import write_thumbnail_variants
+    thumbs_cfg = load_config(ROOT_DIR).get("thumbnails", {})
+    thumb_dir = out_dir / "img" / "thumb"
     
     for original, final_path in final_image_paths.items():
         if original not in embeddings_map: continue
         
+        try:
+            write_thumbnail_variants(
+                final_path, thumb_dir,
+                sizes=thumbs_cfg.get("sizes", [128, 256, 512]),
+                quality=int(thumbs_cfg.get("quality", 80)),
+            )
+        except Exception as e:
+            logger.warning(f"Thumbnail generation failed for {final_path.name}: {e}")
+        
         emb_data = embeddings_map[original]
         meta_data = valid_records_data[original]
         cap = captions.get(original, "")
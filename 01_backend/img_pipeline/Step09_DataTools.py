@@ -4,10 +4,13 @@ import logging
 import sys
 import shutil
 from pathlib import Path
+
+import numpy as np
 from tqdm import tqdm
 
 # Add parent directory to path to find other Steps
 sys.path.append(str(Path(__file__).parent.parent))
+from registry_store import RegistryStore
 
 try:
     from img_pipeline.Step07_Embeddings import get_image_embedding, get_text_embedding, unload_siglip
@@ -24,24 +27,16 @@ logger = logging.getLogger(__name__)
 
 def consolidate_jsons(output_dir):
     """
-    Consolidates all individual JSON files and the batch manifest into a single master registry.
+    Appends all batch manifests and stray JSON records to the registry store as a new segment.
+    Cost is O(new records): the master registry is only rewritten by compaction (--compact).
     """
     vectors_dir = output_dir / "vectors"
     if not vectors_dir.exists(): vectors_dir = output_dir # Support flat or nested
-    master_path = vectors_dir / "master_registry.json"
-    
-    all_records = []
+    store = RegistryStore(vectors_dir)
     
-    # 1. Load existing master if it exists
-    if master_path.exists():
-        try:
-            with open(master_path, "r", encoding="utf-8") as f:
-                all_records = json.load(f)
-            logger.info(f"Loaded {len(all_records)} existing records from master registry.")
-        except Exception as e:
-            logger.error(f"Failed to load master registry: {e}")
+    new_records = []
 
-    # 2. Load and merge ALL batch manifests
+    # 1. Load ALL batch manifests
     # New pattern: batch_YYYYMMDD_HHMMSS.json in vectors/
     batch_files = list(vectors_dir.glob("batch_*.json"))
     
@@ -56,14 +51,17 @@ def consolidate_jsons(output_dir):
             with open(b_file, "r", encoding="utf-8") as f:
                 batch_data = json.load(f)
                 if isinstance(batch_data, list):
-                    all_records.extend(batch_data)
+                    new_records.extend(batch_data)
                 else:
                     logger.warning(f"Batch {b_file.name} is not a list, skipping.")
         except Exception as e:
             logger.error(f"Failed to load batch {b_file.name}: {e}")
 
-    # 3. Scan for stray JSONs in output dir (legacy cleanup)
+    # 2. Scan for stray JSONs in output dir (legacy cleanup). Each one is appended
+    # once and then removed like a batch file, so later runs do not re-put it
+    # (which would duplicate it and undo a later delete).
     stray_jsons = list(output_dir.glob("*.json"))
+    merged_strays = []
     for json_file in tqdm(stray_jsons, desc="Merging stray JSONs"):
         if json_file.name in ["classification_manifest.json", "master_registry.json", "Categories.json"]: continue
         if json_file.parent.name == "vectors": continue 
@@ -74,39 +72,47 @@ def consolidate_jsons(output_dir):
                 if isinstance(data, dict):
                     # Check if it looks like an image record
                     if "id" in data or "name_of_file" in data:
-                        all_records.append(data)
+                        new_records.append(data)
+                        merged_strays.append(json_file)
                 elif isinstance(data, list):
-                    all_records.extend(data)
+                    new_records.extend(data)
+                    merged_strays.append(json_file)
         except Exception as e:
             logger.error(f"Error reading {json_file.name}: {e}")
 
-    # Deduplicate by ID or Filename
-    unique_records = {}
-    for i, rec in enumerate(all_records):
-        # Key priority: original_path (Stable) > name_of_file (Standard) > filename (Legacy) > id (UUID) > index (Fallback)
-        # We ensure we keep the LATEST version if multiple exist (as we iterate in order)
-        key = rec.get("original_path") or rec.get("name_of_file") or rec.get("filename") or rec.get("id") or str(i)
-        unique_records[key] = rec
-    final_list = list(unique_records.values())
-    
-    # Save Master
-    with open(master_path, "w", encoding="utf-8") as f:
-        json.dump(final_list, f, indent=2)
-    
-    logger.info(f"✅ Consolidation Complete. Master Registry: {len(final_list)} records.")
+    # 3. Append as one immutable segment. Deduplication (latest wins, keyed by
+    # original_path > name_of_file > filename > id) happens in the store's merged view.
+    segment = store.append_records(r for r in new_records if isinstance(r, dict))
+    if segment is not None:
+        logger.info(f"✅ Consolidation Complete. Appended {len(new_records)} records to {segment.name}.")
+    else:
+        logger.info("✅ Consolidation Complete. No new records.")
     
-    # Cleanup: Remove batch files that have been consolidated into the master registry
+    # Cleanup: Remove batch and stray files that have been consolidated into the registry store
     cleaned = 0
-    for b_file in batch_files:
+    for b_file in batch_files + merged_strays:
         try:
             b_file.unlink()
             cleaned += 1
         except Exception as e:
-            logger.warning(f"Could not remove batch file {b_file.name}: {e}")
+            logger.warning(f"Could not remove consolidated file {b_file.name}: {e}")
     if cleaned:
-        logger.info(f"🧹 Cleaned up {cleaned} batch file(s) after consolidation.")
+        logger.info(f"🧹 Cleaned up {cleaned} consolidated file(s).")
 
-    return final_list
+    return new_records
+
+def compact_registry(output_dir):
+    """
+    Folds pending registry segments into master_registry.json, dropping superseded and deleted records.
+    """
+    vectors_dir = output_dir / "vectors"
+    if not vectors_dir.exists(): vectors_dir = output_dir
+    count = RegistryStore(vectors_dir).compact()
+    if count is None:
+        logger.info("Compaction skipped (nothing pending or another compaction is running).")
+    else:
+        logger.info(f"✅ Compaction Complete. Master Registry: {count} records.")
+    return count
 
 def restore_embeddings(output_dir):
     """
@@ -115,19 +121,23 @@ def restore_embeddings(output_dir):
     """
     img_dir = output_dir / "img"
     vectors_dir = output_dir / "vectors"
-    master_path = vectors_dir / "master_registry.json"
+    store = RegistryStore(vectors_dir)
     
-    if not master_path.exists():
-        logger.error("Master registry not found. Run --consolidate first.")
+    # Vectors stream into matrices; a zero row means the embedding is missing or malformed.
+    records, matrices = store.read_columns(("image_embedding", "text_embedding"))
+    if not records:
+        logger.error("Registry is empty. Run --consolidate first.")
         return
-
-    with open(master_path, "r", encoding="utf-8") as f:
-        records = json.load(f)
+    for field, matrix in matrices.items():
+        present = (np.abs(matrix).max(axis=1) > 0).tolist() if matrix.shape[1] else [False] * len(records)
+        for rec, row, ok in zip(records, matrix, present):
+            if ok:
+                rec[field] = row
     
     # Create lookup
     rec_map = {Path(r["file_path"]).name: r for r in records if "file_path" in r}
     
-    updated_count = 0
+    updated_records = []
     from PIL import Image
     
     # Scan images
@@ -146,7 +156,7 @@ def restore_embeddings(output_dir):
         record = rec_map[img_name]
         
         # Check if embeddings are missing/empty
-        if not record.get("image_embedding") or len(record["image_embedding"]) == 0:
+        if record.get("image_embedding") is None:
             try:
                 img = Image.open(img_path).convert("RGB")
                 emb = get_image_embedding(img)
@@ -155,7 +165,7 @@ def restore_embeddings(output_dir):
             except Exception as e:
                 logger.error(f"Failed to embed image {img_name}: {e}")
         
-        if not record.get("text_embedding") or len(record["text_embedding"]) == 0:
+        if record.get("text_embedding") is None:
              # If we have a caption, embed it
              if record.get("caption"):
                  try:
@@ -166,21 +176,25 @@ def restore_embeddings(output_dir):
                      logger.error(f"Failed to embed text for {img_name}: {e}")
 
         if needs_update:
-            updated_count += 1
+            # Segments store plain lists; convert the vectors kept as matrix rows.
+            for field in ("image_embedding", "text_embedding"):
+                if isinstance(record.get(field), np.ndarray):
+                    record[field] = record[field].tolist()
+            updated_records.append(record)
             
-    if updated_count > 0:
+    if updated_records:
         unload_siglip()
-        # Save updates
-        with open(master_path, "w", encoding="utf-8") as f:
-            json.dump(list(rec_map.values()), f, indent=2)
-        logger.info(f"✅ Restored embeddings for {updated_count} records.")
+        # Save updates as a new segment (only the changed records are written)
+        store.append_records(updated_records)
+        logger.info(f"✅ Restored embeddings for {len(updated_records)} records.")
     else:
         logger.info("All records appear to have embeddings.")
 
 def main():
     parser = argparse.ArgumentParser(description="Data Management Tools for LOD Checker")
     parser.add_argument("--root", required=True, help="Output root folder (e.g. ./00_data)")
-    parser.add_argument("--consolidate", action="store_true", help="Merge all manifest/json files into master_registry.json")
+    parser.add_argument("--consolidate", action="store_true", help="Append all manifest/json files to the registry store")
+    parser.add_argument("--compact", action="store_true", help="Fold pending registry segments into master_registry.json")
     parser.add_argument("--restore", action="store_true", help="Generate missing embeddings for images in master registry")
     
     args = parser.parse_args()
@@ -192,5 +206,8 @@ def main():
     if args.restore:
         restore_embeddings(output_dir)
 
+    if args.compact:
+        compact_registry(output_dir)
+
 if __name__ == "__main__":
     main()
@@ -8,10 +8,28 @@ Architecture:
 - L2-normalize embeddings (cosine-compatible)
 - UMAP with metric="cosine", deterministic seed
 - Aspect-preserving coordinate normalization to [-1, 1]
-- Precomputed kNN (K=30) via pynndescent
+- Columnar binary payload (graph_columns.bin + graph_metadata.json) next to graph_data.json
+- Quadtree tile pyramid (graph_tiles.npz) for /api/graph/tiles/<z>/<x>/<y>
+- One shared pynndescent kNN graph (k=max(UMAP_N_NEIGHBORS, KNN_K)+1) feeds
+  UMAP as precomputed_knn and yields the K=30 neighbor lists
+
+Incremental mode (--incremental):
+- Full runs persist the fitted UMAP reducer + kNN index under vectors/graph_state/
+- New records are placed with reducer.transform() and the stored normalization
+- Only new nodes and the nodes whose neighbor lists they enter (or lost
+  neighbors to deletion) are recomputed
+- A record whose embedding changed under the same id (digest stored per id)
+  is placed again like a new record
+- A full refit is triggered once growth since the last fit (placed records
+  over fitted records still live and unchanged) or placement drift crosses
+  the configured thresholds
 """
 
+import argparse
+import hashlib
 import json
+import os
+import pickle
 import numpy as np
 import sys
 from pathlib import Path
@@ -38,51 +56,243 @@ if str(ROOT_DIR) not in sys.path:
     sys.path.append(str(ROOT_DIR))
 from config import load_config
 
+BACKEND_DIR = ROOT_DIR / "01_backend"
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+from facet_index import display_value
+from file_lock import file_lock
+from graph_payload import write_graph_payload
+from graph_repair import neighbors_csr, remap_neighbors
+from graph_tiles import write_tile_pyramid
+from registry_store import RegistryStore
+
 CFG = load_config(ROOT_DIR)
-VECTORS_FILE = ROOT_DIR / CFG["paths"]["vectors_dir"] / "master_registry.json"
-OUTPUT_FILE = ROOT_DIR / CFG["paths"]["vectors_dir"] / "graph_data.json"
+VECTORS_DIR = ROOT_DIR / CFG["paths"]["vectors_dir"]
+VECTORS_FILE = VECTORS_DIR / "master_registry.json"
+OUTPUT_FILE = VECTORS_DIR / "graph_data.json"
+STATE_DIR = VECTORS_DIR / "graph_state"
+STATE_MODEL_FILE = STATE_DIR / "model.pkl"
+STATE_META_FILE = STATE_DIR / "state.json"
+STATE_KNN_FILE = STATE_DIR / "knn.npz"
+
+GRAPH_CFG = CFG.get("graph", {})
+REFIT_GROWTH_RATIO = float(GRAPH_CFG.get("refit_growth_ratio", 0.2))
+REFIT_DRIFT_RATIO = float(GRAPH_CFG.get("refit_drift_ratio", 0.25))
+TILES_MAX_ZOOM = int(GRAPH_CFG.get("tiles_max_zoom", 6))
+TILES_CELL_BITS = int(GRAPH_CFG.get("tiles_cell_bits", 4))
 
 RANDOM_STATE = 42
 UMAP_N_NEIGHBORS = 15
 UMAP_MIN_DIST = 0.1
 KNN_K = 30
+SHARED_KNN_K = max(UMAP_N_NEIGHBORS, KNN_K) + 1  # +1 to account for self
+KNN_QUERY_SLACK = 10  # Extra candidates to absorb deleted/self rows in index queries
 
 
-def generate_semantic_graph():
-    print(f"Loading data from {VECTORS_FILE}...")
-    
-    with open(VECTORS_FILE, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    
+# Registry fields read by build_node(); everything else (captions, text vectors) is skipped while streaming.
+GRAPH_RECORD_FIELDS = (
+    "id", "name_of_file", "output_path", "name_of_image", "family_name", "final_category",
+    "lod_label", "lod", "level_of_detail", "provider", "full_description", "confidence_level",
+    "original_file", "file_size_kb", "possible_categories", "category_candidates",
+)
+
+
+def open_registry_store():
+    return RegistryStore(VECTORS_DIR, CFG.get("registry", {}).get("segments_dirname", "registry_segments"))
+
+
+def load_embedded_records():
+    print(f"Streaming data from {VECTORS_FILE} (+ pending registry segments)...")
+
+    data, matrices = open_registry_store().read_columns(("image_embedding",), fields=GRAPH_RECORD_FIELDS)
+    embeddings = matrices.pop("image_embedding")
+
     print(f"Loaded {len(data)} records")
-    
-    # Extract embeddings and deduplicate by ID
-    embeddings = []
-    valid_records = []
+
+    # Keep records with an id and a non-empty embedding; deduplicate by ID
+    has_embedding = np.abs(embeddings).max(axis=1) > 0 if embeddings.shape[1] else np.zeros(len(data), dtype=bool)
+    keep = []
     seen_ids = set()
-    
-    for rec in data:
+    for i, (rec, ok) in enumerate(zip(data, has_embedding.tolist())):
         rid = rec.get("id")
-        if not rid: continue
-        
-        if rid in seen_ids: continue
-        
-        emb = rec.get("image_embedding")
-        if emb and len(emb) > 0:
-            seen_ids.add(rid)
-            embeddings.append(emb)
-            valid_records.append(rec)
-    
+        if not rid or not ok or rid in seen_ids:
+            continue
+        seen_ids.add(rid)
+        keep.append(i)
+
+    valid_records = [data[i] for i in keep]
     print(f"Found {len(valid_records)} records with embeddings")
-    embeddings = np.array(embeddings, dtype=np.float32)
-    
-    # 1. L2-normalize embeddings (guard against zero vectors)
+    embeddings = embeddings[np.array(keep, dtype=np.int64)] if len(keep) < len(data) else embeddings
+
+    # L2-normalize embeddings (guard against zero vectors)
     print("L2-normalizing embeddings...")
     norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
     norms[norms == 0] = 1.0  # Guard against zero vectors
-    embeddings_norm = embeddings / norms
-    
-    # 2. UMAP dimensionality reduction
+    embeddings /= norms
+    return valid_records, embeddings
+
+
+def build_node(idx, rec, x, y, neighbors):
+    # Robust filename logic
+    filename = rec.get("name_of_file")
+    if not filename and rec.get("output_path"):
+         filename = Path(rec["output_path"]).name
+    if not filename and rec.get("id"):
+         filename = f"{rec['id']}.png" # Last resort
+
+    return {
+        "idx": idx, # Keep original idx for internal use
+        "id": rec["id"], # Changed to direct access, assuming 'id' is always present
+        "x": float(x),
+        "y": float(y),
+        "neighbors": neighbors,
+        # Display properties
+        "name": rec.get("name_of_image", "Unknown"), # Changed from simplified_description
+        # Facet fields share their display defaults with the backend's search filters
+        "family_name": display_value(rec, "family_name"),
+        "final_category": display_value(rec, "final_category"),
+        "lod_label": display_value(rec, "lod_label"),
+        "provider": display_value(rec, "provider"),
+        "img": f"/img/{filename}" if filename else "", # Changed path from thumb to root
+        "full_description": rec.get("full_description"),
+        "confidence_level": rec.get("confidence_level"),
+        "original_file": rec.get("original_file"),
+        "file_size_kb": rec.get("file_size_kb"),
+        "possible_categories": rec.get("possible_categories", []),
+        "category_candidates": rec.get("category_candidates", []),
+    }
+
+
+def build_meta(count, fitted_count, added_since_fit):
+    return {
+        "umap": {
+            "metric": "cosine",
+            "n_neighbors": UMAP_N_NEIGHBORS,
+            "min_dist": UMAP_MIN_DIST,
+            "seed": RANDOM_STATE
+        },
+        "knn": {
+            "k": KNN_K,
+            "metric": "cosine",
+            "seed": RANDOM_STATE,
+            "shared_k": SHARED_KNN_K
+        },
+        "bounds": {
+            "x": [-1, 1],
+            "y": [-1, 1]
+        },
+        "incremental": {
+            "fitted_count": fitted_count,
+            "added_since_fit": added_since_fit
+        },
+        "tiles": {
+            "max_zoom": TILES_MAX_ZOOM,
+            "cell_bits": TILES_CELL_BITS
+        },
+        "count": count
+    }
+
+
+def drop_deleted_nodes(nodes):
+    """Drop nodes whose records left the registry while the graph was computed.
+
+    The backend's delete pass may have rewritten graph_data.json in the
+    meantime; writing those nodes back would undo it.
+    """
+    live_ids = {str(rec.get("id")) for rec in open_registry_store().read_records(fields=("id",))}
+    kept = np.array([i for i, node in enumerate(nodes) if str(node["id"]) in live_ids], dtype=np.int64)
+    if len(kept) == len(nodes):
+        return nodes
+    offsets, flat = remap_neighbors(*neighbors_csr(nodes), kept)
+    kept_nodes = [nodes[i] for i in kept.tolist()]
+    for i, node in enumerate(kept_nodes):
+        node["neighbors"] = flat[offsets[i]:offsets[i + 1]].tolist()
+        node["idx"] = i
+    print(f"Dropped {len(nodes) - len(kept_nodes)} nodes deleted from the registry during graph prep.")
+    return kept_nodes
+
+
+def save_graph(nodes, meta, incremental=False):
+    # Same lock as the backend's delete compaction (run_viz._compact_graph), so the two rewrites never interleave.
+    with file_lock(OUTPUT_FILE.with_suffix(".lock"), timeout=600):
+        nodes = drop_deleted_nodes(nodes)
+        meta["count"] = len(nodes)
+        print(f"Saving to {OUTPUT_FILE}...")
+        tmp_path = OUTPUT_FILE.with_name(f"{OUTPUT_FILE.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "nodes": nodes}, f)
+        os.replace(tmp_path, OUTPUT_FILE)
+        print("Writing columnar binary payload...")
+        write_graph_payload(nodes, meta, VECTORS_DIR)
+        print(f"{'Updating' if incremental else 'Building'} tile pyramid (max_zoom={TILES_MAX_ZOOM})...")
+        write_tile_pyramid(nodes, VECTORS_DIR, TILES_MAX_ZOOM, TILES_CELL_BITS, incremental=incremental)
+
+
+def embedding_digests(records, embeddings_norm):
+    """Short per-id digest of each normalized embedding, to spot re-embedded records."""
+    return {
+        rec["id"]: hashlib.blake2b(np.ascontiguousarray(row).tobytes(), digest_size=8).hexdigest()
+        for rec, row in zip(records, embeddings_norm)
+    }
+
+
+def save_state(reducer, knn_index, center, scale, fitted_ids, added_ids, knn_graph=None, digests=None):
+    STATE_DIR.mkdir(parents=True, exist_ok=True)
+    if reducer is not None:
+        tmp_model = STATE_MODEL_FILE.with_suffix(".tmp")
+        with open(tmp_model, "wb") as f:
+            pickle.dump({"reducer": reducer, "knn_index": knn_index}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_model.replace(STATE_MODEL_FILE)
+    if knn_graph is not None:
+        tmp_knn = STATE_KNN_FILE.with_suffix(".tmp.npz")
+        np.savez(tmp_knn, indices=knn_graph[0], dists=knn_graph[1])
+        tmp_knn.replace(STATE_KNN_FILE)
+    state = {
+        "center": [float(v) for v in center],
+        "scale": float(scale),
+        "fitted_ids": fitted_ids,
+        "added_ids": added_ids,
+        "digests": digests or {},
+    }
+    tmp_meta = STATE_META_FILE.with_suffix(".tmp")
+    tmp_meta.write_text(json.dumps(state), encoding="utf-8")
+    tmp_meta.replace(STATE_META_FILE)
+
+
+def load_state():
+    if not STATE_MODEL_FILE.exists() or not STATE_META_FILE.exists():
+        return None
+    try:
+        state = json.loads(STATE_META_FILE.read_text(encoding="utf-8"))
+        with open(STATE_MODEL_FILE, "rb") as f:
+            state.update(pickle.load(f))
+        state["knn_graph"] = None
+        if STATE_KNN_FILE.exists():
+            with np.load(STATE_KNN_FILE) as knn:
+                state["knn_graph"] = knn["indices"]
+        return state
+    except Exception as e:
+        print(f"Could not load graph state ({e}).")
+        return None
+
+
+def generate_semantic_graph():
+    valid_records, embeddings_norm = load_embedded_records()
+
+    # 1. One shared kNN graph for UMAP and the neighbor lists
+    print(f"Computing shared {SHARED_KNN_K}-NN graph...")
+    index = NNDescent(
+        embeddings_norm,
+        metric="cosine",
+        random_state=RANDOM_STATE,
+        n_jobs=-1,                  # Use all cores
+        n_neighbors=SHARED_KNN_K,
+        low_memory=False
+    )
+    knn_indices, knn_dists = index.neighbor_graph
+
+    # 2. UMAP dimensionality reduction on the precomputed kNN (no second graph build).
+    # Columns are pruned here because UMAP only prunes wider graphs above 4096 rows.
     print(f"Running UMAP (n_neighbors={UMAP_N_NEIGHBORS}, min_dist={UMAP_MIN_DIST})...")
     reducer = UMAP(
         n_components=2,
@@ -90,127 +300,196 @@ def generate_semantic_graph():
         random_state=RANDOM_STATE,
         n_neighbors=UMAP_N_NEIGHBORS,
         min_dist=UMAP_MIN_DIST,
+        precomputed_knn=(knn_indices[:, :UMAP_N_NEIGHBORS], knn_dists[:, :UMAP_N_NEIGHBORS], index),
         low_memory=False, # Faster execution
         n_jobs=-1,        # Use all cores
         verbose=True
     )
     coords = reducer.fit_transform(embeddings_norm)
     print(f"UMAP complete. Shape: {coords.shape}")
-    
+
     # 3. Aspect-preserving coordinate normalization to [-1, 1]
     print("Normalizing coordinates (aspect-preserving)...")
     mins = coords.min(axis=0)
     maxs = coords.max(axis=0)
     center = (mins + maxs) / 2
     scale = (maxs - mins).max() / 2  # Single scalar preserves aspect
-    
+
     coords = (coords - center) / scale
     coords = np.clip(coords, -1, 1)
-    
-    # 4. Precompute kNN using pynndescent
-    print(f"Computing {KNN_K}-NN index...")
-    index = NNDescent(
-        embeddings_norm,
-        metric="cosine",
-        random_state=RANDOM_STATE,
-        n_jobs=-1,             # Use all cores
-        n_neighbors=KNN_K + 1  # +1 to account for self
-    )
-    neighbors_raw, _ = index.query(embeddings_norm, k=KNN_K + 1)
-    
-    # Remove self from neighbors
+
+    # 4. Neighbor lists from the same kNN graph (remove self / unfilled slots)
     neighbors = []
-    for i, row in enumerate(neighbors_raw):
-        filtered = [int(j) for j in row if j != i][:KNN_K]
+    for i, row in enumerate(knn_indices):
+        filtered = [int(j) for j in row if j != i and j >= 0][:KNN_K]
         neighbors.append(filtered)
-    
+
     print(f"kNN complete. Each node has {KNN_K} neighbors.")
-    
+
     # 5. Build output nodes
     print("Building output...")
-    nodes = []
-    
-    for idx, rec in enumerate(valid_records):
-        # Robust LOD Label Logic
-        lod_val = rec.get("lod_label")
-        if not lod_val:
-            # Try to derive from numeric LOD
-            lod_num = rec.get("lod") or rec.get("level_of_detail")
-            if lod_num:
-                try:
-                    val = int(lod_num)
-                    if val <= 100: lod_val = "Low"
-                    elif val <= 200: lod_val = "Medium"
-                    elif val <= 300: lod_val = "Medium-High"
-                    elif val <= 400: lod_val = "High"
-                    else: lod_val = "Very High"
-                except (ValueError, TypeError):
-                    lod_val = str(lod_num)
-            else:
-                lod_val = "Unknown"
-
-        # Robust filename logic
-        filename = rec.get("name_of_file")
-        if not filename and rec.get("output_path"):
-             filename = Path(rec["output_path"]).name
-        if not filename and rec.get("id"):
-             filename = f"{rec['id']}.png" # Last resort
-        
-        node = {
-            "idx": idx, # Keep original idx for internal use
-            "id": rec["id"], # Changed to direct access, assuming 'id' is always present
-            "x": float(coords[idx, 0]),
-            "y": float(coords[idx, 1]),
-            "neighbors": neighbors[idx],
-            # Display properties
-            "name": rec.get("name_of_image", "Unknown"), # Changed from simplified_description
-            "family_name": rec.get("family_name", "Generic Family"), # New field
-            "final_category": rec.get("final_category") or "Uncategorized", # Changed fallback
-            "lod_label": lod_val, # Using the robustly determined value
-            "provider": rec.get("provider", "Unknown"),
-            "img": f"/img/{filename}" if filename else "", # Changed path from thumb to root
-            "full_description": rec.get("full_description"),
-            "confidence_level": rec.get("confidence_level"),
-            "original_file": rec.get("original_file"),
-            "file_size_kb": rec.get("file_size_kb"),
-            "possible_categories": rec.get("possible_categories", []),
-            "category_candidates": rec.get("category_candidates", []),
-        }
-        nodes.append(node)
-    
-    # 6. Build metadata
-    meta = {
-        "umap": {
-            "metric": "cosine",
-            "n_neighbors": UMAP_N_NEIGHBORS,
-            "min_dist": UMAP_MIN_DIST,
-            "seed": RANDOM_STATE
-        },
-        "knn": {
-            "k": KNN_K,
-            "metric": "cosine",
-            "seed": RANDOM_STATE
-        },
-        "bounds": {
-            "x": [-1, 1],
-            "y": [-1, 1]
-        },
-        "count": len(nodes)
-    }
-    
-    output = {
-        "meta": meta,
-        "nodes": nodes
-    }
-    
-    # 7. Save
-    print(f"Saving to {OUTPUT_FILE}...")
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(output, f)
-    
+    nodes = [
+        build_node(idx, rec, coords[idx, 0], coords[idx, 1], neighbors[idx])
+        for idx, rec in enumerate(valid_records)
+    ]
+
+    # 6. Save graph + fitted state (reducer, index, shared kNN graph) for incremental updates
+    save_graph(nodes, build_meta(len(nodes), len(nodes), 0))
+    save_state(
+        reducer,
+        index,
+        center,
+        scale,
+        [rec["id"] for rec in valid_records],
+        [],
+        (knn_indices, knn_dists),
+        embedding_digests(valid_records, embeddings_norm),
+    )
+
     print(f"✓ Exported {len(nodes)} nodes with precomputed positions and neighbors")
     print(f"  Bounds: x=[{coords[:,0].min():.3f}, {coords[:,0].max():.3f}], y=[{coords[:,1].min():.3f}, {coords[:,1].max():.3f}]")
 
 
+def _top_neighbors(node_emb, rows, candidate_lists):
+    """Exact cosine re-rank of candidate lists; returns the KNN_K best (self excluded) per row."""
+    out = []
+    for row, cands in zip(rows, candidate_lists):
+        cands = np.array(sorted(set(cands) - {row}), dtype=np.int64)
+        if len(cands) == 0:
+            out.append([])
+            continue
+        sims = node_emb[cands] @ node_emb[row]
+        order = np.argsort(-sims, kind="stable")[:KNN_K]
+        out.append([int(j) for j in cands[order]])
+    return out
+
+
+def update_semantic_graph():
+    state = load_state()
+    if state is None or not OUTPUT_FILE.exists():
+        print("No persisted graph state found. Running full graph generation...")
+        return generate_semantic_graph()
+
+    valid_records, embeddings_norm = load_embedded_records()
+    rec_pos = {rec["id"]: i for i, rec in enumerate(valid_records)}
+    digests = embedding_digests(valid_records, embeddings_norm)
+    # States written before digests were stored cannot tell; their records count as unchanged.
+    old_digests = state.get("digests") or {}
+    changed = {rid for rid, digest in digests.items() if old_digests and old_digests.get(rid) != digest}
+
+    with open(OUTPUT_FILE, "r", encoding="utf-8") as f:
+        old_nodes = json.load(f).get("nodes", [])
+
+    kept_nodes = [n for n in old_nodes if n.get("id") in rec_pos and n.get("id") not in changed]
+    kept_ids = {n["id"] for n in kept_nodes}
+    new_rows = [i for i, rec in enumerate(valid_records) if rec["id"] not in kept_ids]
+    removed = sum(1 for n in old_nodes if n.get("id") not in rec_pos)
+    print(f"Incremental update: {len(new_rows)} new ({len(changed)} re-embedded), {removed} removed, {len(kept_nodes)} kept.")
+
+    fitted_ids = state["fitted_ids"]
+    added_ids = list(dict.fromkeys(
+        [rid for rid in state["added_ids"] if rid in rec_pos] + [valid_records[i]["id"] for i in new_rows]
+    ))
+    # Fitted rows of deleted or re-embedded records no longer anchor the layout or the stored kNN graph.
+    placed = set(added_ids)
+    live_fitted = sum(1 for rid in fitted_ids if rid in rec_pos and rid not in placed)
+    if not live_fitted or len(added_ids) / live_fitted > REFIT_GROWTH_RATIO:
+        print(f"Growth since last fit exceeds {REFIT_GROWTH_RATIO:.0%}. Running full refit...")
+        return generate_semantic_graph()
+
+    # 1. Place new points with the persisted reducer + normalization
+    center = np.array(state["center"], dtype=np.float32)
+    scale = float(state["scale"])
+    new_coords = np.zeros((0, 2), dtype=np.float32)
+    if new_rows:
+        print(f"Placing {len(new_rows)} new points with UMAP.transform...")
+        new_coords = (state["reducer"].transform(embeddings_norm[new_rows]) - center) / scale
+        drift = float(np.mean(np.any(np.abs(new_coords) > 1, axis=1)))
+        if drift > REFIT_DRIFT_RATIO:
+            print(f"{drift:.0%} of new points fall outside the fitted layout. Running full refit...")
+            return generate_semantic_graph()
+        new_coords = np.clip(new_coords, -1, 1)
+
+    # 2. Graph order: kept nodes keep their relative order, new nodes are appended
+    order_ids = [n["id"] for n in kept_nodes] + [valid_records[i]["id"] for i in new_rows]
+    pos = {rid: i for i, rid in enumerate(order_ids)}
+    node_emb = embeddings_norm[[rec_pos[rid] for rid in order_ids]]
+    old_ids = [n.get("id") for n in old_nodes]
+
+    neighbors = []
+    for n in kept_nodes:
+        raw = n.get("neighbors", [])
+        mapped = [
+            pos.get(old_ids[j])
+            for j in raw
+            if isinstance(j, int) and 0 <= j < len(old_ids) and old_ids[j] not in changed
+        ]
+        neighbors.append([m for m in mapped if m is not None])
+    neighbors.extend([] for _ in new_rows)
+
+    # 3. Recompute lists for new nodes and nodes that lost neighbors to deletion
+    target_k = min(KNN_K, len(order_ids) - 1)
+    affected = [i for i, lst in enumerate(neighbors) if len(lst) < target_k]
+    if affected:
+        fitted_pos = np.array([pos.get(rid, -1) for rid in fitted_ids], dtype=np.int64)
+        delta_pos = list(np.array([pos[rid] for rid in added_ids], dtype=np.int64))
+        fitted_row = {rid: r for r, rid in enumerate(fitted_ids) if rid not in placed}
+        knn_graph = state.get("knn_graph")
+        candidate_lists = {}
+        to_query = []
+        for i in affected:
+            # Fitted nodes first reuse their persisted shared-kNN row
+            row = fitted_row.get(order_ids[i])
+            if knn_graph is not None and row is not None and row < len(knn_graph):
+                stored = fitted_pos[knn_graph[row][knn_graph[row] >= 0]]
+                stored = list(stored[(stored >= 0) & (stored != i)])
+                if len(stored) >= target_k:
+                    candidate_lists[i] = stored + delta_pos
+                    continue
+            to_query.append(i)
+        if to_query:
+            k_query = min(KNN_K + 1 + KNN_QUERY_SLACK, len(fitted_ids))
+            index_rows, _ = state["knn_index"].query(node_emb[to_query], k=k_query)
+            for i, row_cands in zip(to_query, index_rows):
+                mapped = fitted_pos[row_cands]
+                candidate_lists[i] = list(mapped[mapped >= 0]) + delta_pos
+        for i, lst in zip(affected, _top_neighbors(node_emb, affected, [candidate_lists[i] for i in affected])):
+            neighbors[i] = lst
+
+    # 4. New nodes enter the lists of existing nodes they are closer to than the current worst neighbor
+    first_new = len(kept_nodes)
+    incoming = {}
+    for p in range(first_new, len(order_ids)):
+        for q in neighbors[p]:
+            if q < first_new:
+                incoming.setdefault(q, []).append(p)
+    if incoming:
+        rows = list(incoming)
+        refreshed = _top_neighbors(node_emb, rows, [neighbors[q] + incoming[q] for q in rows])
+        for q, lst in zip(rows, refreshed):
+            neighbors[q] = lst
+    print(f"Updated neighbor lists for {len(set(affected) | set(incoming))} nodes.")
+
+    # 5. Rebuild nodes (display fields refreshed from the registry)
+    coords = [(n["x"], n["y"]) for n in kept_nodes] + [tuple(c) for c in new_coords]
+    nodes = [
+        build_node(i, valid_records[rec_pos[rid]], coords[i][0], coords[i][1], neighbors[i])
+        for i, rid in enumerate(order_ids)
+    ]
+    save_graph(nodes, build_meta(len(nodes), live_fitted, len(added_ids)), incremental=True)
+    save_state(None, None, center, scale, fitted_ids, added_ids, digests=digests)
+    print(f"✓ Incrementally exported {len(nodes)} nodes ({len(added_ids)} placed since last fit)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Semantic graph generator")
+    parser.add_argument("--incremental", action="store_true", help="Place new records into the persisted layout instead of refitting UMAP")
+    args = parser.parse_args()
+    if args.incremental:
+        update_semantic_graph()
+    else:
+        generate_semantic_graph()
+
+
 if __name__ == "__main__":
-    generate_semantic_graph()
+    main()
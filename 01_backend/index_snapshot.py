@@ -0,0 +1,98 @@
+"""
+Immutable view of the searchable library.
+
+An `IndexSnapshot` holds everything a search reads: registry records, the
+image and caption matrices, the vector / keyword / facet indexes, the alive
+bitmap and the id / filename row maps, stamped with a generation. Readers
+take `resources.snapshot` once per request and use only that object, so a
+search never sees a registry and a matrix of different lengths. Writers
+(load, append, tombstone, compaction) build the next snapshot beside the
+published one, copying only what they change (`replace`, the indexes'
+`copy()`), and publish it with a single attribute assignment. Nothing
+reachable from a published snapshot is modified afterwards.
+"""
+from __future__ import annotations
+
+import dataclasses
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+
+from facet_index import FacetIndex
+from keyword_index import KeywordIndex
+
+
+def row_maps(
+    records: list[dict[str, Any]],
+    start: int = 0,
+    id_rows: dict[str, int] | None = None,
+    file_rows: dict[str, list[int]] | None = None,
+) -> tuple[dict[str, int], dict[str, list[int]]]:
+    """id → row and filename → rows for `records` at rows start, start + 1, ...
+
+    Given maps are copied, not extended in place (a published snapshot may
+    still be reading them).
+    """
+    id_rows = dict(id_rows or {})
+    file_rows = dict(file_rows or {})
+    for row, rec in enumerate(records, start):
+        id_rows[str(rec.get("id", rec.get("name_of_file")))] = row
+        if rec.get("name_of_file"):
+            file_rows[rec["name_of_file"]] = file_rows.get(rec["name_of_file"], []) + [row]
+    return id_rows, file_rows
+
+
+@dataclass(frozen=True, eq=False)
+class IndexSnapshot:
+    registry: list[dict[str, Any]] = field(default_factory=list)
+    embeddings: np.ndarray | None = None
+    text_embeddings: np.ndarray | None = None
+    vector_index: Any = None
+    keyword_index: KeywordIndex = field(default_factory=KeywordIndex)
+    facet_index: FacetIndex = field(default_factory=FacetIndex)
+    # Tombstones only clear bits here; rows leave the arrays at compaction.
+    alive: np.ndarray = field(default_factory=lambda: np.ones(0, dtype=bool))
+    tombstoned: int = 0
+    id_rows: dict[str, int] = field(default_factory=dict)
+    file_rows: dict[str, list[int]] = field(default_factory=dict)
+    generation: int = 0
+
+    @classmethod
+    def build(
+        cls,
+        registry: list[dict[str, Any]],
+        embeddings: np.ndarray | None = None,
+        text_embeddings: np.ndarray | None = None,
+        vector_index: Any = None,
+        keyword_index: KeywordIndex | None = None,
+        facet_index: FacetIndex | None = None,
+    ) -> "IndexSnapshot":
+        """Snapshot with every row alive; keyword and facet indexes are built from `registry` when not given."""
+        id_rows, file_rows = row_maps(registry)
+        return cls(
+            registry=registry,
+            embeddings=embeddings,
+            text_embeddings=text_embeddings,
+            vector_index=vector_index,
+            keyword_index=keyword_index if keyword_index is not None else KeywordIndex(registry),
+            facet_index=facet_index if facet_index is not None else FacetIndex(registry),
+            alive=np.ones(len(registry), dtype=bool),
+            id_rows=id_rows,
+            file_rows=file_rows,
+        )
+
+    def replace(self, **changes: Any) -> "IndexSnapshot":
+        return dataclasses.replace(self, **changes)
+
+    @property
+    def live_count(self) -> int:
+        return len(self.registry) - self.tombstoned
+
+    def row_for_id(self, record_id: str) -> int | None:
+        """Row of a live record id (tombstoned ids are unmapped)."""
+        row = self.id_rows.get(record_id)
+        return row if row is not None and self.alive[row] else None
+
+    def live_rows(self, filename: str) -> list[int]:
+        return [row for row in self.file_rows.get(filename, []) if self.alive[row]]
@@ -0,0 +1,211 @@
+"""
+Inverted keyword index for the search keyword boost.
+
+A record matches a query term (len > 2) when the term is a substring of its
+lowercased "name_of_file final_category family_name provider" text. Terms
+contain no whitespace, so that is the same as being a substring of one of the
+text's whitespace tokens. The index therefore keeps:
+
+- postings: (token id, row) pairs sorted by token, CSR offsets per token
+- a trigram -> token ids map over the vocabulary, so a term is resolved to
+  the tokens containing it without scanning every record
+
+`match()` returns matched rows with their per-query match counts, ready for a
+vectorized score add (`score_fusion.keyword_boosts` turns the counts into
+score units for the fusion mode). `load_keyword_index` persists the postings next to the
+search matrices and memory-maps them, so server workers share one copy.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Iterable
+
+import numpy as np
+
+from file_lock import file_lock
+
+KEYWORD_FIELDS = ("name_of_file", "final_category", "family_name", "provider")
+KEYWORD_BOOST = 0.15
+MIN_TERM_LEN = 3
+POSTINGS_FILENAME = "search_keyword_postings.npy"
+VOCAB_FILENAME = "search_keyword_vocab.json"
+
+
+def record_text(rec: dict[str, Any]) -> str:
+    return " ".join(str(rec.get(field, "")) for field in KEYWORD_FIELDS).lower()
+
+
+def query_terms(query: str) -> list[str]:
+    return [term for term in query.lower().split() if len(term) >= MIN_TERM_LEN]
+
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class KeywordIndex:
+    def __init__(self, records: Iterable[dict[str, Any]] = ()) -> None:
+        self._vocab: dict[str, int] = {}
+        self._tokens: list[str] = []
+        self._grams: dict[str, set[int]] = {}
+        self._post_tokens = np.zeros(0, dtype=np.int64)
+        self._post_rows = np.zeros(0, dtype=np.int64)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self.count = 0
+        self.add(list(records))
+
+    def copy(self) -> "KeywordIndex":
+        """Index to mutate for a new snapshot (vocabulary copied, postings arrays shared)."""
+        clone = KeywordIndex()
+        clone._vocab, clone._tokens = dict(self._vocab), list(self._tokens)
+        clone._grams = {gram: set(tids) for gram, tids in self._grams.items()}
+        clone._post_tokens, clone._post_rows, clone._offsets = self._post_tokens, self._post_rows, self._offsets
+        clone.count = self.count
+        return clone
+
+    def _token_id(self, token: str) -> int:
+        tid = self._vocab.get(token)
+        if tid is None:
+            tid = self._vocab[token] = len(self._tokens)
+            self._tokens.append(token)
+            for gram in _trigrams(token):
+                self._grams.setdefault(gram, set()).add(tid)
+        return tid
+
+    def _set_postings(self, tokens: np.ndarray, rows: np.ndarray, presorted: bool = False) -> None:
+        if not presorted:
+            order = np.lexsort((rows, tokens))
+            tokens, rows = tokens[order], rows[order]
+        self._post_tokens, self._post_rows = tokens, rows
+        self._offsets = np.zeros(len(self._tokens) + 1, dtype=np.int64)
+        self._offsets[1:] = np.cumsum(np.bincount(self._post_tokens, minlength=len(self._tokens)))
+
+    def add(self, records: list[dict[str, Any]]) -> None:
+        """Index `records` as rows count, count + 1, ... (appended after existing rows)."""
+        pairs: list[tuple[int, int]] = []
+        for offset, rec in enumerate(records):
+            row = self.count + offset
+            for token in set(record_text(rec).split()):
+                if len(token) >= MIN_TERM_LEN:
+                    pairs.append((self._token_id(token), row))
+        self.count += len(records)
+        old_tokens = len(self._offsets) - 1
+        new = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+        new = new[np.lexsort((new[:, 1], new[:, 0]))]
+        # New rows follow every existing row, so each token's new postings go
+        # right after its existing span (tokens new to the vocabulary: at the end).
+        at = self._offsets[np.minimum(new[:, 0] + 1, old_tokens)]
+        self._set_postings(np.insert(self._post_tokens, at, new[:, 0]), np.insert(self._post_rows, at, new[:, 1]), presorted=True)
+
+    def remove(self, rows: int | np.ndarray) -> None:
+        """Drop `rows` and shift later rows down (mirrors np.delete on the embedding matrix)."""
+        dropped = np.zeros(self.count, dtype=bool)
+        dropped[rows] = True
+        remap = np.cumsum(~dropped) - 1
+        keep = ~dropped[self._post_rows]
+        self.count -= int(dropped.sum())
+        # Dropping rows and shifting later ones down keeps (token, row) order.
+        self._set_postings(self._post_tokens[keep], remap[self._post_rows[keep]], presorted=True)
+
+    def save(self, vectors_dir: Path, fingerprint: str) -> None:
+        """Write the postings as one (2, P) `.npy` and the vocabulary + fingerprint as JSON."""
+        postings_path = Path(vectors_dir) / POSTINGS_FILENAME
+        vocab_path = Path(vectors_dir) / VOCAB_FILENAME
+        tmp = postings_path.with_name(f"{postings_path.name}.{os.getpid()}.tmp.npy")
+        np.save(tmp, np.stack([self._post_tokens, self._post_rows]))
+        vocab_path.unlink(missing_ok=True)
+        os.replace(tmp, postings_path)
+        tmp = vocab_path.with_name(f"{vocab_path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"fingerprint": fingerprint, "count": self.count, "postings": len(self._post_rows), "tokens": self._tokens}), encoding="utf-8")
+        os.replace(tmp, vocab_path)
+
+    @classmethod
+    def load(cls, vectors_dir: Path, fingerprint: str) -> "KeywordIndex | None":
+        """Index with memory-mapped postings, or None when the files are missing or stale."""
+        try:
+            meta = json.loads((Path(vectors_dir) / VOCAB_FILENAME).read_text(encoding="utf-8"))
+            if meta.get("fingerprint") != fingerprint:
+                return None
+            postings = np.load(Path(vectors_dir) / POSTINGS_FILENAME, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        if postings.shape != (2, meta["postings"]):
+            return None
+        index = cls()
+        for token in meta["tokens"]:
+            index._token_id(token)
+        index.count = int(meta["count"])
+        index._set_postings(postings[0], postings[1], presorted=True)
+        return index
+
+    def term_rows(self, term: str) -> np.ndarray:
+        grams = sorted((self._grams.get(g, set()) for g in _trigrams(term)), key=len)
+        if not grams or not grams[0]:
+            return np.zeros(0, dtype=np.int64)
+        tids = set(grams[0]).intersection(*grams[1:])
+        spans = [self._post_rows[self._offsets[t]:self._offsets[t + 1]] for t in tids if term in self._tokens[t]]
+        return np.unique(np.concatenate(spans)) if spans else np.zeros(0, dtype=np.int64)
+
+    def match(self, query: str) -> tuple[np.ndarray, np.ndarray]:
+        """(rows, matched term counts) for `query`; repeated terms count repeatedly."""
+        hits = [self.term_rows(term) for term in query_terms(query)]
+        hits = [h for h in hits if len(h)]
+        if not hits:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(hits), return_counts=True)
+
+
+def keyword_fingerprint(records: Iterable[dict[str, Any]]) -> str:
+    return hashlib.sha1("\n".join(map(record_text, records)).encode("utf-8")).hexdigest()
+
+
+def load_keyword_index(records: list[dict[str, Any]], vectors_dir: Path | None = None) -> KeywordIndex:
+    """Index over `records`, mapped from (or persisted to) `vectors_dir` when given."""
+    if vectors_dir is None:
+        return KeywordIndex(records)
+    fingerprint = keyword_fingerprint(records)
+    try:
+        with file_lock(Path(vectors_dir) / "search_keyword.lock"):
+            index = KeywordIndex.load(vectors_dir, fingerprint)
+            if index is None or index.count != len(records):
+                built = KeywordIndex(records)
+                built.save(vectors_dir, fingerprint)
+                print(f"[INDEX] Wrote {POSTINGS_FILENAME} ({len(built._post_rows)} postings, {len(built._tokens)} tokens)")
+                # Map the file just written, like every other worker will.
+                index = KeywordIndex.load(vectors_dir, fingerprint) or built
+            return index
+    except (OSError, TimeoutError) as exc:
+        print(f"[INDEX] Could not persist the keyword index ({exc}); keeping it in memory.")
+        return KeywordIndex(records)
+
+
+def boost_candidates(
+    rows: np.ndarray,
+    scores: np.ndarray,
+    hit_rows: np.ndarray,
+    hit_boosts: np.ndarray,
+    matrix: np.ndarray,
+    query: np.ndarray,
+    exhaustive: bool,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Add each keyword hit's boost (`hit_boosts`, aligned with `hit_rows`) to candidate scores.
+
+    When the candidate set is not exhaustive (ANN), keyword hits outside it
+    are appended with their exact vector score first.
+    """
+    if not len(hit_rows):
+        return rows, scores
+    if exhaustive:
+        scores[hit_rows] += hit_boosts
+        return rows, scores
+    extra = np.setdiff1d(hit_rows, rows, assume_unique=True)
+    if len(extra):
+        rows = np.concatenate([rows, extra])
+        scores = np.concatenate([scores, matrix[extra] @ query])
+    order = np.argsort(rows, kind="stable")
+    pos = order[np.searchsorted(rows, hit_rows, sorter=order)]
+    scores[pos] += hit_boosts
+    return rows, scores
@@ -0,0 +1,87 @@
+"""
+Micro-batching for concurrent request traffic.
+
+Callers block in `submit_many(items)`. One worker thread takes the first
+queued item, keeps collecting until `window_ms` has passed or `max_batch`
+items are queued, runs `process(items)` once for the whole batch, and fans
+the results back out to the waiting callers. `window_ms <= 0` disables
+batching (items are processed inline on the caller's thread).
+"""
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable
+
+
+class MicroBatcher:
+    def __init__(self, process: Callable[[list[Any]], list[Any]], window_ms: float = 3.0, max_batch: int = 32, name: str = "batcher") -> None:
+        self.process = process
+        self.window_seconds = max(0.0, float(window_ms)) / 1000
+        self.max_batch = max(1, int(max_batch))
+        self.name = name
+        self._queue: queue.Queue[tuple[Any, Future]] = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self.counters = {"batches": 0, "items": 0, "largest_batch": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_seconds > 0
+
+    def submit_many(self, items: list[Any]) -> list[Any]:
+        if not self.enabled:
+            return self.process(items)
+        self._ensure_worker()
+        futures: list[Future] = []
+        for item in items:
+            future: Future = Future()
+            self._queue.put((item, future))
+            futures.append(future)
+        return [future.result() for future in futures]
+
+    def submit(self, item: Any) -> Any:
+        return self.submit_many([item])[0]
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name=f"{self.name}-microbatch", daemon=True)
+                self._thread.start()
+
+    def _collect(self) -> list[tuple[Any, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window_seconds
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            with self._lock:
+                self.counters["batches"] += 1
+                self.counters["items"] += len(items)
+                self.counters["largest_batch"] = max(self.counters["largest_batch"], len(items))
+            try:
+                results = self.process(items)
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as exc:
+                for _, future in batch:
+                    future.set_exception(exc)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            out: dict[str, Any] = dict(self.counters)
+        out["window_ms"] = self.window_seconds * 1000
+        out["max_batch"] = self.max_batch
+        out["mean_batch"] = round(out["items"] / out["batches"], 2) if out["batches"] else 0.0
+        return out
@@ -0,0 +1,132 @@
+"""
+Streaming reader for the registry JSON files.
+
+`iter_json_array(path)` yields the elements of a top-level JSON array one at a
+time (incremental `raw_decode` over buffered chunks), so `master_registry.json`
+is never materialized as a whole document. `EmbeddingColumns` moves embedding
+lists into growing float32 buffers as records stream past and strips them from
+the record, and `project` keeps only the fields a caller asked for. Peak memory
+is the kept fields plus the float32 matrices instead of every JSON float as a
+Python object.
+"""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+import numpy as np
+
+CHUNK_CHARS = 1 << 20
+# record_key() needs these to fold segments, so projection always keeps them.
+KEY_FIELDS = ("original_path", "name_of_file", "filename", "id")
+_WHITESPACE = " \t\n\r"
+
+
+def iter_json_array(path: Path, chunk_chars: int = CHUNK_CHARS) -> Iterator[Any]:
+    """Yield the elements of the top-level JSON array in `path` one at a time."""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf = f.read(chunk_chars)
+        eof = not buf
+        pos = 0
+        started = False
+        while True:
+            while pos < len(buf) and (buf[pos] in _WHITESPACE or (started and buf[pos] == ",")):
+                pos += 1
+            if pos >= len(buf):
+                if eof:
+                    raise ValueError(f"{Path(path).name} ended before the closing ']'" if started else f"{Path(path).name} is empty")
+                buf, pos = f.read(chunk_chars), 0
+                eof = not buf
+                continue
+            if not started:
+                if buf[pos] != "[":
+                    raise ValueError(f"{Path(path).name} is not a list")
+                started = True
+                pos += 1
+                continue
+            if buf[pos] == "]":
+                return
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                end = None
+            if end is None or (end == len(buf) and not eof):
+                # Element straddles the chunk boundary: read at least as much again and retry.
+                more = "" if eof else f.read(max(chunk_chars, len(buf) - pos))
+                if not more:
+                    if end is None:
+                        raise ValueError(f"{Path(path).name} holds malformed JSON near character offset {pos}")
+                    eof = True
+                    continue
+                buf, pos = buf[pos:] + more, 0
+                continue
+            yield value
+            pos = end
+            if pos >= chunk_chars:
+                buf, pos = buf[pos:], 0
+
+
+def project(rec: dict[str, Any], fields: frozenset[str] | None) -> dict[str, Any]:
+    """`rec` restricted to `fields` plus KEY_FIELDS (`fields=None` keeps everything)."""
+    if fields is None:
+        return rec
+    return {key: value for key, value in rec.items() if key in fields or key in KEY_FIELDS}
+
+
+class EmbeddingColumns:
+    """Per-field float32 buffers filled row by row; the dimension is set by the first vector seen.
+
+    Vectors with another length or non-numeric values leave their row zeroed.
+    Buffers grow by doubling with `ndarray.resize` (realloc, zero-filled), so
+    the vectors never exist as a list of lists.
+    """
+
+    def __init__(self, fields: Iterable[str], capacity: int = 1024) -> None:
+        self.fields = tuple(fields)
+        self.count = 0
+        self._capacity = max(1, int(capacity))
+        self._buffers: dict[str, np.ndarray | None] = {field: None for field in self.fields}
+
+    def add(self, rec: dict[str, Any]) -> int:
+        """Move `rec`'s vector fields into row `count` (popping them from `rec`); returns the row."""
+        row = self.count
+        if row == self._capacity:
+            self._capacity *= 2
+            for buf in self._buffers.values():
+                if buf is not None:
+                    buf.resize((self._capacity, buf.shape[1]), refcheck=False)
+        for field in self.fields:
+            vec = rec.pop(field, None)
+            if not isinstance(vec, list) or not vec:
+                continue
+            buf = self._buffers[field]
+            if buf is None:
+                buf = self._buffers[field] = np.zeros((self._capacity, len(vec)), dtype=np.float32)
+            if len(vec) == buf.shape[1]:
+                try:
+                    buf[row] = vec
+                except (TypeError, ValueError):
+                    pass
+        self.count += 1
+        return row
+
+    def finish(self, order: np.ndarray | None = None) -> dict[str, np.ndarray]:
+        """Raw (un-normalized) matrices, rows taken in `order` (default: all rows as added).
+
+        Buffers are handed over, not copied, when `order` is the identity; the
+        columns must not be used afterwards.
+        """
+        identity = order is None or (len(order) == self.count and bool((order == np.arange(self.count)).all()))
+        out: dict[str, np.ndarray] = {}
+        for field, buf in self._buffers.items():
+            if buf is None:
+                out[field] = np.zeros((self.count if order is None else len(order), 0), dtype=np.float32)
+            elif identity:
+                buf.resize((self.count, buf.shape[1]), refcheck=False)
+                out[field] = buf
+            else:
+                out[field] = buf[order]
+        self._buffers = {field: None for field in self.fields}
+        return out
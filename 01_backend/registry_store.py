@@ -0,0 +1,272 @@
+"""
+Append-only segmented registry store.
+
+`master_registry.json` stays the compacted base and the public data contract.
+Consolidation and deletion never rewrite it: they append an immutable JSONL
+segment under `vectors/registry_segments/` holding upserts ("put") or
+tombstones ("delete"). Readers fold base + segments in order; compaction folds
+the pending segments back into the base and drops superseded/deleted records.
+The base is streamed record by record (`registry_reader`); `read_columns`
+returns embedding fields as float32 matrices instead of per-record lists.
+Every published segment rewrites a small stamp file, which other server
+processes poll to notice that the merged view changed.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+import numpy as np
+
+from file_lock import file_lock
+from registry_reader import EmbeddingColumns, iter_json_array, project
+
+BASE_FILENAME = "master_registry.json"
+DEFAULT_SEGMENTS_DIRNAME = "registry_segments"
+SEGMENT_GLOB = "seg_*.jsonl"
+STAMP_FILENAME = ".registry_stamp"
+MANIFEST_FILENAME = ".last_compaction.json"
+# Merged reads start over when a compaction unlinks a segment they listed.
+FOLD_ATTEMPTS = 5
+
+
+def record_key(rec: dict[str, Any], fallback: str) -> str:
+    # Key priority matches legacy consolidation:
+    # original_path (stable) > name_of_file > filename (legacy) > id > fallback.
+    return str(rec.get("original_path") or rec.get("name_of_file") or rec.get("filename") or rec.get("id") or fallback)
+
+
+class RegistryStore:
+    def __init__(self, vectors_dir: Path, segments_dirname: str = DEFAULT_SEGMENTS_DIRNAME) -> None:
+        self.vectors_dir = Path(vectors_dir)
+        self.base_path = self.vectors_dir / BASE_FILENAME
+        self.segments_dir = self.vectors_dir / segments_dirname
+        self._lock_path = self.segments_dir / ".compact.lock"
+        self.stamp_path = self.vectors_dir / STAMP_FILENAME
+        self.manifest_path = self.segments_dir / MANIFEST_FILENAME
+        self._compact_thread: threading.Thread | None = None
+        self._thread_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Writers (O(new entries))
+    # ------------------------------------------------------------------
+    def append_records(self, records: Iterable[dict[str, Any]]) -> Path | None:
+        return self._write_segment({"op": "put", "record": rec} for rec in records)
+
+    def append_deletions(self, filenames: Iterable[str]) -> Path | None:
+        return self._write_segment({"op": "delete", "name_of_file": name} for name in filenames if name)
+
+    def _write_segment(self, entries: Iterable[dict[str, Any]]) -> Path | None:
+        self.segments_dir.mkdir(parents=True, exist_ok=True)
+        name = f"seg_{time.time_ns():020d}_{os.getpid()}"
+        tmp_path = self.segments_dir / f"{name}.tmp"
+        count = 0
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+                count += 1
+        if count == 0:
+            tmp_path.unlink(missing_ok=True)
+            return None
+        final_path = self.segments_dir / f"{name}.jsonl"
+        # Atomic publish: readers never observe a half-written segment.
+        os.replace(tmp_path, final_path)
+        self.touch_stamp()
+        return final_path
+
+    def touch_stamp(self) -> None:
+        """Publish "<pid> <time_ns>" so other processes know the merged view changed."""
+        tmp_path = self.stamp_path.with_name(f"{STAMP_FILENAME}.{os.getpid()}.tmp")
+        tmp_path.write_text(f"{os.getpid()} {time.time_ns()}", encoding="utf-8")
+        os.replace(tmp_path, self.stamp_path)
+
+    def read_stamp(self) -> str:
+        try:
+            return self.stamp_path.read_text(encoding="utf-8")
+        except OSError:
+            return ""
+
+    # ------------------------------------------------------------------
+    # Readers (merged view)
+    # ------------------------------------------------------------------
+    def list_segments(self) -> list[Path]:
+        if not self.segments_dir.exists():
+            return []
+        return sorted(self.segments_dir.glob(SEGMENT_GLOB))
+
+    def iter_base(self) -> Iterator[dict[str, Any]]:
+        if not self.base_path.exists():
+            return
+        for rec in iter_json_array(self.base_path):
+            if isinstance(rec, dict):
+                yield rec
+
+    def read_base(self) -> list[dict[str, Any]]:
+        return list(self.iter_base())
+
+    def iter_segment_entries(self, segment: Path) -> Iterator[dict[str, Any]]:
+        with open(segment, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn tail line can only come from a crashed writer; skip it.
+                    continue
+                if isinstance(entry, dict):
+                    yield entry
+
+    def read_segment_records(self, segment: Path, fields: Iterable[str] | None = None) -> list[dict[str, Any]]:
+        """The records one segment upserts, in write order (no merge with base or other segments)."""
+        keep = None if fields is None else frozenset(fields)
+        return [
+            project(entry["record"], keep)
+            for entry in self.iter_segment_entries(segment)
+            if entry.get("op") == "put" and isinstance(entry.get("record"), dict)
+        ]
+
+    def read_records(self, fields: Iterable[str] | None = None) -> list[dict[str, Any]]:
+        """Merged records; `fields` limits each record to those keys (plus the key fields)."""
+        records, _, _ = self._fold_current(fields)
+        return records
+
+    def read_columns(self, vector_fields: Iterable[str], fields: Iterable[str] | None = None) -> tuple[list[dict[str, Any]], dict[str, np.ndarray]]:
+        """Merged records without `vector_fields`, plus one raw float32 matrix per vector field (row i = record i).
+
+        Missing or malformed vectors are zero rows.
+        """
+        records, rows, columns = self._fold_current(fields, tuple(vector_fields))
+        return records, columns.finish(np.array(rows, dtype=np.int64))
+
+    def _fold_current(
+        self, fields: Iterable[str] | None = None, vector_fields: tuple[str, ...] | None = None
+    ) -> tuple[list[dict[str, Any]], list[int], EmbeddingColumns | None]:
+        """Fold the base and the segments listed now.
+
+        A compaction replaces the base before unlinking the segments it folded,
+        so a listed segment that has vanished is already in the new base: the
+        read starts over from a fresh listing.
+        """
+        attempts = 0
+        while True:
+            columns = EmbeddingColumns(vector_fields) if vector_fields is not None else None
+            try:
+                records, rows = self._fold(self.list_segments(), fields, columns)
+                return records, rows, columns
+            except FileNotFoundError:
+                attempts += 1
+                if attempts == FOLD_ATTEMPTS:
+                    raise
+
+    def _fold(
+        self, segments: list[Path], fields: Iterable[str] | None = None, columns: EmbeddingColumns | None = None
+    ) -> tuple[list[dict[str, Any]], list[int]]:
+        keep = None if fields is None else frozenset(fields)
+        merged: dict[str, tuple[dict[str, Any], int]] = {}
+        keys_by_file: dict[str, set[str]] = {}
+
+        def put(rec: dict[str, Any], fallback: str) -> None:
+            key = record_key(rec, fallback)
+            row = columns.add(rec) if columns is not None else -1
+            rec = project(rec, keep)
+            previous = merged.get(key)
+            if previous is not None and previous[0].get("name_of_file"):
+                keys_by_file.get(previous[0]["name_of_file"], set()).discard(key)
+            merged[key] = (rec, row)
+            if rec.get("name_of_file"):
+                keys_by_file.setdefault(rec["name_of_file"], set()).add(key)
+
+        for i, rec in enumerate(self.iter_base()):
+            put(rec, str(i))
+
+        for segment in segments:
+            for lineno, entry in enumerate(self.iter_segment_entries(segment)):
+                op = entry.get("op")
+                if op == "put" and isinstance(entry.get("record"), dict):
+                    put(entry["record"], f"{segment.stem}:{lineno}")
+                elif op == "delete":
+                    for key in keys_by_file.pop(str(entry.get("name_of_file")), set()):
+                        merged.pop(key, None)
+
+        return [rec for rec, _ in merged.values()], [row for _, row in merged.values()]
+
+    # ------------------------------------------------------------------
+    # Compaction
+    # ------------------------------------------------------------------
+    def needs_compaction(self, min_segments: int = 1) -> bool:
+        return len(self.list_segments()) >= max(1, min_segments)
+
+    def compact(self) -> int | None:
+        """Fold pending segments into the base file. Returns the record count, or None if skipped."""
+        with file_lock(self._lock_path, blocking=False) as acquired:
+            if not acquired:
+                return None
+            segments = self.list_segments()
+            if not segments and self.base_path.exists():
+                return None
+            base_mtime = self.base_mtime_ns()
+            records, _ = self._fold(segments)
+            self.vectors_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.base_path.with_suffix(".json.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                # One record per line (not indent=2): a third of the size and cheap to stream back.
+                f.write("[\n")
+                for i, rec in enumerate(records):
+                    f.write((",\n" if i else "") + json.dumps(rec))
+                f.write("\n]\n")
+            os.replace(tmp_path, self.base_path)
+            self._write_manifest(base_mtime, segments)
+            # Folded segments are now redundant. A reader that listed one of them
+            # and finds it gone restarts from the new base (`_fold_current`).
+            for segment in segments:
+                segment.unlink(missing_ok=True)
+            return len(records)
+
+    def base_mtime_ns(self) -> int:
+        try:
+            return self.base_path.stat().st_mtime_ns
+        except OSError:
+            return 0
+
+    def _write_manifest(self, base_mtime: int, segments: list[Path]) -> None:
+        tmp_path = self.manifest_path.with_name(f"{MANIFEST_FILENAME}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps({"base_mtime_before": base_mtime, "segments": [segment.name for segment in segments]}), encoding="utf-8")
+        os.replace(tmp_path, self.manifest_path)
+
+    def folded_since(self, base_mtime: int) -> set[str] | None:
+        """Segment names the last compaction folded, if it replaced the base whose mtime was `base_mtime`.
+
+        None means the base changed in some other way (or more than once), so
+        a reader holding that base has to reload it.
+        """
+        try:
+            manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if manifest.get("base_mtime_before") != base_mtime:
+            return None
+        return set(manifest.get("segments", []))
+
+    def compact_async(self, min_segments: int = 1) -> threading.Thread | None:
+        with self._thread_lock:
+            if self._compact_thread is not None and self._compact_thread.is_alive():
+                return self._compact_thread
+            if not self.needs_compaction(min_segments):
+                return None
+            self._compact_thread = threading.Thread(target=self._compact_logged, daemon=True)
+            self._compact_thread.start()
+            return self._compact_thread
+
+    def _compact_logged(self) -> None:
+        try:
+            count = self.compact()
+            if count is not None:
+                print(f"[REGISTRY] Compaction complete. Base registry: {count} records.")
+        except Exception as exc:
+            print(f"[REGISTRY] Compaction failed: {exc}")
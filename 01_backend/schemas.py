@@ -2,20 +2,26 @@ from __future__ import annotations
 
 from typing import Any
 
+import numpy as np
 from pydantic import BaseModel, ConfigDict, Field, ValidationError
 
 
-class RegistryRecord(BaseModel):
+class RegistryMetadata(BaseModel):
+    """A registry record whose embeddings were streamed into matrices (`RegistryStore.read_columns`)."""
+
     model_config = ConfigDict(extra="allow")
 
     id: str = Field(min_length=1)
-    image_embedding: list[float] = Field(min_length=1)
     name_of_file: str | None = None
     final_category: str | None = None
     family_name: str | None = None
     provider: str | None = None
 
 
+class RegistryRecord(RegistryMetadata):
+    image_embedding: list[float] = Field(min_length=1)
+
+
 class GraphNodeModel(BaseModel):
     model_config = ConfigDict(extra="allow")
 
@@ -47,24 +53,112 @@ class GraphDataModel(BaseModel):
     nodes: list[GraphNodeModel] = Field(default_factory=list)
 
 
-def validate_registry_records(records: list[dict[str, Any]]) -> tuple[list[dict[str, Any]], int]:
+OPTIONAL_REGISTRY_STR_FIELDS = ("name_of_file", "final_category", "family_name", "provider")
+OPTIONAL_NODE_STR_FIELDS = ("img", "name", "final_category", "lod_label", "provider")
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _optional_str_fields_ok(obj: dict[str, Any], fields: tuple[str, ...]) -> bool:
+    return all(obj.get(field) is None or isinstance(obj[field], str) for field in fields)
+
+
+def registry_record_ok(rec: Any, require_embedding: bool = True) -> bool:
+    """Structural check mirroring RegistryRecord (RegistryMetadata without the embedding) without copying the record.
+
+    Only the first embedding value is type-checked here; dimension and
+    finiteness are checked vectorized once the vectors are stacked
+    (`embedding_store.dense_matrix` zeroes bad rows, `valid_rows` drops them).
+    """
+    if not isinstance(rec, dict):
+        return False
+    rec_id = rec.get("id")
+    emb = rec.get("image_embedding")
+    return (
+        isinstance(rec_id, str)
+        and bool(rec_id)
+        and (not require_embedding or (isinstance(emb, list) and len(emb) > 0 and _is_number(emb[0])))
+        and _optional_str_fields_ok(rec, OPTIONAL_REGISTRY_STR_FIELDS)
+    )
+
+
+def graph_node_ok(node: Any) -> bool:
+    if not isinstance(node, dict):
+        return False
+    node_id = node.get("id")
+    idx = node.get("idx")
+    return (
+        isinstance(node_id, str)
+        and bool(node_id)
+        and _is_number(node.get("x"))
+        and _is_number(node.get("y"))
+        and (idx is None or (isinstance(idx, int) and not isinstance(idx, bool)))
+        and isinstance(node.get("neighbors", []), list)
+        and _optional_str_fields_ok(node, OPTIONAL_NODE_STR_FIELDS)
+    )
+
+
+def validate_registry_records(
+    records: list[dict[str, Any]], strict: bool = False, require_embedding: bool = True
+) -> tuple[list[dict[str, Any]], int]:
+    """(valid records, skipped count).
+
+    The default fast path keeps structurally valid records as-is (no copy).
+    `strict=True` round-trips every record through the pydantic model.
+    `require_embedding=False` validates records whose vectors were already
+    moved into matrices (checked there with `valid_rows`).
+    """
+    if not strict:
+        valid = [rec for rec in records if registry_record_ok(rec, require_embedding)]
+        return valid, len(records) - len(valid)
+
+    model = RegistryRecord if require_embedding else RegistryMetadata
     valid: list[dict[str, Any]] = []
     skipped = 0
     for rec in records:
         try:
-            validated = RegistryRecord.model_validate(rec)
+            validated = model.model_validate(rec)
             valid.append(validated.model_dump())
         except ValidationError:
             skipped += 1
     return valid, skipped
 
 
-def validate_graph_data(graph_data: dict[str, Any]) -> tuple[dict[str, Any], int]:
-    skipped = 0
+def registry_records_mask(records: list[dict[str, Any]], strict: bool = False, require_embedding: bool = True) -> np.ndarray:
+    """Per-record validity, for filtering records together with their embedding matrix rows."""
+    if not strict:
+        return np.fromiter((registry_record_ok(rec, require_embedding) for rec in records), dtype=bool, count=len(records))
+    model = RegistryRecord if require_embedding else RegistryMetadata
+
+    def ok(rec: Any) -> bool:
+        try:
+            model.model_validate(rec)
+            return True
+        except ValidationError:
+            return False
+
+    return np.fromiter((ok(rec) for rec in records), dtype=bool, count=len(records))
+
+
+def valid_rows(matrix: np.ndarray) -> np.ndarray:
+    """Rows of a stacked embedding matrix that are finite and non-zero (one vectorized pass)."""
+    return np.isfinite(matrix).all(axis=1) & (np.abs(matrix).max(axis=1) > 0)
+
+
+def validate_graph_data(graph_data: dict[str, Any], strict: bool = False) -> tuple[dict[str, Any], int]:
     meta = graph_data.get("meta", {})
     nodes = graph_data.get("nodes", [])
-    valid_nodes: list[dict[str, Any]] = []
 
+    if not strict:
+        valid_nodes = [node for node in nodes if graph_node_ok(node)]
+        out = {"meta": dict(meta) if isinstance(meta, dict) else {}, "nodes": valid_nodes}
+        out["meta"]["count"] = len(valid_nodes)
+        return out, len(nodes) - len(valid_nodes)
+
+    skipped = 0
+    valid_nodes = []
     for node in nodes:
         try:
             validated = GraphNodeModel.model_validate(node)
@@ -0,0 +1,51 @@
+"""
+Hybrid image + caption-text scoring.
+
+Records carry two embeddings: SigLIP `image_embedding` (matched against the
+SigLIP text tower) and MiniLM `text_embedding` of the caption (matched
+against a MiniLM query embedding). `fuse_scores` combines both score vectors
+over the same candidate rows in one vectorized pass:
+
+- `image`: image scores only (the original ranking)
+- `weighted`: image_weight * image + (1 - image_weight) * text
+- `rrf`: reciprocal rank fusion, 1 / (rrf_k + rank) summed over both rankings
+
+`keyword_boosts` keeps the keyword boost in the same units: `image` and
+`weighted` scores are cosines and get KEYWORD_BOOST per matched term, while
+`rrf` scores top out at 2 / (rrf_k + 1) (~0.033), so keyword hits join as a
+third RRF ranking (by matched-term count) instead of swamping both others.
+`min_score` therefore compares against a cosine in `image` / `weighted` mode
+and against a fused RRF score (at most 3 / (rrf_k + 1)) in `rrf` mode.
+"""
+from __future__ import annotations
+
+import numpy as np
+
+from keyword_index import KEYWORD_BOOST
+
+FUSION_MODES = ("image", "weighted", "rrf")
+
+
+def ranks(scores: np.ndarray) -> np.ndarray:
+    """1-based rank of every entry (score desc, then position asc)."""
+    order = np.lexsort((np.arange(len(scores)), -scores))
+    out = np.empty(len(scores), dtype=np.int64)
+    out[order] = np.arange(1, len(scores) + 1)
+    return out
+
+
+def fuse_scores(image_scores: np.ndarray, text_scores: np.ndarray, mode: str, image_weight: float = 0.7, rrf_k: int = 60) -> np.ndarray:
+    if mode == "weighted":
+        return (image_weight * image_scores + (1.0 - image_weight) * text_scores).astype(np.float32)
+    if mode == "rrf":
+        return (1.0 / (rrf_k + ranks(image_scores)) + 1.0 / (rrf_k + ranks(text_scores))).astype(np.float32)
+    return image_scores
+
+
+def keyword_boosts(hit_counts: np.ndarray, mode: str, rrf_k: int = 60) -> np.ndarray:
+    """Score added to each keyword hit; in `rrf` mode hits with equal counts share a rank."""
+    if mode != "rrf":
+        return (KEYWORD_BOOST * hit_counts).astype(np.float32)
+    desc = np.sort(hit_counts)[::-1]
+    hit_ranks = 1 + np.searchsorted(-desc, -hit_counts, side="left")
+    return (1.0 / (rrf_k + hit_ranks)).astype(np.float32)
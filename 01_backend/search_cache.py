@@ -0,0 +1,64 @@
+"""
+In-memory caches for the search hot path.
+
+- L1 (`embeddings`): fused SigLIP query embedding keyed by (query, expansion, model id).
+- L2 (`results`): ranked page keyed by (query, expansion, page/filter options,
+  index generation). `BackendResources.generation` bumps whenever the
+  library changes, so entries from an older generation are never served.
+"""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class LRUCache:
+    """Thread-safe bounded LRU with hit/miss counters."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max(0, int(max_entries))
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.max_entries == 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+class SearchCache:
+    def __init__(self, embedding_entries: int = 4096, result_entries: int = 1024) -> None:
+        self.embeddings = LRUCache(embedding_entries)
+        self.results = LRUCache(result_entries)
+
+    def invalidate_results(self) -> None:
+        """Drop ranked pages (called on generation bump); query embeddings stay valid."""
+        self.results.clear()
+
+    def stats(self) -> dict[str, Any]:
+        return {"embeddings": self.embeddings.stats(), "results": self.results.stats()}
@@ -0,0 +1,66 @@
+"""
+Multi-process serving helpers (`wsgi.py` + `gunicorn.conf.py`).
+
+Each worker process loads the registry itself, but the bulky arrays are
+memory-mapped read-only from `00_data/vectors/` (the image/text matrices and
+the keyword postings), so the OS page cache holds them once for all workers.
+What each worker still owns is the query encoder: `plan_workers` caps the
+worker count so `workers x serving.encoder_mb` fits `serving.memory_budget_mb`,
+and `torch_threads` splits the cores between workers instead of letting every
+worker's BLAS pool claim all of them.
+
+Workers learn about writes made by other processes (uploads, deletes,
+pipeline consolidation) through the registry stamp, which a per-worker thread
+checks with `StampWatcher` every `serving.sync_interval_ms`.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from typing import Callable
+
+
+def _cpus() -> int:
+    # Cores this process may run on (container CPU sets), not the host's total.
+    return len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+
+
+def plan_workers(requested: int, cpu_count: int | None = None, memory_budget_mb: float = 0, encoder_mb: float = 0) -> int:
+    """Worker count: `requested` (0 = one per core), capped by the encoder memory budget."""
+    cpus = max(1, cpu_count or _cpus())
+    workers = int(requested) if int(requested) > 0 else cpus
+    if memory_budget_mb > 0 and encoder_mb > 0:
+        workers = min(workers, int(memory_budget_mb // encoder_mb))
+    return max(1, workers)
+
+
+def torch_threads(workers: int, cpu_count: int | None = None) -> int:
+    """Intra-op threads per worker so all workers together use each core once."""
+    return max(1, max(1, cpu_count or _cpus()) // max(1, workers))
+
+
+class StampWatcher:
+    """Remembers the last registry stamp seen and reports when it changes.
+
+    Stamps this process wrote count too: applying its own segments again is a
+    no-op, and skipping them could hide another process's earlier write.
+    """
+
+    def __init__(self, read: Callable[[], str]) -> None:
+        self.read = read
+        self._seen = ""
+        self._lock = threading.Lock()
+
+    def mark(self) -> None:
+        """Accept the current stamp as seen (call before reading the registry)."""
+        with self._lock:
+            self._seen = self.read()
+
+    def changed(self) -> bool:
+        """True once per new stamp."""
+        with self._lock:
+            stamp = self.read()
+            if stamp == self._seen:
+                return False
+            self._seen = stamp
+            return True
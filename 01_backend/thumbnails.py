@@ -0,0 +1,168 @@
+"""
+Thumbnail variants for final cut-out images.
+
+Variants live at `img/thumb/<size>/<filename>.webp` (longest side <= size,
+alpha kept), keyed on the full filename so `a.png` and `a.jpg` stay apart.
+The pipeline writes them during finalize; the backend fills gaps lazily
+through `ThumbnailCache`, which keeps the variant tree under a byte budget by
+evicting least recently served files.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable
+
+from PIL import Image
+
+DEFAULT_SIZES = (128, 256, 512)
+DEFAULT_QUALITY = 80
+# What Image.open / decode raise for truncated, corrupt or oversized sources.
+DECODE_ERRORS = (OSError, ValueError, SyntaxError, Image.DecompressionBombError)
+
+
+def variant_path(thumb_dir: Path, size: int, filename: str) -> Path:
+    return Path(thumb_dir) / str(size) / f"{Path(filename).name}.webp"
+
+
+def write_thumbnail(src: Path, dst: Path, size: int, quality: int = DEFAULT_QUALITY) -> Path:
+    """Downscale `src` into a WebP at `dst` (never upscales)."""
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    with Image.open(src) as img:
+        has_alpha = img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info)
+        thumb = img.convert("RGBA" if has_alpha else "RGB")
+        thumb.thumbnail((size, size), Image.LANCZOS)
+        # Unique per thread: threaded servers may encode the same variant concurrently.
+        tmp = dst.with_name(f"{dst.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            thumb.save(tmp, format="WEBP", quality=quality, method=4)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+    os.replace(tmp, dst)
+    return dst
+
+
+def write_thumbnail_variants(
+    src: Path,
+    thumb_dir: Path,
+    sizes: Iterable[int] = DEFAULT_SIZES,
+    quality: int = DEFAULT_QUALITY,
+) -> list[Path]:
+    return [write_thumbnail(Path(src), variant_path(thumb_dir, size, Path(src).name), size, quality) for size in sizes]
+
+
+def remove_thumbnail_variants(thumb_dir: Path, filename: str, sizes: Iterable[int] = DEFAULT_SIZES) -> list[Path]:
+    removed = []
+    for size in sizes:
+        path = variant_path(thumb_dir, size, filename)
+        if path.exists():
+            path.unlink()
+            removed.append(path)
+    return removed
+
+
+class ThumbnailCache:
+    """Lazily generated, size-bounded thumbnail variants for files in `img_dir`."""
+
+    def __init__(
+        self,
+        img_dir: Path,
+        thumb_dir: Path,
+        sizes: Iterable[int] = DEFAULT_SIZES,
+        max_bytes: int = 512 * 1024 * 1024,
+        quality: int = DEFAULT_QUALITY,
+    ) -> None:
+        self.img_dir = Path(img_dir)
+        self.thumb_dir = Path(thumb_dir)
+        self.sizes = tuple(int(s) for s in sizes)
+        self.max_bytes = int(max_bytes)
+        self.quality = int(quality)
+        self._lock = threading.Lock()
+        self._inflight: dict[Path, threading.Lock] = {}
+        self._entries: OrderedDict[Path, int] | None = None
+        self._total = 0
+
+    def _index(self) -> OrderedDict[Path, int]:
+        # Caller holds self._lock. Seeds LRU order from mtimes on first use.
+        if self._entries is None:
+            found = []
+            for size in self.sizes:
+                size_dir = self.thumb_dir / str(size)
+                if size_dir.is_dir():
+                    for path in size_dir.glob("*.webp"):
+                        st = path.stat()
+                        found.append((st.st_mtime_ns, path, st.st_size))
+            found.sort()
+            self._entries = OrderedDict((path, nbytes) for _, path, nbytes in found)
+            self._total = sum(self._entries.values())
+        return self._entries
+
+    def _record(self, path: Path) -> None:
+        with self._lock:
+            entries = self._index()
+            self._total -= entries.pop(path, 0)
+            nbytes = path.stat().st_size
+            entries[path] = nbytes
+            self._total += nbytes
+            while self._total > self.max_bytes and len(entries) > 1:
+                victim, victim_bytes = entries.popitem(last=False)
+                try:
+                    victim.unlink(missing_ok=True)
+                except OSError:
+                    # Still open by a response (Windows refuses the unlink); keep it for a later pass.
+                    entries[victim] = victim_bytes
+                    break
+                self._total -= victim_bytes
+
+    def _touch(self, path: Path) -> None:
+        with self._lock:
+            entries = self._index()
+            if path in entries:
+                entries.move_to_end(path)
+            else:
+                nbytes = path.stat().st_size
+                entries[path] = nbytes
+                self._total += nbytes
+
+    def get(self, size: int, filename: str) -> Path | None:
+        """Path of the `size` variant of `filename`, generating it if missing or stale.
+
+        Raises one of DECODE_ERRORS when the source image cannot be decoded.
+        """
+        if size not in self.sizes or Path(filename).name != filename:
+            return None
+        src = self.img_dir / filename
+        if not src.is_file():
+            return None
+        dst = variant_path(self.thumb_dir, size, filename)
+        try:
+            if dst.stat().st_mtime_ns >= src.stat().st_mtime_ns:
+                self._touch(dst)
+                return dst
+        except FileNotFoundError:
+            pass
+
+        with self._lock:
+            key_lock = self._inflight.setdefault(dst, threading.Lock())
+        with key_lock:
+            try:
+                if not dst.exists() or dst.stat().st_mtime_ns < src.stat().st_mtime_ns:
+                    write_thumbnail(src, dst, size, self.quality)
+                    print(f"[THUMBS] Generated {size}px variant for {filename}")
+                self._record(dst)
+            finally:
+                with self._lock:
+                    self._inflight.pop(dst, None)
+        return dst
+
+    def discard(self, filename: str) -> list[Path]:
+        """Remove every variant of `filename` (used on delete)."""
+        with self._lock:
+            removed = remove_thumbnail_variants(self.thumb_dir, filename, self.sizes)
+            if self._entries is not None:
+                for path in removed:
+                    self._total -= self._entries.pop(path, 0)
+        return removed
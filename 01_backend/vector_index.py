@@ -0,0 +1,360 @@
+"""
+Pluggable vector index over the L2-normalized image embedding matrix.
+
+- `ExactIndex`: brute-force inner product over every row (the original search path).
+- `IVFIndex`: CPU inverted-file index. Rows are bucketed by spherical k-means
+  centroids; a query scores only the rows in its `nprobe` nearest buckets
+  (exactly), trading recall for latency. Built at load time or loaded from a
+  persisted `.npz` whose fingerprint must match the current matrix.
+
+Both return exact inner products for the rows they touch, so scores stay
+comparable with the exact backend. With `search.quantization = "int8"` the
+first pass scans per-dimension int8 codes (4x smaller than float32) and only
+each query's top `search.rerank_candidates` rows (at least `depth`, the
+caller's offset + k) are re-scored exactly from the float32 matrix
+(memory-mapped by `embedding_store`) and returned as candidates. Rows below
+that cut are dropped rather than ranked on approximate scores, so paging and
+`min_score` only ever see exact scores; like IVF, the index is then no longer
+`complete` and `total` counts candidates.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from file_lock import file_lock
+
+IVF_FILENAME = "search_index_ivf.npz"
+ASSIGN_CHUNK = 8192
+SCAN_CHUNK = 4096
+DEFAULT_RERANK = 400
+
+
+def top_k(rows: np.ndarray, scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Best-first `k` of (rows, scores), via argpartition.
+
+    Order is total (score desc, then row asc), so every prefix is stable:
+    paging with a larger `k` never reorders earlier results.
+    """
+    if k <= 0:
+        return rows[:0], scores[:0]
+    if k < len(scores):
+        kth = scores[np.argpartition(scores, -k)[-k]]
+        keep = scores >= kth  # keep every tie at the boundary, the row tiebreak picks among them
+        rows, scores = rows[keep], scores[keep]
+    order = np.lexsort((rows, -scores))[:k]
+    return rows[order], scores[order]
+
+
+def matrix_fingerprint(matrix: np.ndarray, ids: list[str]) -> str:
+    digest = hashlib.sha1(f"{matrix.shape}".encode("utf-8"))
+    digest.update("\n".join(ids).encode("utf-8"))
+    stride = max(1, len(matrix) // 256)
+    digest.update(np.ascontiguousarray(matrix[::stride], dtype=np.float32).tobytes())
+    return digest.hexdigest()
+
+
+class Int8Codes:
+    """Symmetric int8 scalar quantization of a row matrix with one scale per dimension."""
+
+    def __init__(self, codes: np.ndarray, scales: np.ndarray) -> None:
+        self.codes = codes
+        self.scales = scales
+
+    @classmethod
+    def encode(cls, matrix: np.ndarray, scales: np.ndarray | None = None) -> "Int8Codes":
+        if scales is None:
+            scales = np.zeros(matrix.shape[1], dtype=np.float32)
+            for start in range(0, len(matrix), SCAN_CHUNK):
+                np.maximum(scales, np.abs(matrix[start:start + SCAN_CHUNK]).max(axis=0), out=scales)
+            scales = np.maximum(scales / 127.0, 1e-12).astype(np.float32)
+        codes = np.empty(matrix.shape, dtype=np.int8)
+        for start in range(0, len(matrix), SCAN_CHUNK):
+            codes[start:start + SCAN_CHUNK] = np.clip(np.rint(matrix[start:start + SCAN_CHUNK] / scales), -127, 127)
+        return cls(codes, scales)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def copy(self) -> "Int8Codes":
+        # append/remove replace the arrays, so sharing them with the copy is safe.
+        return Int8Codes(self.codes, self.scales)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.scales.nbytes
+
+    def scores(self, queries: np.ndarray, rows: np.ndarray | None = None) -> np.ndarray:
+        """Approximate (len(rows), len(queries)) inner products, upcasting one block of codes at a time."""
+        count = len(self.codes) if rows is None else len(rows)
+        scaled = np.ascontiguousarray((queries * self.scales).T, dtype=np.float32)
+        out = np.empty((count, len(queries)), dtype=np.float32)
+        for start in range(0, count, SCAN_CHUNK):
+            block = self.codes[start:start + SCAN_CHUNK] if rows is None else self.codes[rows[start:start + SCAN_CHUNK]]
+            out[start:start + SCAN_CHUNK] = block.astype(np.float32) @ scaled
+        return out
+
+    def append(self, matrix: np.ndarray) -> None:
+        """Encode rows of `matrix` past the current code count with the existing scales."""
+        if len(matrix) > len(self.codes):
+            self.codes = np.concatenate([self.codes, Int8Codes.encode(matrix[len(self.codes):], self.scales).codes])
+
+    def remove(self, rows: int | np.ndarray) -> None:
+        self.codes = np.delete(self.codes, rows, axis=0)
+
+
+def score_rows(
+    matrix: np.ndarray, codes: Int8Codes | None, rows: np.ndarray | None, queries: np.ndarray, rerank: int = DEFAULT_RERANK
+) -> list[tuple[np.ndarray, np.ndarray]]:
+    """Candidate (rows, exact scores) per query among `rows` (all rows when None), in one pass.
+
+    Exact float32 GEMM over every row without codes; with codes, an int8 scan
+    whose top `rerank` rows per query are re-scored in float32 and kept.
+    """
+    all_rows = np.arange(len(matrix)) if rows is None else rows
+    if codes is None:
+        score_matrix = (matrix if rows is None else matrix[rows]) @ queries.T
+        return [(all_rows, np.ascontiguousarray(score_matrix[:, j])) for j in range(len(queries))]
+    score_matrix = codes.scores(queries, rows)
+    out = []
+    for j, query in enumerate(queries):
+        column = score_matrix[:, j]
+        top = np.arange(len(column)) if rerank >= len(column) else np.argpartition(column, -rerank)[-rerank:]
+        top.sort()  # ascending positions keep memory-mapped reads mostly sequential
+        out.append((all_rows[top], (matrix[all_rows[top]] @ query).astype(np.float32)))
+    return out
+
+
+class ExactIndex:
+    """Scans every row (`exhaustive`); `complete` (every row comes back, in order) unless int8 codes cut the candidates."""
+
+    name = "exact"
+    exhaustive = True
+
+    def __init__(self, matrix: np.ndarray, codes: Int8Codes | None = None, rerank: int = DEFAULT_RERANK) -> None:
+        self.matrix = matrix
+        self.codes = codes
+        self.rerank = rerank
+
+    def __len__(self) -> int:
+        return len(self.matrix)
+
+    @property
+    def complete(self) -> bool:
+        return self.codes is None
+
+    def candidates(self, query: np.ndarray, depth: int = 0) -> tuple[np.ndarray, np.ndarray]:
+        """Rows worth scoring for `query` plus their exact scores (all of them without codes)."""
+        return self.candidates_many(query[None, :], depth)[0]
+
+    def candidates_many(self, queries: np.ndarray, depth: int = 0) -> list[tuple[np.ndarray, np.ndarray]]:
+        """`candidates` for several queries with one `matrix @ Q.T` (or one int8 scan)."""
+        return self.score_rows(None, queries, depth)
+
+    def score_rows(self, rows: np.ndarray | None, queries: np.ndarray, depth: int = 0) -> list[tuple[np.ndarray, np.ndarray]]:
+        return score_rows(self.matrix, self.codes, rows, queries, max(self.rerank, depth))
+
+    def search(self, query: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        return top_k(*self.candidates(query), k)
+
+    def copy(self) -> "ExactIndex":
+        """Index to mutate for a new snapshot; arrays are shared, never written in place."""
+        return ExactIndex(self.matrix, self.codes.copy() if self.codes is not None else None, self.rerank)
+
+    def add(self, matrix: np.ndarray) -> None:
+        self.matrix = matrix
+        if self.codes is not None:
+            self.codes.append(matrix)
+
+    def remove(self, rows: int | np.ndarray, matrix: np.ndarray) -> None:
+        self.matrix = matrix
+        if self.codes is not None:
+            self.codes.remove(rows)
+
+
+def _assign(matrix: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    out = np.empty(len(matrix), dtype=np.int64)
+    for start in range(0, len(matrix), ASSIGN_CHUNK):
+        out[start:start + ASSIGN_CHUNK] = np.argmax(matrix[start:start + ASSIGN_CHUNK] @ centroids.T, axis=1)
+    return out
+
+
+def train_centroids(matrix: np.ndarray, nlist: int, iters: int = 10, sample: int = 65536, seed: int = 42) -> np.ndarray:
+    """Spherical k-means on a row sample; empty clusters are re-seeded from random rows."""
+    rng = np.random.default_rng(seed)
+    train = matrix if len(matrix) <= sample else matrix[np.sort(rng.choice(len(matrix), sample, replace=False))]
+    centroids = train[rng.choice(len(train), nlist, replace=False)].copy()
+    for _ in range(iters):
+        labels = _assign(train, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, train)
+        counts = np.bincount(labels, minlength=nlist)
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = train[rng.choice(len(train), int(empty.sum()), replace=False)]
+        centroids = sums / (np.linalg.norm(sums, axis=1, keepdims=True) + 1e-8)
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    name = "ivf"
+    exhaustive = False
+    complete = False
+
+    def __init__(
+        self,
+        matrix: np.ndarray,
+        centroids: np.ndarray,
+        list_offsets: np.ndarray,
+        list_rows: np.ndarray,
+        nprobe: int,
+        codes: Int8Codes | None = None,
+        rerank: int = DEFAULT_RERANK,
+    ) -> None:
+        self.matrix = matrix
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_rows = list_rows
+        self.nprobe = max(1, min(int(nprobe), len(centroids)))
+        self.codes = codes
+        self.rerank = rerank
+
+    def __len__(self) -> int:
+        return len(self.matrix)
+
+    @classmethod
+    def build(cls, matrix: np.ndarray, nlist: int = 0, nprobe: int = 16, iters: int = 10, sample: int = 65536) -> "IVFIndex":
+        if nlist <= 0:
+            nlist = int(4 * np.sqrt(len(matrix)))
+        nlist = max(1, min(nlist, len(matrix)))
+        centroids = train_centroids(matrix, nlist, iters, sample)
+        labels = _assign(matrix, centroids)
+        list_rows = np.argsort(labels, kind="stable").astype(np.int64)
+        list_offsets = np.zeros(nlist + 1, dtype=np.int64)
+        list_offsets[1:] = np.cumsum(np.bincount(labels, minlength=nlist))
+        return cls(matrix, centroids, list_offsets, list_rows, nprobe)
+
+    def candidates(self, query: np.ndarray, depth: int = 0) -> tuple[np.ndarray, np.ndarray]:
+        probe = np.argpartition(self.centroids @ query, -self.nprobe)[-self.nprobe:] if self.nprobe < len(self.centroids) else np.arange(len(self.centroids))
+        rows = np.concatenate([self.list_rows[self.list_offsets[c]:self.list_offsets[c + 1]] for c in probe])
+        return self.score_rows(rows, query[None, :], depth)[0]
+
+    def score_rows(self, rows: np.ndarray | None, queries: np.ndarray, depth: int = 0) -> list[tuple[np.ndarray, np.ndarray]]:
+        return score_rows(self.matrix, self.codes, rows, queries, max(self.rerank, depth))
+
+    def search(self, query: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        return top_k(*self.candidates(query), k)
+
+    def copy(self) -> "IVFIndex":
+        """Index to mutate for a new snapshot; arrays are shared, never written in place."""
+        codes = self.codes.copy() if self.codes is not None else None
+        return IVFIndex(self.matrix, self.centroids, self.list_offsets, self.list_rows, self.nprobe, codes, self.rerank)
+
+    def add(self, matrix: np.ndarray) -> None:
+        """Assign rows appended to `matrix` since the last build/add to their nearest lists."""
+        start = len(self.list_rows)
+        labels = np.concatenate([
+            np.repeat(np.arange(len(self.centroids)), np.diff(self.list_offsets)),
+            _assign(matrix[start:], self.centroids),
+        ])
+        rows = np.concatenate([self.list_rows, np.arange(start, len(matrix), dtype=np.int64)])
+        order = np.argsort(labels, kind="stable")
+        self.list_rows = rows[order]
+        offsets = np.zeros(len(self.centroids) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(labels, minlength=len(self.centroids)))
+        self.list_offsets = offsets
+        self.matrix = matrix
+        if self.codes is not None:
+            self.codes.append(matrix)
+
+    def remove(self, rows: int | np.ndarray, matrix: np.ndarray) -> None:
+        """Drop `rows` and renumber the survivors (mirrors np.delete on the matrix) in one pass."""
+        dropped = np.zeros(len(self.list_rows), dtype=bool)
+        dropped[rows] = True
+        remap = np.cumsum(~dropped) - 1
+        keep = ~dropped[self.list_rows]
+        labels = np.repeat(np.arange(len(self.centroids)), np.diff(self.list_offsets))[keep]
+        self.list_rows = remap[self.list_rows[keep]]
+        offsets = np.zeros(len(self.centroids) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(labels, minlength=len(self.centroids)))
+        self.list_offsets = offsets
+        self.matrix = matrix
+        if self.codes is not None:
+            self.codes.remove(rows)
+
+    def save(self, path: Path, fingerprint: str) -> None:
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp.npz")
+        np.savez(tmp, centroids=self.centroids, list_offsets=self.list_offsets, list_rows=self.list_rows, fingerprint=np.array(fingerprint))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path, matrix: np.ndarray, fingerprint: str, nprobe: int) -> "IVFIndex | None":
+        with np.load(path) as data:
+            if str(data["fingerprint"]) != fingerprint:
+                return None
+            return cls(matrix, data["centroids"], data["list_offsets"], data["list_rows"], nprobe)
+
+
+def build_vector_index(matrix: np.ndarray, ids: list[str], cfg: dict[str, Any], vectors_dir: Path | None = None) -> ExactIndex | IVFIndex:
+    """Pick and prepare the backend from the `search` config section."""
+    backend = str(cfg.get("index_backend", "auto")).lower()
+    if backend == "auto":
+        backend = "ivf" if len(matrix) >= int(cfg.get("ivf_min_items", 20000)) else "exact"
+    rerank = int(cfg.get("rerank_candidates", DEFAULT_RERANK))
+    codes = None
+    if str(cfg.get("quantization", "none")).lower() == "int8":
+        codes = Int8Codes.encode(matrix)
+        print(f"[INDEX] int8 codes: {codes.nbytes / 2**20:.1f} MiB (float32 {matrix.nbytes / 2**20:.1f} MiB), re-ranking top {rerank}")
+    if backend != "ivf":
+        return ExactIndex(matrix, codes, rerank)
+
+    nprobe = int(cfg.get("ivf_nprobe", 16))
+    if vectors_dir is None:
+        index = _build_ivf(matrix, cfg, nprobe)
+    else:
+        # One server worker trains and saves the index; the others wait and load it.
+        with file_lock(Path(vectors_dir) / "search_index_ivf.lock", timeout=600):
+            index = _load_or_build_ivf(matrix, ids, cfg, nprobe, Path(vectors_dir) / IVF_FILENAME)
+    index.codes, index.rerank = codes, rerank
+    return index
+
+
+def _load_or_build_ivf(matrix: np.ndarray, ids: list[str], cfg: dict[str, Any], nprobe: int, path: Path) -> IVFIndex:
+    fingerprint = matrix_fingerprint(matrix, ids)
+    if path.exists():
+        try:
+            index = IVFIndex.load(path, matrix, fingerprint, nprobe)
+            if index is not None:
+                print(f"[INDEX] Loaded IVF index ({len(index.centroids)} lists, nprobe={index.nprobe}) from {path.name}")
+                return index
+        except Exception as exc:
+            print(f"[INDEX] Could not load {path.name} ({exc}); rebuilding.")
+    index = _build_ivf(matrix, cfg, nprobe)
+    index.save(path, fingerprint)
+    return index
+
+
+def _build_ivf(matrix: np.ndarray, cfg: dict[str, Any], nprobe: int) -> IVFIndex:
+    index = IVFIndex.build(
+        matrix,
+        nlist=int(cfg.get("ivf_nlist", 0)),
+        nprobe=nprobe,
+        iters=int(cfg.get("ivf_train_iters", 10)),
+        sample=int(cfg.get("ivf_train_sample", 65536)),
+    )
+    print(f"[INDEX] Built IVF index ({len(index.centroids)} lists, nprobe={index.nprobe}) over {len(matrix)} rows")
+    return index
+
+
+def recall_at_k(index: ExactIndex | IVFIndex, queries: np.ndarray, k: int) -> float:
+    """Mean overlap of `index` top-k with exact top-k over `queries`."""
+    exact = ExactIndex(index.matrix)
+    hits = 0
+    for q in queries:
+        truth = set(exact.search(q, k)[0].tolist())
+        hits += len(truth.intersection(index.search(q, k)[0].tolist()))
+    return hits / max(1, len(queries) * min(k, len(index)))
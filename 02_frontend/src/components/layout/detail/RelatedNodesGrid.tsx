@@ -1,6 +1,6 @@
 import type { GraphNode } from '@/types/graph';
 import { getCategoryColor } from '@/lib/colors';
-import { getNodeImageUrl } from '@/lib/helpers';
+import { getNodeThumbUrl } from '@/lib/helpers';
 import DetailImage from '@/components/ui/DetailImage';
 
 interface RelatedNodesGridProps {
@@ -45,7 +45,7 @@ export default function RelatedNodesGrid({ node, nodes, onSelectNode }: RelatedN
                 onMouseEnter={(e) => { e.currentTarget.style.borderColor = nCatColor; }}
                 onMouseLeave={(e) => { e.currentTarget.style.borderColor = ''; }}
               >
-                <DetailImage src={getNodeImageUrl(neighbor)} />
+                <DetailImage src={getNodeThumbUrl(neighbor, 256)} />
               </div>
               <div
                 className="absolute bottom-full left-1/2 -translate-x-1/2 mb-2 w-32 text-white text-[9px] font-black p-2 rounded-lg opacity-0 pointer-events-none group-hover:opacity-100 transition-all duration-300 z-10 shadow-xl text-center uppercase tracking-tighter"
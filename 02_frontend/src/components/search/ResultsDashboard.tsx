@@ -67,7 +67,7 @@ export default function ResultsDashboard({ results, onClose, onLocate }: Results
           const filename = rawPath.includes('/') || rawPath.includes('\\') 
             ? rawPath.split(/[\\/]/).pop() 
             : rawPath;
-          const thumbUrl = `http://localhost:5000/img/${filename}`;
+          const thumbUrl = `http://localhost:5000/img/thumb/256/${filename}`;
 
           return (
             <div key={rec.id} className="bg-secondary/5 rounded-2xl p-3 flex gap-4 hover:bg-white hover:shadow-xl transition-all duration-300 border border-transparent hover:border-accent/20 group">
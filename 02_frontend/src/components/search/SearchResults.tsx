@@ -1,6 +1,6 @@
 import { useState } from 'react';
 import type { GraphNode, SearchResult } from '@/types/graph';
-import { getNodeImageUrl } from '@/lib/helpers';
+import { getNodeThumbUrl } from '@/lib/helpers';
 import { getCategoryColor } from '@/lib/colors';
 import DetailImage from '@/components/ui/DetailImage';
 import { ChevronLeft, ChevronRight, Filter, Layers, X } from 'lucide-react';
@@ -123,7 +123,7 @@ export default function SearchResults({
             <div className="absolute top-4 -left-1.5 w-3 h-3 bg-white/95 border-l border-b border-white/60 rotate-45" />
 
             <div className="aspect-video w-full rounded-xl overflow-hidden bg-bg border border-secondary/20 shadow-inner mb-3">
-                <DetailImage src={getNodeImageUrl(hovered.node)} />
+                <DetailImage src={getNodeThumbUrl(hovered.node, 512)} />
             </div>
             
             <div className="flex flex-col gap-1">
@@ -180,7 +180,7 @@ function renderItem(
             ? 'border border-primary/40' // Inner border for group items
             : 'border border-secondary/80 group-hover:border-primary'
         }`}>
-          <DetailImage src={getNodeImageUrl(node)} />
+          <DetailImage src={getNodeThumbUrl(node, 128)} />
         </div>
         
         <div 
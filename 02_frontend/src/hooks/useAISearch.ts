@@ -21,10 +21,10 @@ export function useAISearch(): AISearchState {
     }
     setIsSearching(true);
     try {
-      const data = await fetchSearch(query);
+      // Top 100 results ordered by confidence (backend sorts and pages them)
+      const data = await fetchSearch(query, { k: 100 });
       if (data.results) {
-        // Show top 100 results ordered by confidence (backend sorts them)
-        setAiResults(data.results.slice(0, 100));
+        setAiResults(data.results);
       }
     } catch (err) {
       console.error('AI Search Error:', err);
@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react';
 import type { GraphNode } from '@/types/graph';
-import { fetchGraphData } from '@/services/api';
+import { fetchGraphColumns, fetchGraphData, fetchGraphMetadata } from '@/services/api';
+import { columnsToNodes, mergeNodeMetadata } from '@/lib/graphColumns';
 import { dedupeNodes, removeNodeAndRebuildNeighbors } from '@/lib/graphNodeOps';
 
 interface GraphDataState {
@@ -15,16 +16,26 @@ export function useGraphData(): GraphDataState {
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
-    fetchGraphData()
-      .then(data => {
+    const loadJson = () =>
+      fetchGraphData().then(data => {
         if (!data?.nodes) throw new Error('Invalid data');
         setNodes(dedupeNodes(data.nodes as GraphNode[]));
-        setLoading(false);
+      });
+
+    // Prefer the compact binary columns for first paint; display metadata is merged when it arrives.
+    fetchGraphColumns()
+      .then(columns => {
+        setNodes(dedupeNodes(columnsToNodes(columns)));
+        fetchGraphMetadata()
+          .then(metadata => setNodes(prev => dedupeNodes(mergeNodeMetadata(prev, metadata))))
+          .catch(err => console.error('Metadata load failed:', err));
       })
       .catch(err => {
-        console.error('Load failed:', err);
-        setLoading(false);
-      });
+        console.warn('Binary graph unavailable, falling back to JSON:', err);
+        return loadJson();
+      })
+      .catch(err => console.error('Load failed:', err))
+      .finally(() => setLoading(false));
   }, []);
 
   const removeNode = (id: string) => {
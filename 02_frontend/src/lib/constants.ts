@@ -7,7 +7,10 @@ function withApiBase(path: string): string {
 
 /** API & data endpoints */
 export const DATA_URL = withApiBase("/vectors/graph_data.json");
+export const GRAPH_COLUMNS_URL = withApiBase("/api/graph/columns");
+export const GRAPH_METADATA_URL = withApiBase("/api/graph/metadata");
 export const SEARCH_API = withApiBase("/api/search");
 export const ANALYZE_API = withApiBase("/api/analyze_batch");
 export const PIPELINE_API = withApiBase("/api/run/local_pipeline");
 export const DELETE_IMAGE_API = withApiBase("/api/delete/image");
+export const DELETE_BATCH_API = withApiBase("/api/delete/batch");
@@ -0,0 +1,128 @@
+import type { GraphNode } from '@/types/graph';
+import type { GraphNodeMetadata } from '@/types/api';
+
+/**
+ * Decoder for the columnar binary graph payload (`/api/graph/columns`).
+ * Layout: "LODG" | uint32 version | uint32 headerLen | header JSON | 8-byte aligned columns.
+ */
+
+const MAGIC = 'LODG';
+const SUPPORTED_VERSION = 1;
+
+interface ColumnSpec {
+  dtype: string;
+  offset: number;
+  length: number;
+  dictionary?: string[];
+}
+
+interface ColumnsHeader {
+  count: number;
+  meta?: Record<string, unknown>;
+  columns: Record<string, ColumnSpec>;
+}
+
+type ColumnArray = Float32Array | Int32Array | Uint8Array | Uint16Array | Uint32Array;
+
+export interface GraphColumns {
+  count: number;
+  meta: Record<string, unknown>;
+  ids: string[];
+  x: Float32Array;
+  y: Float32Array;
+  neighborOffsets: Int32Array;
+  neighbors: Int32Array;
+  categorical: Record<string, { codes: Uint16Array | Uint32Array; dictionary: string[] }>;
+}
+
+function columnView(buffer: ArrayBuffer, base: number, spec: ColumnSpec): ColumnArray {
+  const offset = base + spec.offset;
+  switch (spec.dtype) {
+    case 'float32': return new Float32Array(buffer, offset, spec.length);
+    case 'int32': return new Int32Array(buffer, offset, spec.length);
+    case 'uint8': return new Uint8Array(buffer, offset, spec.length);
+    case 'uint16': return new Uint16Array(buffer, offset, spec.length);
+    case 'uint32': return new Uint32Array(buffer, offset, spec.length);
+    default: throw new Error(`Unsupported column dtype: ${spec.dtype}`);
+  }
+}
+
+/** Decode the binary payload into zero-copy typed array views. */
+export function decodeGraphColumns(buffer: ArrayBuffer): GraphColumns {
+  const bytes = new Uint8Array(buffer);
+  if (String.fromCharCode(...bytes.subarray(0, 4)) !== MAGIC) {
+    throw new Error('Invalid graph payload');
+  }
+  const view = new DataView(buffer);
+  const version = view.getUint32(4, true);
+  if (version !== SUPPORTED_VERSION) {
+    throw new Error(`Unsupported graph payload version: ${version}`);
+  }
+  const headerLen = view.getUint32(8, true);
+  const decoder = new TextDecoder();
+  const header = JSON.parse(decoder.decode(bytes.subarray(12, 12 + headerLen))) as ColumnsHeader;
+  const base = 12 + headerLen;
+
+  const column = (name: string): ColumnArray => {
+    const spec = header.columns[name];
+    if (!spec) throw new Error(`Missing graph column: ${name}`);
+    return columnView(buffer, base, spec);
+  };
+
+  const idOffsets = column('id_offsets') as Int32Array;
+  const idBytes = column('id_bytes') as Uint8Array;
+  const ids = new Array<string>(header.count);
+  for (let i = 0; i < header.count; i++) {
+    ids[i] = decoder.decode(idBytes.subarray(idOffsets[i], idOffsets[i + 1]));
+  }
+
+  const categorical: GraphColumns['categorical'] = {};
+  for (const [name, spec] of Object.entries(header.columns)) {
+    if (spec.dictionary) {
+      categorical[name] = { codes: columnView(buffer, base, spec) as Uint16Array | Uint32Array, dictionary: spec.dictionary };
+    }
+  }
+
+  return {
+    count: header.count,
+    meta: header.meta ?? {},
+    ids,
+    x: column('x') as Float32Array,
+    y: column('y') as Float32Array,
+    neighborOffsets: column('neighbor_offsets') as Int32Array,
+    neighbors: column('neighbors') as Int32Array,
+    categorical,
+  };
+}
+
+/** Build renderable nodes from columns; display metadata is merged later. */
+export function columnsToNodes(columns: GraphColumns): GraphNode[] {
+  const label = (name: string, i: number): string | undefined => {
+    const col = columns.categorical[name];
+    return col ? col.dictionary[col.codes[i]] : undefined;
+  };
+
+  const nodes = new Array<GraphNode>(columns.count);
+  for (let i = 0; i < columns.count; i++) {
+    nodes[i] = {
+      id: columns.ids[i],
+      name: columns.ids[i],
+      x: columns.x[i],
+      y: columns.y[i],
+      neighbors: Array.from(columns.neighbors.subarray(columns.neighborOffsets[i], columns.neighborOffsets[i + 1])),
+      final_category: label('final_category', i),
+      lod_label: label('lod_label', i),
+      provider: label('provider', i),
+    };
+  }
+  return nodes;
+}
+
+/** Merge the display-only metadata blob into already rendered nodes (matched by id). */
+export function mergeNodeMetadata(nodes: GraphNode[], metadata: GraphNodeMetadata[]): GraphNode[] {
+  const byId = new Map(metadata.map(m => [m.id, m]));
+  return nodes.map(node => {
+    const extra = byId.get(node.id);
+    return extra ? { ...node, ...extra } : node;
+  });
+}
@@ -20,3 +20,9 @@ export const getNodeImageUrl = (node: { img?: string; name_of_file?: string }):
   const filename = (node.img || node.name_of_file || '').split('/').pop() || '';
   return `/img/${filename}`;
 };
+
+/** Get a resized WebP thumbnail URL (128, 256 or 512 px) for a node. */
+export const getNodeThumbUrl = (node: { img?: string; name_of_file?: string }, size: 128 | 256 | 512 = 256): string => {
+  const filename = (node.img || node.name_of_file || '').split('/').pop() || '';
+  return `/img/thumb/${size}/${filename}`;
+};
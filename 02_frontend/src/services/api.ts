@@ -1,7 +1,19 @@
-import { ANALYZE_API, DATA_URL, DELETE_IMAGE_API, PIPELINE_API, SEARCH_API } from '@/lib/constants';
+import {
+  ANALYZE_API,
+  DATA_URL,
+  DELETE_BATCH_API,
+  DELETE_IMAGE_API,
+  GRAPH_COLUMNS_URL,
+  GRAPH_METADATA_URL,
+  PIPELINE_API,
+  SEARCH_API,
+} from '@/lib/constants';
+import { decodeGraphColumns, type GraphColumns } from '@/lib/graphColumns';
 import type {
   AnalyzeBatchResponse,
+  DeleteBatchResponse,
   GraphDataResponse,
+  GraphNodeMetadata,
   PipelineRunResponse,
   SearchResponse,
 } from '@/types/api';
@@ -18,8 +30,39 @@ export async function fetchGraphData(): Promise<GraphDataResponse> {
   return parseJsonResponse<GraphDataResponse>(res);
 }
 
-export async function fetchSearch(query: string): Promise<SearchResponse> {
-  const res = await fetch(`${SEARCH_API}?q=${encodeURIComponent(query)}`);
+export async function fetchGraphColumns(): Promise<GraphColumns> {
+  const res = await fetch(GRAPH_COLUMNS_URL);
+  if (!res.ok) {
+    throw new Error(`HTTP ${res.status}`);
+  }
+  return decodeGraphColumns(await res.arrayBuffer());
+}
+
+export async function fetchGraphMetadata(): Promise<GraphNodeMetadata[]> {
+  const res = await fetch(GRAPH_METADATA_URL);
+  return parseJsonResponse<GraphNodeMetadata[]>(res);
+}
+
+export type SearchFacet = 'final_category' | 'lod_label' | 'provider' | 'family_name';
+
+export interface SearchOptions {
+  k?: number;
+  offset?: number;
+  minScore?: number;
+  fields?: string[];
+  filters?: Partial<Record<SearchFacet, string[]>>;
+}
+
+export async function fetchSearch(query: string, options: SearchOptions = {}): Promise<SearchResponse> {
+  const params = new URLSearchParams({ q: query });
+  if (options.k !== undefined) params.set('k', String(options.k));
+  if (options.offset !== undefined) params.set('offset', String(options.offset));
+  if (options.minScore !== undefined) params.set('min_score', String(options.minScore));
+  if (options.fields?.length) params.set('fields', options.fields.join(','));
+  Object.entries(options.filters ?? {}).forEach(([facet, values]) => {
+    values?.forEach(value => params.append(facet, value));
+  });
+  const res = await fetch(`${SEARCH_API}?${params.toString()}`);
   return parseJsonResponse<SearchResponse>(res);
 }
 
@@ -52,3 +95,13 @@ export async function deleteImage(filename: string): Promise<Response> {
     body: JSON.stringify({ filename }),
   });
 }
+
+/** Delete many images in one request; each entry of `results` reports its own outcome. */
+export async function deleteImages(items: { filenames?: string[]; ids?: string[] }): Promise<DeleteBatchResponse> {
+  const res = await fetch(DELETE_BATCH_API, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ filenames: items.filenames ?? [], ids: items.ids ?? [] }),
+  });
+  return parseJsonResponse<DeleteBatchResponse>(res);
+}
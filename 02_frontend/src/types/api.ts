@@ -5,10 +5,17 @@ export interface GraphDataResponse {
   nodes: GraphNode[];
 }
 
+/** Display-only node fields served separately from the binary graph columns. */
+export type GraphNodeMetadata = Partial<GraphNode> & { id: string };
+
 export interface SearchResponse {
   query: string;
   expandedQuery: string;
   results: SearchResult[];
+  offset?: number;
+  k?: number;
+  total?: number;
+  nextOffset?: number | null;
 }
 
 export interface PipelineRecord {
@@ -29,6 +36,21 @@ export interface PipelineRunResponse {
   results?: PipelineRecord[];
 }
 
+export interface DeleteBatchItemResult {
+  item: string;
+  filename?: string;
+  success: boolean;
+  error?: string;
+  files?: string[];
+  memory_updated?: boolean;
+}
+
+export interface DeleteBatchResponse {
+  success: boolean;
+  deleted: number;
+  results: DeleteBatchItemResult[];
+}
+
 export interface AnalyzeBatchResponse {
   analysis: string;
 }
@@ -26,6 +26,8 @@ export interface GraphNode {
 export interface SearchResult {
   id: string;
   score: number;
+  /** Record fields requested via `fields=` projection. */
+  [field: string]: unknown;
 }
 
 // ── Layout Mode ──
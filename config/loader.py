@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import json
 import os
+import re
 from pathlib import Path
 from typing import Any
 
@@ -31,6 +32,8 @@ def _coerce_env_value(value: str) -> Any:
         return lowered == "true"
     if lowered.isdigit() or (lowered.startswith("-") and lowered[1:].isdigit()):
         return int(lowered)
+    if re.fullmatch(r"-?(\d+\.\d*|\.\d+)", lowered):
+        return float(lowered)
     return value
 
 
@@ -63,6 +66,37 @@ def _apply_env_overrides(cfg: dict[str, Any]) -> dict[str, Any]:
         "LOD_MODEL_SAM": ("models", "sam"),
         "LOD_MODEL_SENTENCE_TRANSFORMER": ("models", "sentence_transformer"),
         "LOD_MODEL_OPENAI": ("models", "openai_model"),
+        "LOD_REGISTRY_SEGMENTS_DIRNAME": ("registry", "segments_dirname"),
+        "LOD_REGISTRY_COMPACT_MIN_SEGMENTS": ("registry", "compact_min_segments"),
+        "LOD_REGISTRY_STRICT_VALIDATION": ("registry", "strict_validation"),
+        "LOD_REGISTRY_TOMBSTONE_COMPACT_ROWS": ("registry", "tombstone_compact_rows"),
+        "LOD_REGISTRY_COMPACTION_DELAY_MS": ("registry", "compaction_delay_ms"),
+        "LOD_GRAPH_REFIT_GROWTH_RATIO": ("graph", "refit_growth_ratio"),
+        "LOD_GRAPH_REFIT_DRIFT_RATIO": ("graph", "refit_drift_ratio"),
+        "LOD_GRAPH_TILES_MAX_ZOOM": ("graph", "tiles_max_zoom"),
+        "LOD_GRAPH_TILES_CELL_BITS": ("graph", "tiles_cell_bits"),
+        "LOD_SEARCH_MAX_K": ("search", "max_k"),
+        "LOD_SEARCH_MICROBATCH_WINDOW_MS": ("search", "microbatch_window_ms"),
+        "LOD_SEARCH_MICROBATCH_MAX_BATCH": ("search", "microbatch_max_batch"),
+        "LOD_SEARCH_INDEX_BACKEND": ("search", "index_backend"),
+        "LOD_SEARCH_FUSION": ("search", "fusion"),
+        "LOD_SEARCH_QUANTIZATION": ("search", "quantization"),
+        "LOD_SEARCH_RERANK_CANDIDATES": ("search", "rerank_candidates"),
+        "LOD_SEARCH_IVF_MIN_ITEMS": ("search", "ivf_min_items"),
+        "LOD_SEARCH_IVF_NLIST": ("search", "ivf_nlist"),
+        "LOD_SEARCH_IVF_NPROBE": ("search", "ivf_nprobe"),
+        "LOD_EXPANSION_CACHE_MAX_ENTRIES": ("expansion", "cache_max_entries"),
+        "LOD_EXPANSION_CACHE_TTL_HOURS": ("expansion", "cache_ttl_hours"),
+        "LOD_EXPANSION_CACHE_SAVE_DELAY_MS": ("expansion", "cache_save_delay_ms"),
+        "LOD_EXPANSION_BUDGET_MS": ("expansion", "budget_ms"),
+        "LOD_SERVING_SERVER": ("serving", "server"),
+        "LOD_SERVING_BIND": ("serving", "bind"),
+        "LOD_SERVING_WORKERS": ("serving", "workers"),
+        "LOD_SERVING_THREADS": ("serving", "threads"),
+        "LOD_SERVING_MEMORY_BUDGET_MB": ("serving", "memory_budget_mb"),
+        "LOD_SERVING_ENCODER_MB": ("serving", "encoder_mb"),
+        "LOD_THUMBNAILS_QUALITY": ("thumbnails", "quality"),
+        "LOD_THUMBNAILS_CACHE_MAX_MB": ("thumbnails", "cache_max_mb"),
     }
 
     out = json.loads(json.dumps(cfg))
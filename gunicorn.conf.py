@@ -0,0 +1,35 @@
+"""
+Gunicorn settings for `gunicorn -c gunicorn.conf.py wsgi:app`, read from the `serving` config section.
+
+The app is not preloaded: CUDA contexts and torch thread pools do not survive
+fork(), so every worker loads after forking and shares the search arrays
+through the page cache instead.
+"""
+from __future__ import annotations
+
+import os
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent
+for path in (ROOT_DIR, ROOT_DIR / "01_backend"):
+    if str(path) not in sys.path:
+        sys.path.append(str(path))
+
+from config import load_config  # noqa: E402
+from serving import plan_workers  # noqa: E402
+
+SERVING = load_config(ROOT_DIR).get("serving", {})
+
+bind = str(SERVING.get("bind", "0.0.0.0:5000"))
+workers = plan_workers(
+    int(SERVING.get("workers", 0)),
+    memory_budget_mb=float(SERVING.get("memory_budget_mb", 0)),
+    encoder_mb=float(SERVING.get("encoder_mb", 1200)),
+)
+worker_class = "gthread"
+threads = int(SERVING.get("threads", 4))
+timeout = int(SERVING.get("timeout_seconds", 120))
+preload_app = False
+# Workers read the planned count (torch threads, cross-worker sync) from the environment.
+os.environ["LOD_SERVING_WORKERS"] = str(workers)
@@ -11,10 +11,11 @@ import subprocess
 import sys
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import numpy as np
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, jsonify, request, send_file, send_from_directory
 from flask_cors import CORS
 
 # ------------------------------------------------------------------------------
@@ -29,7 +30,7 @@ CFG = load_config(ROOT_DIR)
 VENV_PYTHON = ROOT_DIR / CFG["paths"]["venv_python_windows"]
 TEST_MODE = os.getenv("LOD_BACKEND_TEST_MODE", "0") == "1"
 
-if not TEST_MODE and VENV_PYTHON.exists() and Path(sys.executable).resolve() != VENV_PYTHON.resolve():
+if __name__ == "__main__" and not TEST_MODE and VENV_PYTHON.exists() and Path(sys.executable).resolve() != VENV_PYTHON.resolve():
     print("[LAUNCHER] Re-launching with venv Python for CUDA support...")
     print(f"           {VENV_PYTHON}")
     sys.exit(subprocess.call([str(VENV_PYTHON), __file__] + sys.argv[1:]))
@@ -41,6 +42,7 @@ if TEST_MODE:
     torch = None  # type: ignore[assignment]
     SiglipModel = None  # type: ignore[assignment]
     SiglipProcessor = None  # type: ignore[assignment]
+    SentenceTransformer = None  # type: ignore[assignment]
 
     class OpenAI:  # type: ignore[override]
         def __init__(self, *args, **kwargs):
@@ -53,6 +55,12 @@ else:
         print("[BACKEND] ERROR: 'transformers' or 'torch' not found.")
         sys.exit(1)
 
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        SentenceTransformer = None  # type: ignore[assignment]
+        print("[BACKEND] sentence-transformers not found; hybrid text fusion disabled.")
+
     try:
         from PIL import Image  # noqa: F401
     except ImportError:
@@ -71,7 +79,24 @@ from dotenv import load_dotenv
 BACKEND_SCHEMA_DIR = ROOT_DIR / "01_backend"
 if str(BACKEND_SCHEMA_DIR) not in sys.path:
     sys.path.append(str(BACKEND_SCHEMA_DIR))
-from schemas import validate_graph_data, validate_registry_records
+from embedding_store import EMBEDDING_FIELDS, dense_matrix, load_embedding_matrix
+from coalescing_worker import CoalescingWorker
+from expansion_cache import ExpansionCache
+from facet_index import FACET_FIELDS, FacetIndex, Filters, contains, filters_key
+from file_lock import file_lock
+from graph_payload import BINARY_FILENAME, METADATA_FILENAME, write_graph_payload
+from graph_repair import neighbors_csr, refill_neighbors, remap_neighbors
+from graph_tiles import ZOOM_LIMIT, GraphTileCache, write_tile_pyramid
+from index_snapshot import IndexSnapshot, row_maps
+from keyword_index import KeywordIndex, boost_candidates, load_keyword_index
+from micro_batcher import MicroBatcher
+from registry_store import RegistryStore, record_key
+from schemas import registry_records_mask, valid_rows, validate_graph_data, validate_registry_records
+from score_fusion import FUSION_MODES, fuse_scores, keyword_boosts
+from search_cache import SearchCache
+from serving import StampWatcher, torch_threads
+from thumbnails import DECODE_ERRORS, ThumbnailCache
+from vector_index import ExactIndex, IVFIndex, build_vector_index, top_k
 
 IMG_PIPELINE_DIR = ROOT_DIR / "01_backend" / "img_pipeline"
 if str(IMG_PIPELINE_DIR) not in sys.path:
@@ -87,6 +112,49 @@ FRONTEND_DIR = ROOT_DIR / CFG["paths"]["frontend_dir"]
 VECTORS_DIR = DATA_DIR_ROOT / "vectors"
 REGISTRY_PATH = VECTORS_DIR / "master_registry.json"
 GRAPH_FILE = VECTORS_DIR / "graph_data.json"
+REGISTRY_CFG = CFG.get("registry", {})
+COMPACT_MIN_SEGMENTS = int(REGISTRY_CFG.get("compact_min_segments", 8))
+STRICT_VALIDATION = bool(REGISTRY_CFG.get("strict_validation", False))
+TOMBSTONE_COMPACT_ROWS = int(REGISTRY_CFG.get("tombstone_compact_rows", 256))
+TOMBSTONE_COMPACT_RATIO = float(REGISTRY_CFG.get("tombstone_compact_ratio", 0.1))
+COMPACTION_DELAY_MS = float(REGISTRY_CFG.get("compaction_delay_ms", 500))
+DELETE_BATCH_MAX = int(REGISTRY_CFG.get("delete_batch_max", 1000))
+REGISTRY_RETRY_SECONDS = float(REGISTRY_CFG.get("reload_retry_seconds", 5))
+registry_store = RegistryStore(VECTORS_DIR, REGISTRY_CFG.get("segments_dirname", "registry_segments"))
+GRAPH_CFG = CFG.get("graph", {})
+TILES_MAX_ZOOM = int(GRAPH_CFG.get("tiles_max_zoom", 6))
+TILES_CELL_BITS = int(GRAPH_CFG.get("tiles_cell_bits", 4))
+GRAPH_NEIGHBORS_K = 30  # Step13 KNN_K; the graph's meta.knn.k wins when present
+graph_tile_cache = GraphTileCache()
+SEARCH_CFG = CFG.get("search", {})
+SEARCH_DEFAULT_K = int(SEARCH_CFG.get("default_k", 200))
+SEARCH_MAX_K = int(SEARCH_CFG.get("max_k", 1000))
+UNPROJECTABLE_FIELDS = set(EMBEDDING_FIELDS)
+PIPELINE_RESULT_FIELDS = ("id", "name_of_file", "final_category", "provider", "lod", "output_path", "path_to_image")
+SIGLIP_MODEL_ID = CFG["models"]["siglip"]
+TEXT_MODEL_ID = CFG["models"]["sentence_transformer"]
+SEARCH_FUSION = str(SEARCH_CFG.get("fusion", "image")).lower()
+FUSION_IMAGE_WEIGHT = float(SEARCH_CFG.get("fusion_image_weight", 0.7))
+FUSION_RRF_K = int(SEARCH_CFG.get("fusion_rrf_k", 60))
+EXPANSION_CFG = CFG.get("expansion", {})
+EXPANSION_CACHE_PATH = VECTORS_DIR / EXPANSION_CFG.get("cache_filename", "query_expansion_cache.json")
+EXPANSION_REQUEST_TIMEOUT = float(EXPANSION_CFG.get("request_timeout_seconds", 20))
+EXPANSION_CONCURRENCY = int(EXPANSION_CFG.get("max_concurrency", 8))
+SEARCH_BATCH_MAX_QUERIES = int(SEARCH_CFG.get("batch_max_queries", 64))
+FACET_EXACT_MAX_ROWS = int(SEARCH_CFG.get("facet_exact_max_rows", 20000))
+SERVING_CFG = CFG.get("serving", {})
+# Set by serve_worker() when running under the multi-process WSGI server (wsgi.py).
+WORKER_PROCESSES = 1
+SYNC_INTERVAL_SECONDS = float(SERVING_CFG.get("sync_interval_ms", 1000)) / 1000
+registry_watcher = StampWatcher(registry_store.read_stamp)
+THUMBS_CFG = CFG.get("thumbnails", {})
+thumbnail_cache = ThumbnailCache(
+    DATA_DIR_ROOT / "img",
+    DATA_DIR_ROOT / "img" / "thumb",
+    sizes=THUMBS_CFG.get("sizes", [128, 256, 512]),
+    max_bytes=int(float(THUMBS_CFG.get("cache_max_mb", 512)) * 1024 * 1024),
+    quality=int(THUMBS_CFG.get("quality", 80)),
+)
 
 app = Flask(__name__, static_folder=str(FRONTEND_DIR / "dist"), static_url_path="/static")
 CORS(app)
@@ -104,60 +172,263 @@ class BackendResources:
     def __init__(self) -> None:
         self.model = None
         self.processor = None
-        self.embeddings = None
-        self.registry: list[dict] = []
+        self.text_model = None
+        self._text_model_lock = threading.Lock()
+        self._text_model_failed = False
+        # Searches read the published snapshot without locking; writers build the next one under _mutate_lock.
+        self.snapshot = IndexSnapshot()
+        self.registry_loaded = False
+        self.index_built = False
+        self._loaders: list[threading.Thread] = []
+        self._loaders_done = 0
+        self._loaders_lock = threading.Lock()
+        self._mutate_lock = threading.RLock()
+        self._base_mtime = 0
+        self._segments_applied: set[str] = set()
+        self._reload_retry: threading.Timer | None = None
+        self.memory_compactor = CoalescingWorker(lambda _: self.compact_memory(), COMPACTION_DELAY_MS, name="memory")
+        self.search_cache = SearchCache(
+            embedding_entries=int(SEARCH_CFG.get("embedding_cache_entries", 4096)),
+            result_entries=int(SEARCH_CFG.get("result_cache_entries", 1024)),
+        )
+        self.search_batcher = MicroBatcher(
+            self._process_search_items,
+            window_ms=float(SEARCH_CFG.get("microbatch_window_ms", 3)),
+            max_batch=int(SEARCH_CFG.get("microbatch_max_batch", 32)),
+            name="search",
+        )
         self.device = "cpu"
-        self.query_cache: dict[str, str] = {}
+        self.expansion_cache = ExpansionCache(
+            EXPANSION_CACHE_PATH,
+            max_entries=int(EXPANSION_CFG.get("cache_max_entries", 4096)),
+            ttl_seconds=float(EXPANSION_CFG.get("cache_ttl_hours", 168)) * 3600,
+            budget_seconds=float(EXPANSION_CFG.get("budget_ms", 1500)) / 1000,
+            workers=EXPANSION_CONCURRENCY,
+            save_delay_ms=float(EXPANSION_CFG.get("cache_save_delay_ms", 1000)),
+        )
 
     @property
     def ready(self) -> bool:
-        return self.model is not None and self.embeddings is not None
+        return self.model is not None and self.snapshot.embeddings is not None and self.index_built
+
+    # Read-only views of the published snapshot (status routes, graph repair, tests).
+    @property
+    def registry(self) -> list[dict]:
+        return self.snapshot.registry
+
+    @property
+    def embeddings(self) -> np.ndarray | None:
+        return self.snapshot.embeddings
+
+    @property
+    def text_embeddings(self) -> np.ndarray | None:
+        return self.snapshot.text_embeddings
+
+    @property
+    def vector_index(self) -> ExactIndex | IVFIndex | None:
+        return self.snapshot.vector_index
+
+    @property
+    def keyword_index(self) -> KeywordIndex:
+        return self.snapshot.keyword_index
+
+    @property
+    def facet_index(self) -> FacetIndex:
+        return self.snapshot.facet_index
+
+    @property
+    def alive(self) -> np.ndarray:
+        return self.snapshot.alive
+
+    @property
+    def tombstoned(self) -> int:
+        return self.snapshot.tombstoned
+
+    @property
+    def generation(self) -> int:
+        return self.snapshot.generation
+
+    @property
+    def live_count(self) -> int:
+        return self.snapshot.live_count
+
+    @property
+    def loading(self) -> bool:
+        return any(thread.is_alive() for thread in self._loaders)
 
     def load_resources(self) -> None:
         self._load_registry()
+        self._load_models()
+
+    def start_loading(self) -> list[threading.Thread]:
+        """Load registry + indexes and models on two threads, so startup costs the slower of the two."""
+        started = time.perf_counter()
+        self._loaders_done = 0
+
+        def run(name: str, load) -> None:
+            phase_start = time.perf_counter()
+            try:
+                load()
+            except Exception as exc:
+                print(f"[BACKEND] {name} load failed: {exc}")
+            print(f"[BACKEND] {name} load finished in {time.perf_counter() - phase_start:.1f}s")
+            with self._loaders_lock:
+                self._loaders_done += 1
+                if self._loaders_done == len(self._loaders):
+                    state = "ready" if self.ready else "NOT ready"
+                    print(f"[BACKEND] Startup complete in {time.perf_counter() - started:.1f}s; search {state}.")
+
+        self._loaders = [
+            threading.Thread(target=run, args=("Registry", self._load_registry), name="load-registry", daemon=True),
+            threading.Thread(target=run, args=("Model", self._load_models), name="load-models", daemon=True),
+        ]
+        for thread in self._loaders:
+            thread.start()
+        return self._loaders
+
+    def _load_models(self) -> None:
         self._load_siglip()
+        if SEARCH_FUSION != "image":
+            self._load_text_encoder()
 
-    def _load_registry(self) -> None:
-        self.registry = []
-        self.embeddings = None
+    def publish(self, snapshot: IndexSnapshot) -> IndexSnapshot:
+        """Swap in `snapshot` under the next generation; cached result pages of older ones are dropped.
+
+        Writers call this holding `_mutate_lock`. Searches already running
+        finish on the snapshot they started with.
+        """
+        snapshot = snapshot.replace(generation=self.snapshot.generation + 1)
+        self.snapshot = snapshot
+        self.search_cache.invalidate_results()
+        return snapshot
 
-        if not REGISTRY_PATH.exists():
+    def _publish_empty(self) -> None:
+        self.registry_loaded = False
+        self.index_built = False
+        self.publish(IndexSnapshot())
+
+    def _load_registry(self) -> None:
+        with self._mutate_lock:
+            self._read_registry()
+
+    def _read_registry(self) -> None:
+        """Load the registry into a new snapshot; searches keep using the published one until it is swapped in.
+
+        A load that fails keeps the published library and is retried after
+        `registry.reload_retry_seconds`; only a missing or embedding-less
+        registry publishes an empty one.
+        """
+        # Taken before reading, so a write racing the load is applied again by sync_from_store().
+        registry_watcher.mark()
+        base_mtime = registry_store.base_mtime_ns()
+        segments_applied = {segment.name for segment in registry_store.list_segments()}
+
+        if not REGISTRY_PATH.exists() and not segments_applied:
             print(f"[BACKEND] ERROR: master_registry.json not found at {REGISTRY_PATH}!")
+            self._base_mtime, self._segments_applied = base_mtime, segments_applied
+            self._publish_empty()
             return
 
-        print("[BACKEND] Loading master_registry.json (this may take 15-30 seconds)...")
+        print("[BACKEND] Streaming master_registry.json (+ pending registry segments)...")
         try:
-            with open(REGISTRY_PATH, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            snapshot = self._build_snapshot()
         except Exception as exc:
-            print(f"[BACKEND] ERROR loading registry: {exc}")
+            print(f"[BACKEND] ERROR loading registry: {exc}. Still serving {self.live_count} records; retrying in {REGISTRY_RETRY_SECONDS:g}s.")
+            self._retry_load()
             return
-
-        if not isinstance(data, list):
-            print("[BACKEND] ERROR: master_registry.json is not a list.")
+        self._base_mtime, self._segments_applied = base_mtime, segments_applied
+        if snapshot is None:
+            self._publish_empty()
             return
+        self.publish(snapshot)
+        self.registry_loaded = True
+        self.index_built = True
 
-        valid_records, skipped = validate_registry_records(data)
-        if skipped:
-            print(f"[BACKEND] Schema validation skipped {skipped} invalid registry records.")
-
-        extracted_embeddings: list[list[float]] = []
-        embedded_records: list[dict] = []
-        for rec in valid_records:
-            emb = rec.get("image_embedding")
-            if isinstance(emb, list) and len(emb) > 0:
-                extracted_embeddings.append(emb)
-                embedded_records.append(rec)
-
-        self.registry = embedded_records
-        if not extracted_embeddings:
-            print("[BACKEND] No valid embeddings found in registry.")
+    def _retry_load(self) -> None:
+        if self._reload_retry is not None and self._reload_retry.is_alive():
             return
-
-        self.embeddings = np.array(extracted_embeddings, dtype=np.float32)
-        norms = np.linalg.norm(self.embeddings, axis=1, keepdims=True)
-        self.embeddings = self.embeddings / (norms + 1e-8)
-        print(f"[BACKEND] Loaded {len(self.registry)} records with embeddings (dim={self.embeddings.shape[1]}).")
+        self._reload_retry = threading.Timer(REGISTRY_RETRY_SECONDS, self._load_registry)
+        self._reload_retry.daemon = True
+        self._reload_retry.start()
+
+    def _build_snapshot(self) -> IndexSnapshot | None:
+        """Read the merged registry and build its matrices and indexes; None when no record has a valid embedding."""
+        data, matrices = registry_store.read_columns(EMBEDDING_FIELDS)
+        keep = registry_records_mask(data, strict=STRICT_VALIDATION, require_embedding=False)
+        if not keep.all():
+            print(f"[BACKEND] Schema validation skipped {int((~keep).sum())} invalid registry records.")
+        embeddings, text_matrix = matrices["image_embedding"], matrices["text_embedding"]
+        del matrices
+        if embeddings.shape[1]:
+            embedded = valid_rows(embeddings)
+            if (keep & ~embedded).any():
+                print(f"[BACKEND] Skipped {int((keep & ~embedded).sum())} records with missing, wrong-size or non-finite image embeddings.")
+            keep &= embedded
+        else:
+            keep[:] = False
+        if not keep.any():
+            print("[BACKEND] No valid embeddings found in registry.")
+            return None
+        if not keep.all():
+            data = [rec for rec, ok in zip(data, keep.tolist()) if ok]
+            embeddings, text_matrix = embeddings[keep], text_matrix[keep]
+
+        ids = [record_key(rec, str(i)) for i, rec in enumerate(data)]
+        image_matrix = load_embedding_matrix(embeddings, "image_embedding", ids, VECTORS_DIR)
+        text_embeddings = load_embedding_matrix(text_matrix, "text_embedding", ids, VECTORS_DIR) if text_matrix.shape[1] else None
+        del embeddings, text_matrix
+        print(f"[BACKEND] Loaded {len(data)} records with embeddings (dim={image_matrix.shape[1]}).")
+        vector_index = build_vector_index(image_matrix, ids, SEARCH_CFG, VECTORS_DIR)
+        keyword_index = load_keyword_index(data, VECTORS_DIR)
+        return IndexSnapshot.build(data, image_matrix, text_embeddings, vector_index, keyword_index, FacetIndex(data))
+
+    def append_records(self, records: list[dict]) -> bool:
+        """Publish a snapshot with newly consolidated records appended. Returns False when a full reload is needed."""
+        with self._mutate_lock:
+            snap = self.snapshot
+            if snap.embeddings is None or snap.vector_index is None:
+                return False
+            if snap.keyword_index.count != len(snap.registry) or snap.facet_index.count != len(snap.registry):
+                return False
+            new_records, _ = validate_registry_records(records, strict=STRICT_VALIDATION)
+            if not new_records:
+                return True
+            known = {record_key(rec, str(i)) for i, rec in enumerate(snap.registry)}
+            if any(record_key(rec, "") in known for rec in new_records):
+                return False
+
+            new_embeddings = np.array([rec["image_embedding"] for rec in new_records], dtype=np.float32)
+            if new_embeddings.ndim != 2 or new_embeddings.shape[1] != snap.embeddings.shape[1] or not valid_rows(new_embeddings).all():
+                return False
+            new_embeddings = new_embeddings / (np.linalg.norm(new_embeddings, axis=1, keepdims=True) + 1e-8)
+            embeddings = np.vstack([snap.embeddings, new_embeddings])
+            text_embeddings = snap.text_embeddings
+            if text_embeddings is not None:
+                text_embeddings = np.vstack([text_embeddings, dense_matrix(new_records, "text_embedding", text_embeddings.shape[1])])
+            # Vectors live in the matrices only, as for records streamed by _load_registry.
+            new_records = [{key: value for key, value in rec.items() if key not in UNPROJECTABLE_FIELDS} for rec in new_records]
+            registry = snap.registry + new_records
+            embeddings, text_embeddings = self._shared_matrices(registry, embeddings, text_embeddings)
+            vector_index = snap.vector_index.copy()
+            vector_index.add(embeddings)
+            keyword_index = snap.keyword_index.copy()
+            keyword_index.add(new_records)
+            facet_index = snap.facet_index.copy()
+            facet_index.add(new_records)
+            id_rows, file_rows = row_maps(new_records, len(snap.registry), snap.id_rows, snap.file_rows)
+            self.publish(snap.replace(
+                registry=registry,
+                embeddings=embeddings,
+                text_embeddings=text_embeddings,
+                vector_index=vector_index,
+                keyword_index=keyword_index,
+                facet_index=facet_index,
+                alive=np.concatenate([snap.alive, np.ones(len(new_records), dtype=bool)]),
+                id_rows=id_rows,
+                file_rows=file_rows,
+            ))
+            print(f"[BACKEND] Appended {len(new_records)} records. New count: {len(registry)}")
+            return True
 
     def _load_siglip(self) -> None:
         if TEST_MODE:
@@ -168,6 +439,8 @@ class BackendResources:
             return
         try:
             self.device = "cuda" if torch.cuda.is_available() else "cpu"
+            if WORKER_PROCESSES > 1:
+                torch.set_num_threads(torch_threads(WORKER_PROCESSES))
             print(f"[BACKEND] Loading SigLIP model on {self.device}...")
             siglip_model = CFG["models"]["siglip"]
             hf_kwargs = hf_common_kwargs()
@@ -181,14 +454,41 @@ class BackendResources:
             self.model = None
             self.processor = None
 
+    def _load_text_encoder(self) -> bool:
+        """MiniLM query encoder for hybrid fusion; loaded once, on startup or first hybrid search."""
+        with self._text_model_lock:
+            if self.text_model is not None or self._text_model_failed:
+                return self.text_model is not None
+            if SentenceTransformer is None:
+                self._text_model_failed = True
+                return False
+            try:
+                print(f"[BACKEND] Loading text encoder {TEXT_MODEL_ID}...")
+                self.text_model = SentenceTransformer(TEXT_MODEL_ID, device=self.device)
+            except Exception as exc:
+                print(f"[BACKEND] Failed to load text encoder: {exc}. Hybrid fusion disabled.")
+                self._text_model_failed = True
+            return self.text_model is not None
+
+    def effective_fusion(self, fusion: str | None) -> str:
+        """Requested fusion mode, or `image` when caption vectors or the text encoder are unavailable."""
+        mode = (fusion or SEARCH_FUSION).lower()
+        if mode not in FUSION_MODES or mode == "image" or self.text_embeddings is None or not self._load_text_encoder():
+            return "image"
+        return mode
+
     def expand_query(self, user_query: str) -> str:
         cache_key = user_query.strip().lower()
-        if cache_key in self.query_cache:
+        expanded, status = self.expansion_cache.get_or_compute(cache_key, user_query, lambda: self._expand_with_openai(user_query))
+        if status == "hit":
             print(f"[BACKEND] Cache hit for: '{user_query}'")
-            return self.query_cache[cache_key]
+        elif status == "timeout":
+            print(f"[BACKEND] Expansion exceeded {self.expansion_cache.budget_seconds * 1000:.0f} ms budget. Using original query.")
+        return expanded
 
+    def _expand_with_openai(self, user_query: str) -> str:
         try:
-            client = OpenAI(api_key=OPENAI_API_KEY)
+            client = OpenAI(api_key=OPENAI_API_KEY, timeout=EXPANSION_REQUEST_TIMEOUT)
             system_prompt = (
                 "You are an expert BIM and architectural content specialist. "
                 "Convert the user's search query into a detailed visual and semantic description suitable for identifying 3D models and families. "
@@ -205,18 +505,85 @@ class BackendResources:
             )
             expanded = response.choices[0].message.content.strip()
             print(f"[BACKEND] API Expanded: '{user_query}' -> '{expanded}'")
-            self.query_cache[cache_key] = expanded
             return expanded
         except Exception as exc:
             print(f"[BACKEND] OpenAI Expansion Failed: {exc}. Using original query.")
-            return user_query
-
-    def search(self, query: str) -> dict:
-        refined_query = self.expand_query(query)
-        print(f"[BACKEND] Searching for: {refined_query}")
-
+            raise
+
+    def search(
+        self,
+        query: str,
+        k: int = SEARCH_DEFAULT_K,
+        offset: int = 0,
+        min_score: float | None = None,
+        fields: list[str] | None = None,
+        fusion: str | None = None,
+        filters: Filters | None = None,
+    ) -> dict:
+        return self.search_batch([query], k=k, offset=offset, min_score=min_score, fields=fields, fusion=fusion, filters=filters)[query]
+
+    def search_batch(
+        self,
+        queries: list[str],
+        k: int = SEARCH_DEFAULT_K,
+        offset: int = 0,
+        min_score: float | None = None,
+        fields: list[str] | None = None,
+        fusion: str | None = None,
+        filters: Filters | None = None,
+    ) -> dict[str, dict]:
+        """Search several queries: concurrent expansion, one encoder forward, one score GEMM."""
+        unique = list(dict.fromkeys(queries))
+        refined = self._expand_many(unique)
+        fusion = self.effective_fusion(fusion)
+        generation = self.generation
+        ranked_by_query: dict[str, dict] = {}
+        pending: list[tuple[str, tuple]] = []
+        for query in unique:
+            result_key = (query, refined[query], fusion, k, offset, min_score, tuple(fields or ()), filters_key(filters), generation)
+            ranked = self.search_cache.results.get(result_key)
+            if ranked is None:
+                pending.append((query, result_key))
+            else:
+                ranked_by_query[query] = ranked
+
+        if pending:
+            if len(pending) == 1:
+                print(f"[BACKEND] Searching for: {refined[pending[0][0]]}")
+            else:
+                print(f"[BACKEND] Batch searching {len(pending)} queries")
+            page_options = {"k": k, "offset": offset, "min_score": min_score, "fields": fields, "filters": filters}
+            items = [(query, refined[query], fusion, page_options) for query, _ in pending]
+            ranked_list = self.search_batcher.submit_many(items)
+            for (query, result_key), ranked in zip(pending, ranked_list):
+                self.search_cache.results.put(result_key, ranked)
+                ranked_by_query[query] = ranked
+
+        return {query: {"query": query, "expandedQuery": refined[query], "fusion": fusion, **ranked_by_query[query]} for query in unique}
+
+    def _expand_many(self, queries: list[str]) -> dict[str, str]:
+        if len(queries) <= 1:
+            return {query: self.expand_query(query) for query in queries}
+        with ThreadPoolExecutor(max_workers=min(len(queries), EXPANSION_CONCURRENCY)) as pool:
+            return dict(zip(queries, pool.map(self.expand_query, queries)))
+
+    def query_embeddings(self, pairs: list[tuple[str, str]]) -> np.ndarray:
+        """Fused embeddings for (query, refined_query) pairs; L1 misses are encoded in one forward."""
+        keys = [(query, refined_query, SIGLIP_MODEL_ID) for query, refined_query in pairs]
+        cached = [self.search_cache.embeddings.get(key) for key in keys]
+        missing = [i for i, emb in enumerate(cached) if emb is None]
+        if missing:
+            encoded = self.encode_queries([pairs[i] for i in missing])
+            for i, emb in zip(missing, encoded):
+                cached[i] = emb
+                self.search_cache.embeddings.put(keys[i], emb)
+        return np.stack(cached)
+
+    def encode_queries(self, pairs: list[tuple[str, str]]) -> np.ndarray:
+        """SigLIP text embeddings blending each raw (0.3) and expanded (0.7) query, as one padded batch."""
+        texts = [text for pair in pairs for text in pair]
         inputs = self.processor(
-            text=[query, refined_query],
+            text=texts,
             padding="max_length",
             truncation=True,
             max_length=64,
@@ -233,66 +600,464 @@ class BackendResources:
             embeddings_batch = text_features
 
         embeddings_batch = embeddings_batch / (embeddings_batch.norm(dim=-1, keepdim=True) + 1e-8)
-        embeddings_batch = embeddings_batch.cpu().numpy().astype(np.float32)
-
-        query_emb = (0.3 * embeddings_batch[0]) + (0.7 * embeddings_batch[1])
-        query_emb = query_emb / (np.linalg.norm(query_emb) + 1e-8)
-        scores = np.dot(self.embeddings, query_emb)
-
-        search_terms = query.lower().split()
-        for i, rec in enumerate(self.registry):
-            text_field = (
-                str(rec.get("name_of_file", ""))
-                + " "
-                + str(rec.get("final_category", ""))
-                + " "
-                + str(rec.get("family_name", ""))
-                + " "
-                + str(rec.get("provider", ""))
-            ).lower()
-
-            matches = 0
-            for term in search_terms:
-                if len(term) > 2 and term in text_field:
-                    matches += 1
-            if matches > 0:
-                scores[i] += matches * 0.15
-
-        top_k = 200
-        top_indices = np.argsort(scores)[-top_k:][::-1]
-        results = []
-        for idx in top_indices:
-            rec = self.registry[int(idx)]
-            results.append({"id": rec.get("id", rec.get("name_of_file")), "score": round(float(scores[idx]), 4)})
+        embeddings_batch = embeddings_batch.cpu().numpy().astype(np.float32).reshape(len(pairs), 2, -1)
+
+        query_embs = (0.3 * embeddings_batch[:, 0]) + (0.7 * embeddings_batch[:, 1])
+        return query_embs / (np.linalg.norm(query_embs, axis=1, keepdims=True) + 1e-8)
+
+    def text_query_embeddings(self, pairs: list[tuple[str, str]]) -> np.ndarray:
+        """MiniLM counterparts of `query_embeddings`, sharing the L1 cache under the text model id."""
+        keys = [(query, refined_query, TEXT_MODEL_ID) for query, refined_query in pairs]
+        cached = [self.search_cache.embeddings.get(key) for key in keys]
+        missing = [i for i, emb in enumerate(cached) if emb is None]
+        if missing:
+            encoded = self.encode_text_queries([pairs[i] for i in missing])
+            for i, emb in zip(missing, encoded):
+                cached[i] = emb
+                self.search_cache.embeddings.put(keys[i], emb)
+        return np.stack(cached)
+
+    def encode_text_queries(self, pairs: list[tuple[str, str]]) -> np.ndarray:
+        """MiniLM embeddings with the same raw (0.3) / expanded (0.7) blend as the SigLIP queries."""
+        texts = [text for pair in pairs for text in pair]
+        embeddings_batch = self.text_model.encode(texts, batch_size=len(texts), convert_to_numpy=True, normalize_embeddings=True)
+        embeddings_batch = np.asarray(embeddings_batch, dtype=np.float32).reshape(len(pairs), 2, -1)
+        query_embs = (0.3 * embeddings_batch[:, 0]) + (0.7 * embeddings_batch[:, 1])
+        return query_embs / (np.linalg.norm(query_embs, axis=1, keepdims=True) + 1e-8)
+
+    def rank(
+        self,
+        query: str,
+        query_emb: np.ndarray,
+        k: int = SEARCH_DEFAULT_K,
+        offset: int = 0,
+        min_score: float | None = None,
+        fields: list[str] | None = None,
+        filters: Filters | None = None,
+    ) -> dict:
+        """Score, keyword-boost and page the library for one encoded query."""
+        return self.rank_many([query], query_emb[None, :], k=k, offset=offset, min_score=min_score, fields=fields, filters=filters)[0]
+
+    def rank_many(
+        self,
+        queries: list[str],
+        query_embs: np.ndarray,
+        k: int = SEARCH_DEFAULT_K,
+        offset: int = 0,
+        min_score: float | None = None,
+        fields: list[str] | None = None,
+        filters: Filters | None = None,
+    ) -> list[dict]:
+        snap = self.snapshot
+        allowed = snap.facet_index.rows_for(filters)
+        candidates, exhaustive = self._candidates_many(snap, query_embs, allowed, offset + k)
+        return [
+            self._page(snap, query, query_emb, rows, scores, exhaustive, k, offset, min_score, fields, allowed)
+            for query, query_emb, (rows, scores) in zip(queries, query_embs, candidates)
+        ]
 
-        return {"query": query, "expandedQuery": refined_query, "results": results}
+    def row_for_id(self, record_id: str) -> int | None:
+        """Row of a live search result id (tombstoned ids are unmapped)."""
+        return self.snapshot.row_for_id(record_id)
+
+    def filename_for_id(self, record_id: str) -> str | None:
+        snap = self.snapshot
+        row = snap.row_for_id(record_id)
+        return None if row is None else snap.registry[row].get("name_of_file")
+
+    def similar(
+        self,
+        record_id: str,
+        k: int = SEARCH_DEFAULT_K,
+        offset: int = 0,
+        min_score: float | None = None,
+        fields: list[str] | None = None,
+        filters: Filters | None = None,
+        neighbor_ids: list[str] | None = None,
+    ) -> dict | None:
+        """Nearest records to a stored one, from its precomputed kNN list when that covers the page.
+
+        `total` always counts what the index ranks (every other live record), so
+        paging continues past the end of the kNN list and is served by the index.
+        The list is only used on a complete index, where that count is known
+        without scoring.
+        """
+        snap = self.snapshot
+        row = snap.row_for_id(record_id)
+        if row is None or snap.embeddings is None:
+            return None
+        query_emb = snap.embeddings[row]
+
+        source = "index"
+        total = None
+        allowed = snap.facet_index.rows_for(filters)
+        complete = snap.vector_index is None or snap.vector_index.complete
+        if neighbor_ids is not None and complete and min_score is None and allowed is None and offset + k <= len(neighbor_ids):
+            neighbor_rows = [snap.row_for_id(nid) for nid in neighbor_ids]
+            if all(r is not None for r in neighbor_rows):
+                rows = np.array(neighbor_rows, dtype=np.int64)
+                scores = snap.embeddings[rows] @ query_emb
+                source = "neighbors"
+                total = snap.live_count - 1
+        if source == "index":
+            candidates, _ = self._candidates_many(snap, query_emb[None, :], allowed, offset + k + 1)
+            rows, scores = candidates[0]
+        keep = rows != row
+        ranked = self._page(snap, "", query_emb, rows[keep], scores[keep], False, k, offset, min_score, fields, allowed, total=total)
+        return {"id": record_id, "source": source, **ranked}
+
+    def encode_image(self, image) -> np.ndarray:
+        inputs = self.processor(images=image.convert("RGB"), return_tensors="pt")
+        with torch.no_grad():
+            features = self.model.get_image_features(pixel_values=inputs["pixel_values"].to(self.device))
+        emb = features[0].cpu().numpy().astype(np.float32)
+        return emb / (np.linalg.norm(emb) + 1e-8)
+
+    def _candidates_many(
+        self, snap: IndexSnapshot, query_embs: np.ndarray, allowed: np.ndarray | None = None, depth: int = 0
+    ) -> tuple[list[tuple[np.ndarray, np.ndarray]], bool]:
+        """Candidate rows + exact scores per query; one GEMM when the index is exhaustive.
+
+        The bool is True when rows are every library row in order. With facet
+        filters (`allowed`, sorted rows) only those rows are scored, or, for a
+        large slice on the IVF backend, the probed lists are masked to them.
+        With int8 codes each query keeps at least `depth` (offset + k) re-scored
+        rows, plus room for tombstoned rows the page drops.
+        """
+        index = snap.vector_index or ExactIndex(snap.embeddings)
+        depth += snap.tombstoned
+        if allowed is not None and (index.exhaustive or len(allowed) <= FACET_EXACT_MAX_ROWS):
+            return index.score_rows(allowed, query_embs, depth), False
+        if index.exhaustive:
+            return index.candidates_many(query_embs, depth), index.complete
+        candidates = [index.candidates(query_emb, depth) for query_emb in query_embs]
+        if allowed is not None:
+            candidates = [(rows[mask], scores[mask]) for rows, scores in candidates for mask in (contains(allowed, rows),)]
+        return candidates, False
+
+    def _keyword_hits(self, snap: IndexSnapshot, query: str, allowed: np.ndarray | None) -> tuple[np.ndarray, np.ndarray]:
+        hit_rows, hit_counts = snap.keyword_index.match(query)
+        if allowed is not None and len(hit_rows):
+            keep = contains(allowed, hit_rows)
+            hit_rows, hit_counts = hit_rows[keep], hit_counts[keep]
+        return hit_rows, hit_counts
+
+    def _process_search_items(self, items: list[tuple[str, str, str, dict]]) -> list[dict]:
+        """Micro-batch body for (query, expansion, fusion, page options) items.
+
+        One encoder forward for the batch, then one score GEMM per distinct facet
+        filter, all against the snapshot published when the batch started.
+        """
+        snap = self.snapshot
+        query_embs = self.query_embeddings([(query, refined_query) for query, refined_query, _, _ in items])
+        groups: dict[tuple, list[int]] = {}
+        for i, (_, _, _, options) in enumerate(items):
+            groups.setdefault(filters_key(options.get("filters")), []).append(i)
+
+        ranked: list[dict] = [{} for _ in items]
+        for positions in groups.values():
+            group = [items[i] for i in positions]
+            group_embs = query_embs[positions]
+            allowed = snap.facet_index.rows_for(group[0][3].get("filters"))
+            depth = max(options["offset"] + options["k"] for _, _, _, options in group)
+            candidates, exhaustive = self._candidates_many(snap, group_embs, allowed, depth)
+            hybrid = [j for j, item in enumerate(group) if item[2] != "image"]
+            if hybrid:
+                self._fuse_candidates(snap, group, group_embs, candidates, exhaustive, hybrid, allowed)
+            for i, (query, _, fusion, options), query_emb, (rows, scores) in zip(positions, group, group_embs, candidates):
+                page_options = {key: value for key, value in options.items() if key != "filters"}
+                ranked[i] = self._page(snap, query, query_emb, rows, scores, exhaustive, allowed=allowed, fusion=fusion, **page_options)
+        return ranked
+
+    def _fuse_candidates(
+        self,
+        snap: IndexSnapshot,
+        items: list[tuple[str, str, str, dict]],
+        query_embs: np.ndarray,
+        candidates: list[tuple[np.ndarray, np.ndarray]],
+        exhaustive: bool,
+        positions: list[int],
+        allowed: np.ndarray | None = None,
+    ) -> None:
+        """Replace image scores at `positions` by fused image + caption-text scores (one text GEMM when exhaustive)."""
+        text_embs = self.text_query_embeddings([items[i][:2] for i in positions])
+        if text_embs.shape[1] != snap.text_embeddings.shape[1]:
+            print(f"[BACKEND] Text encoder dim {text_embs.shape[1]} does not match stored text_embedding dim; using image scores.")
+            return
+        text_score_matrix = snap.text_embeddings @ text_embs.T if exhaustive else None
+        for j, i in enumerate(positions):
+            query, _, fusion, _ = items[i]
+            rows, scores = candidates[i]
+            if exhaustive:
+                text_scores = text_score_matrix[:, j]
+            else:
+                # Keyword hits outside the candidates join before fusion, so they are ranked on both signals.
+                extra = np.setdiff1d(self._keyword_hits(snap, query, allowed)[0], rows)
+                if len(extra):
+                    rows = np.concatenate([rows, extra])
+                    scores = np.concatenate([scores, snap.embeddings[extra] @ query_embs[i]])
+                text_scores = snap.text_embeddings[rows] @ text_embs[j]
+            candidates[i] = (rows, fuse_scores(scores, text_scores, fusion, FUSION_IMAGE_WEIGHT, FUSION_RRF_K))
+
+    def _page(
+        self,
+        snap: IndexSnapshot,
+        query: str,
+        query_emb: np.ndarray,
+        rows: np.ndarray,
+        scores: np.ndarray,
+        exhaustive: bool,
+        k: int,
+        offset: int,
+        min_score: float | None,
+        fields: list[str] | None,
+        allowed: np.ndarray | None = None,
+        fusion: str = "image",
+        total: int | None = None,
+    ) -> dict:
+        """One page of `rows` by score; `total` overrides the ranked count (a kNN-list page of a larger ranking)."""
+        hit_rows, hit_counts = self._keyword_hits(snap, query, allowed)
+        hit_boosts = keyword_boosts(hit_counts, fusion, FUSION_RRF_K)
+        rows, scores = boost_candidates(rows, scores, hit_rows, hit_boosts, snap.embeddings, query_emb, exhaustive)
+        if snap.tombstoned:
+            keep = snap.alive[rows]
+            rows, scores = rows[keep], scores[keep]
+
+        if min_score is not None:
+            keep = scores >= min_score
+            rows, scores = rows[keep], scores[keep]
+        if total is None:
+            total = len(scores)
+
+        top_rows, top_scores = top_k(rows, scores, offset + k)
+        projected = [f for f in fields or [] if f not in UNPROJECTABLE_FIELDS]
+        results = []
+        for idx, score in zip(top_rows[offset:].tolist(), top_scores[offset:].tolist()):
+            rec = snap.registry[idx]
+            result = {"id": rec.get("id", rec.get("name_of_file")), "score": round(float(score), 4)}
+            for field in projected:
+                result[field] = rec.get(field)
+            results.append(result)
+
+        end = offset + len(results)
+        return {
+            "results": results,
+            "offset": offset,
+            "k": k,
+            "total": total,
+            "nextOffset": end if end < total else None,
+        }
 
     def remove_from_memory(self, filename: str) -> bool:
-        if not self.registry or self.embeddings is None:
-            return False
+        return bool(self.tombstone([filename]))
+
+    def tombstone(self, filenames: list[str]) -> list[str]:
+        """Hide the rows of `filenames` from search (O(1) per file); returns the filenames that had rows.
+
+        Rows stay in the registry, matrices and indexes until `compact_memory`
+        drops them; compaction is scheduled once enough rows are tombstoned.
+        """
+        removed: list[str] = []
+        with self._mutate_lock:
+            snap = self.snapshot
+            alive = snap.alive.copy()
+            dead = 0
+            for filename in filenames:
+                rows = [row for row in snap.file_rows.get(filename, []) if alive[row]]
+                if not rows:
+                    continue
+                alive[rows] = False
+                dead += len(rows)
+                removed.append(filename)
+            if not removed:
+                return removed
+            snap = self.publish(snap.replace(alive=alive, tombstoned=snap.tombstoned + dead))
+            due = snap.tombstoned >= min(TOMBSTONE_COMPACT_ROWS, max(1, int(TOMBSTONE_COMPACT_RATIO * len(snap.registry))))
+        print(f"[DELETE] Tombstoned {len(removed)} file(s). Live count: {snap.live_count}")
+        if due:
+            self.memory_compactor.submit(["tombstones"])
+        return removed
+
+    def compact_memory(self) -> int:
+        """Publish a snapshot without the tombstoned rows, rebuilt in one pass; returns the rows dropped."""
+        with self._mutate_lock:
+            snap = self.snapshot
+            dead = np.flatnonzero(~snap.alive)
+            if not len(dead) or snap.embeddings is None:
+                return 0
+            started = time.perf_counter()
+            keep = snap.alive
+            registry = [rec for rec, ok in zip(snap.registry, keep.tolist()) if ok]
+            embeddings = np.asarray(snap.embeddings[keep])
+            text_embeddings = None if snap.text_embeddings is None else np.asarray(snap.text_embeddings[keep])
+            embeddings, text_embeddings = self._shared_matrices(registry, embeddings, text_embeddings)
+            vector_index = None
+            if snap.vector_index is not None:
+                vector_index = snap.vector_index.copy()
+                vector_index.remove(dead, embeddings)
+            keyword_index = snap.keyword_index.copy()
+            keyword_index.remove(dead)
+            facet_index = snap.facet_index.copy()
+            facet_index.remove(dead)
+            self.publish(IndexSnapshot.build(registry, embeddings, text_embeddings, vector_index, keyword_index, facet_index))
+        print(f"[DELETE] Compacted {len(dead)} tombstoned rows in {(time.perf_counter() - started) * 1000:.0f}ms. Count: {len(registry)}")
+        return len(dead)
+
+    def _shared_matrices(
+        self, registry: list[dict], embeddings: np.ndarray, text_embeddings: np.ndarray | None
+    ) -> tuple[np.ndarray, np.ndarray | None]:
+        """Under several server workers, mappings of the edited matrices' `.npy` files instead of private copies.
+
+        Workers whose libraries converge to the same rows map the same file, so
+        the page cache keeps holding one copy after deletes and uploads.
+        """
+        if WORKER_PROCESSES <= 1:
+            return embeddings, text_embeddings
+        ids = [record_key(rec, str(i)) for i, rec in enumerate(registry)]
+        embeddings = load_embedding_matrix(np.asarray(embeddings), "image_embedding", ids, VECTORS_DIR)
+        if text_embeddings is not None:
+            text_embeddings = load_embedding_matrix(np.asarray(text_embeddings), "text_embedding", ids, VECTORS_DIR)
+        return embeddings, text_embeddings
+
+    def mark_applied(self, segment: Path | None) -> None:
+        """Record a registry segment this process wrote and already applied (deletes)."""
+        if segment is not None:
+            with self._mutate_lock:
+                self._segments_applied.add(segment.name)
+
+    def sync_from_store(self) -> None:
+        """Apply registry segments written by other processes (server workers, pipeline runs).
+
+        Deletions become tombstones and upserts go through `append_records`.
+        A compaction that only folded segments already applied here keeps the
+        in-memory view; any other base change or an upsert that cannot be
+        appended falls back to a full reload.
+        """
+        with self._mutate_lock:
+            base_mtime = registry_store.base_mtime_ns()
+            if base_mtime != self._base_mtime:
+                folded = registry_store.folded_since(self._base_mtime)
+                if folded is None or not folded <= self._segments_applied:
+                    self._read_registry()
+                    return
+                self._base_mtime = base_mtime
+                self._segments_applied -= folded
+            if not self.index_built:
+                self._read_registry()
+                return
+            segments = [segment for segment in registry_store.list_segments() if segment.name not in self._segments_applied]
+            try:
+                entries = [(segment, list(registry_store.iter_segment_entries(segment))) for segment in segments]
+            except FileNotFoundError:
+                # Folded into the base while we were reading it.
+                self._read_registry()
+                return
+            for segment, seg_entries in entries:
+                deleted = [str(entry.get("name_of_file")) for entry in seg_entries if entry.get("op") == "delete"]
+                records = [entry["record"] for entry in seg_entries if entry.get("op") == "put" and isinstance(entry.get("record"), dict)]
+                if deleted:
+                    self.tombstone(deleted)
+                if records and not self.append_records(records):
+                    self._read_registry()
+                    return
+                self._segments_applied.add(segment.name)
+        if segments:
+            print(f"[SYNC] Applied {len(segments)} registry segment(s) from other processes. Live count: {self.live_count}")
 
-        target_idx = -1
-        for i, rec in enumerate(self.registry):
-            if rec.get("name_of_file") == filename:
-                target_idx = i
-                break
 
-        if target_idx == -1:
-            return False
+resources = BackendResources()
+graph_prep_state = {"status": "idle"}
 
-        self.registry.pop(target_idx)
-        if target_idx < len(self.embeddings):
-            self.embeddings = np.delete(self.embeddings, target_idx, axis=0)
-        print(f"[DELETE] Removed from memory. New count: {len(self.registry)}")
-        return True
 
+def _run_graph_prep() -> None:
+    graph_prep_state["status"] = "running"
+    prep_script = ROOT_DIR / CFG["paths"]["graph_prep"]
+    try:
+        result = subprocess.run([sys.executable, str(prep_script)])
+        graph_prep_state["status"] = "done" if result.returncode == 0 else "failed"
+    except Exception as exc:
+        print(f"[PREP] Graph prep failed: {exc}")
+        graph_prep_state["status"] = "failed"
+    print(f"[PREP] Graph prep {graph_prep_state['status']}.")
 
-resources = BackendResources()
+
+def _readiness() -> dict:
+    return {
+        "ready": resources.ready,
+        "registry_loaded": resources.registry_loaded,
+        "model_loaded": resources.model is not None,
+        "index_built": resources.index_built,
+        "starting": resources.loading,
+        "graph_prep": graph_prep_state["status"],
+    }
 
 
 @app.route("/health")
 def health():
-    return jsonify({"status": "ok", "items": len(resources.embeddings) if resources.embeddings is not None else 0})
+    return jsonify({"status": "ok", "items": resources.live_count if resources.embeddings is not None else 0, **_readiness()})
+
+
+@app.route("/api/stats")
+def stats():
+    return jsonify(
+        {
+            "generation": resources.generation,
+            "expansionCache": resources.expansion_cache.stats(),
+            "searchCache": resources.search_cache.stats(),
+            "searchBatcher": resources.search_batcher.stats(),
+            "tombstones": {
+                "rows": resources.tombstoned,
+                "memoryCompaction": resources.memory_compactor.stats(),
+                "graphCompaction": graph_compactor.stats(),
+            },
+            "serving": {"pid": os.getpid(), "workers": WORKER_PROCESSES},
+        }
+    )
+
+
+def _fusion_option(args) -> str | None:
+    fusion = args.get("fusion")
+    if fusion in (None, ""):
+        return None
+    if str(fusion).lower() not in FUSION_MODES:
+        raise ValueError(f"fusion must be one of {', '.join(FUSION_MODES)}")
+    return str(fusion).lower()
+
+
+def _search_options(args) -> dict:
+    """Parse k/offset/min_score/fields/facet filter parameters; raises ValueError on bad input."""
+    k = int(args.get("k", SEARCH_DEFAULT_K))
+    offset = int(args.get("offset", 0))
+    if not 1 <= k <= SEARCH_MAX_K:
+        raise ValueError(f"k must be between 1 and {SEARCH_MAX_K}")
+    if offset < 0:
+        raise ValueError("offset must be >= 0")
+    min_score = args.get("min_score")
+    raw_fields = args.get("fields") or ""
+    if isinstance(raw_fields, list):
+        raw_fields = ",".join(str(f) for f in raw_fields)
+    fields = [f.strip() for f in raw_fields.split(",") if f.strip()]
+    return {
+        "k": k,
+        "offset": offset,
+        "min_score": float(min_score) if min_score not in (None, "") else None,
+        "fields": fields or None,
+        "filters": _facet_filters(args),
+    }
+
+
+def _facet_filters(args) -> dict[str, list[str]] | None:
+    """Facet filters from repeated `final_category=...&final_category=...` params (or JSON lists)."""
+    filters: dict[str, list[str]] = {}
+    for field in FACET_FIELDS:
+        raw = args.getlist(field) if hasattr(args, "getlist") else args.get(field)
+        if raw is None:
+            continue
+        values = [raw] if isinstance(raw, (str, int, float)) else list(raw)
+        values = sorted({str(v) for v in values if str(v) != ""})
+        if values:
+            filters[field] = values
+    return filters or None
 
 
 @app.route("/api/search")
@@ -300,16 +1065,90 @@ def search():
     query = request.args.get("q", "")
     if not query:
         return jsonify({"error": "No query provided"}), 400
+    try:
+        options = _search_options(request.args)
+        fusion = _fusion_option(request.args)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
     if not resources.ready:
-        return jsonify({"error": "Server not ready"}), 503
+        return jsonify({"error": "Server not ready", **_readiness()}), 503
 
     try:
-        return jsonify(resources.search(query))
+        return jsonify(resources.search(query, fusion=fusion, **options))
     except Exception as exc:
         print(f"[BACKEND] Search error: {exc}")
         return jsonify({"error": str(exc)}), 500
 
 
+@app.route("/api/search/batch", methods=["POST"])
+def search_batch():
+    data = request.get_json(silent=True)
+    queries = data.get("queries") if isinstance(data, dict) else None
+    if not isinstance(queries, list) or not queries or not all(isinstance(q, str) and q.strip() for q in queries):
+        return jsonify({"error": "queries must be a non-empty list of strings"}), 400
+    if len(queries) > SEARCH_BATCH_MAX_QUERIES:
+        return jsonify({"error": f"At most {SEARCH_BATCH_MAX_QUERIES} queries per batch"}), 400
+    try:
+        options = _search_options(data)
+        fusion = _fusion_option(data)
+    except (TypeError, ValueError) as exc:
+        return jsonify({"error": str(exc)}), 400
+    if not resources.ready:
+        return jsonify({"error": "Server not ready", **_readiness()}), 503
+
+    try:
+        results = resources.search_batch(queries, fusion=fusion, **options)
+        return jsonify({"count": len(results), "results": results})
+    except Exception as exc:
+        print(f"[BACKEND] Batch search error: {exc}")
+        return jsonify({"error": str(exc)}), 500
+
+
+@app.route("/api/similar/<path:record_id>")
+def similar(record_id):
+    try:
+        options = _search_options(request.args)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    if resources.embeddings is None or not resources.index_built:
+        return jsonify({"error": "Server not ready", **_readiness()}), 503
+
+    try:
+        result = resources.similar(record_id, neighbor_ids=graph_tile_cache.neighbor_ids(VECTORS_DIR, record_id), **options)
+    except Exception as exc:
+        print(f"[BACKEND] Similar search error: {exc}")
+        return jsonify({"error": str(exc)}), 500
+    if result is None:
+        return jsonify({"error": f"Unknown id {record_id}"}), 404
+    return jsonify(result)
+
+
+@app.route("/api/search/image", methods=["POST"])
+def search_image():
+    upload = request.files.get("image")
+    if upload is None or not upload.filename:
+        return jsonify({"error": "Image file required (form field 'image')"}), 400
+    try:
+        options = _search_options(request.form)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    if not resources.ready:
+        return jsonify({"error": "Server not ready", **_readiness()}), 503
+
+    try:
+        from PIL import Image
+
+        with Image.open(upload.stream) as image:
+            query_emb = resources.encode_image(image)
+    except Exception as exc:
+        return jsonify({"error": f"Could not read image: {exc}"}), 400
+    try:
+        return jsonify(resources.rank("", query_emb, **options))
+    except Exception as exc:
+        print(f"[BACKEND] Image search error: {exc}")
+        return jsonify({"error": str(exc)}), 500
+
+
 @app.route("/vectors/<path:path>")
 def serve_vectors(path):
     try:
@@ -318,6 +1157,57 @@ def serve_vectors(path):
         return jsonify({"error": str(exc)}), 500
 
 
+def _send_precompressed(path: Path, mimetype: str):
+    if not path.exists():
+        return jsonify({"error": f"{path.name} not found"}), 404
+
+    accepted = {token.split(";")[0].strip() for token in request.headers.get("Accept-Encoding", "").split(",")}
+    served, encoding = path, None
+    for enc, suffix in (("br", ".br"), ("gzip", ".gz")):
+        candidate = path.with_name(path.name + suffix)
+        if enc in accepted and candidate.exists() and candidate.stat().st_mtime_ns >= path.stat().st_mtime_ns:
+            served, encoding = candidate, enc
+            break
+
+    stat = path.stat()
+    etag = f"{stat.st_size:x}-{stat.st_mtime_ns:x}-{encoding or 'identity'}"
+    response = send_file(served, mimetype=mimetype, etag=etag, conditional=True, max_age=0)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@app.route("/api/graph/columns")
+def serve_graph_columns():
+    return _send_precompressed(VECTORS_DIR / BINARY_FILENAME, "application/octet-stream")
+
+
+@app.route("/api/graph/metadata")
+def serve_graph_metadata():
+    return _send_precompressed(VECTORS_DIR / METADATA_FILENAME, "application/json")
+
+
+@app.route(f"/api/graph/tiles/<int(max={ZOOM_LIMIT}):z>/<int:x>/<int:y>")
+def serve_graph_tile(z, x, y):
+    etag = graph_tile_cache.etag(VECTORS_DIR, z, x, y)
+    if etag is not None and request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+
+    # The ETag comes from the same loaded pyramid as the body (a reload may have landed since).
+    loaded = graph_tile_cache.get_tile_with_etag(VECTORS_DIR, z, x, y)
+    if loaded is None:
+        return jsonify({"error": f"Tile {z}/{x}/{y} not found"}), 404
+    tile, etag = loaded
+    response = jsonify(tile)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "public, max-age=60, must-revalidate"
+    return response
+
+
 def _serve_image_from_data(path):
     img_dir = DATA_DIR_ROOT / "img"
     return send_from_directory(img_dir, path)
@@ -338,36 +1228,95 @@ def serve_thumbnail(path):
     return _serve_thumbnail_from_data(path)
 
 
-def _rebuild_graph_neighbors_after_deletion(nodes: list[dict], kept_indices: list[int]) -> list[dict]:
-    old_to_new: dict[int, int] = {old_idx: new_idx for new_idx, old_idx in enumerate(kept_indices)}
-    rebuilt_nodes: list[dict] = []
+@app.route("/img/thumb/<int:size>/<path:filename>")
+def serve_sized_thumbnail(size, filename):
+    for _ in range(2):
+        try:
+            thumb_path = thumbnail_cache.get(size, filename)
+        except DECODE_ERRORS as exc:
+            print(f"[THUMBS] Could not decode {filename} ({exc}); serving the original.")
+            return send_from_directory(thumbnail_cache.img_dir, filename)
+        if thumb_path is None:
+            return jsonify({"error": f"No {size}px thumbnail for {filename}"}), 404
+        try:
+            response = send_file(thumb_path, mimetype="image/webp", conditional=True, max_age=86400)
+        except FileNotFoundError:
+            # Evicted by another request between get() and send_file(); generate it again.
+            continue
+        response.headers["Cache-Control"] = "public, max-age=86400, must-revalidate"
+        return response
+    return send_from_directory(thumbnail_cache.img_dir, filename)
 
-    for old_idx in kept_indices:
-        node = dict(nodes[old_idx])
-        raw_neighbors = node.get("neighbors", [])
-        if not isinstance(raw_neighbors, list):
-            raw_neighbors = []
 
-        remapped_neighbors: list[int] = []
-        seen: set[int] = set()
-        for neighbor_idx in raw_neighbors:
-            if not isinstance(neighbor_idx, int):
-                continue
-            new_neighbor_idx = old_to_new.get(neighbor_idx)
-            if new_neighbor_idx is None:
-                continue
-            if new_neighbor_idx == old_to_new[old_idx]:
-                continue
-            if new_neighbor_idx in seen:
-                continue
-            seen.add(new_neighbor_idx)
-            remapped_neighbors.append(new_neighbor_idx)
+def _compact_graph(filenames: list[str]) -> None:
+    """Drop the nodes of deleted `filenames` from graph_data.json, the binary payload and the tiles in one rewrite."""
+    # Server workers deleting at the same time would otherwise overwrite each other's rewrite.
+    with file_lock(GRAPH_FILE.with_suffix(".lock")):
+        _compact_graph_locked(filenames)
 
-        node["neighbors"] = remapped_neighbors
-        node["idx"] = old_to_new[old_idx]
-        rebuilt_nodes.append(node)
 
-    return rebuilt_nodes
+def _compact_graph_locked(filenames: list[str]) -> None:
+    if not GRAPH_FILE.exists():
+        return
+    with open(GRAPH_FILE, "r", encoding="utf-8") as f:
+        raw_graph_data = json.load(f)
+    graph_data, skipped = validate_graph_data(raw_graph_data, strict=STRICT_VALIDATION)
+    if skipped:
+        print(f"[DELETE] Schema validation skipped {skipped} invalid graph nodes.")
+    deleted = set(filenames)
+    nodes = graph_data.get("nodes", [])
+    kept_indices = [
+        i for i, node in enumerate(nodes)
+        if not ("/" in str(node.get("img", "")) and str(node.get("img", "")).rsplit("/", 1)[1] in deleted)
+    ]
+    if len(kept_indices) == len(nodes):
+        return
+    knn_meta = (graph_data.get("meta") or {}).get("knn") or {}
+    new_nodes = _rebuild_graph_neighbors_after_deletion(nodes, kept_indices, int(knn_meta.get("k", GRAPH_NEIGHBORS_K)))
+    graph_data["nodes"] = new_nodes
+    if "meta" not in graph_data or not isinstance(graph_data["meta"], dict):
+        graph_data["meta"] = {}
+    graph_data["meta"]["count"] = len(new_nodes)
+    tmp_path = GRAPH_FILE.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(graph_data, f)
+    os.replace(tmp_path, GRAPH_FILE)
+    write_graph_payload(new_nodes, graph_data["meta"], VECTORS_DIR)
+    write_tile_pyramid(new_nodes, VECTORS_DIR, TILES_MAX_ZOOM, TILES_CELL_BITS)
+    print(f"[DELETE] Removed {len(nodes) - len(kept_indices)} nodes from graph_data.json and rebuilt neighbor indices")
+
+
+# Deleted files are batched into one graph rewrite; a restart's graph prep rebuilds from the registry anyway.
+graph_compactor = CoalescingWorker(_compact_graph, COMPACTION_DELAY_MS, name="graph")
+
+
+def _rebuild_graph_neighbors_after_deletion(nodes: list[dict], kept_indices: list[int], k: int = GRAPH_NEIGHBORS_K) -> list[dict]:
+    """Surviving nodes with renumbered neighbor lists.
+
+    Lists that lost entries are refilled to `k` with an exact top-k over the
+    in-memory embedding matrix, computed for those rows only.
+    """
+    offsets, flat = neighbors_csr(nodes)
+    kept = np.asarray(kept_indices, dtype=np.int64)
+    lengths_before = np.diff(offsets)[kept]
+    offsets, flat = remap_neighbors(offsets, flat, kept)
+    kept_nodes = [dict(nodes[i]) for i in kept_indices]
+
+    lost = np.flatnonzero((np.diff(offsets) < lengths_before) & (np.diff(offsets) < k))
+    if len(lost):
+        # Rows and matrix come from one snapshot, so they agree without holding the writer lock.
+        snap = resources.snapshot
+        matrix = snap.embeddings
+        rows = np.array([-1 if (row := snap.row_for_id(str(node.get("id")))) is None else row for node in kept_nodes], dtype=np.int64)
+        if matrix is not None:
+            (offsets, flat), refilled = refill_neighbors(offsets, flat, lost, rows, matrix, k)
+            if refilled:
+                print(f"[DELETE] Refilled neighbor lists of {refilled} nodes from exact top-{k}")
+
+    for i, node in enumerate(kept_nodes):
+        node["neighbors"] = flat[offsets[i]:offsets[i + 1]].tolist()
+        node["idx"] = i
+    return kept_nodes
 
 
 @app.route("/api/analyze_batch", methods=["POST"])
@@ -463,13 +1412,26 @@ def run_local_pipeline():
         print("[PIPELINE] Image processing complete.")
 
         datatools_script = ROOT_DIR / CFG["paths"]["data_tools"]
-        subprocess.run([sys.executable, str(datatools_script), "--root", str(DATA_DIR_ROOT), "--consolidate"], check=True)
+        listed = {segment.name for segment in registry_store.list_segments()}
+        cmd_consolidate = [sys.executable, str(datatools_script), "--root", str(DATA_DIR_ROOT), "--consolidate"]
+        with subprocess.Popen(cmd_consolidate) as consolidate:
+            if consolidate.wait() != 0:
+                raise subprocess.CalledProcessError(consolidate.returncode, cmd_consolidate)
+        # Segment names end in the writer's pid: read back only what this consolidation appended.
+        results = []
+        try:
+            for segment in registry_store.list_segments():
+                if segment.name not in listed and segment.stem.endswith(f"_{consolidate.pid}"):
+                    results.extend(registry_store.read_segment_records(segment, fields=PIPELINE_RESULT_FIELDS))
+        except Exception as exc:
+            print(f"[PIPELINE] Error reading the consolidated segment for results: {exc}")
 
         graph_script = ROOT_DIR / CFG["paths"]["graph_prep"]
-        subprocess.run([sys.executable, str(graph_script)], check=True)
+        subprocess.run([sys.executable, str(graph_script), "--incremental"], check=True)
 
-        print("[PIPELINE] Reloading backend resources...")
-        resources.load_resources()
+        # Appends the consolidated segment in place (a full reload only if it cannot be appended).
+        resources.sync_from_store()
+        registry_store.compact_async(COMPACT_MIN_SEGMENTS)
 
         try:
             shutil.rmtree(upload_dir, ignore_errors=True)
@@ -477,16 +1439,6 @@ def run_local_pipeline():
         except Exception as exc:
             print(f"[PIPELINE] Warning: Could not clean upload folder: {exc}")
 
-        results = []
-        master_path = DATA_DIR_ROOT / "vectors" / "master_registry.json"
-        if master_path.exists():
-            try:
-                with open(master_path, "r", encoding="utf-8") as f:
-                    all_records = json.load(f)
-                results = all_records[-len(saved_paths):] if all_records else []
-            except Exception as exc:
-                print(f"[PIPELINE] Error loading master registry for results: {exc}")
-
         return jsonify(
             {
                 "success": True,
@@ -500,6 +1452,26 @@ def run_local_pipeline():
         return jsonify({"success": False, "error": str(exc)}), 500
 
 
+def _valid_filename(filename) -> bool:
+    return isinstance(filename, str) and filename not in ("", ".", "..") and Path(filename).name == filename
+
+
+def _delete_image_files(filename: str) -> list[str]:
+    """Remove the original, legacy thumb and cached thumbnail variants; returns what was deleted."""
+    img_path = DATA_DIR_ROOT / "img" / filename
+    thumb_path = DATA_DIR_ROOT / "img" / "thumb" / filename
+    deleted_files = []
+    if img_path.exists():
+        img_path.unlink()
+        deleted_files.append("original")
+    if thumb_path.exists():
+        thumb_path.unlink()
+        deleted_files.append("thumb")
+    if thumbnail_cache.discard(filename):
+        deleted_files.append("thumb_variants")
+    return deleted_files
+
+
 @app.route("/api/delete/image", methods=["DELETE"])
 def delete_image():
     try:
@@ -507,48 +1479,19 @@ def delete_image():
         filename = data.get("filename")
         if not filename:
             return jsonify({"error": "Filename required"}), 400
+        if not _valid_filename(filename):
+            return jsonify({"error": "Invalid filename"}), 400
 
         print(f"[DELETE] Request to delete: {filename}")
-        img_path = DATA_DIR_ROOT / "img" / filename
-        thumb_path = DATA_DIR_ROOT / "img" / "thumb" / filename
-        deleted_files = []
-
-        if img_path.exists():
-            img_path.unlink()
-            deleted_files.append("original")
-        if thumb_path.exists():
-            thumb_path.unlink()
-            deleted_files.append("thumb")
-
-        if REGISTRY_PATH.exists():
-            with open(REGISTRY_PATH, "r", encoding="utf-8") as f:
-                reg_data = json.load(f)
-            original_len = len(reg_data)
-            new_reg = [r for r in reg_data if r.get("name_of_file") != filename]
-            if len(new_reg) < original_len:
-                with open(REGISTRY_PATH, "w", encoding="utf-8") as f:
-                    json.dump(new_reg, f, indent=2)
-                print(f"[DELETE] Removed from master_registry.json ({original_len} -> {len(new_reg)})")
-
-        if GRAPH_FILE.exists():
-            with open(GRAPH_FILE, "r", encoding="utf-8") as f:
-                raw_graph_data = json.load(f)
-            graph_data, skipped = validate_graph_data(raw_graph_data)
-            if skipped:
-                print(f"[DELETE] Schema validation skipped {skipped} invalid graph nodes.")
-            nodes = graph_data.get("nodes", [])
-            kept_indices = [i for i, node in enumerate(nodes) if not str(node.get("img", "")).endswith(f"/{filename}")]
-            if len(kept_indices) < len(nodes):
-                new_nodes = _rebuild_graph_neighbors_after_deletion(nodes, kept_indices)
-                graph_data["nodes"] = new_nodes
-                if "meta" not in graph_data or not isinstance(graph_data["meta"], dict):
-                    graph_data["meta"] = {}
-                graph_data["meta"]["count"] = len(new_nodes)
-                with open(GRAPH_FILE, "w", encoding="utf-8") as f:
-                    json.dump(graph_data, f)
-                print("[DELETE] Removed from graph_data.json and rebuilt neighbor indices")
+        deleted_files = _delete_image_files(filename)
+
+        if REGISTRY_PATH.exists() or registry_store.list_segments():
+            resources.mark_applied(registry_store.append_deletions([filename]))
+            print("[DELETE] Appended tombstone to registry store")
 
         removed_from_memory = resources.remove_from_memory(filename)
+        graph_compactor.submit([filename])
+        registry_store.compact_async(COMPACT_MIN_SEGMENTS)
         return jsonify(
             {
                 "success": True,
@@ -562,6 +1505,66 @@ def delete_image():
         return jsonify({"error": str(exc)}), 500
 
 
+@app.route("/api/delete/batch", methods=["POST"])
+def delete_batch():
+    """Delete many images by filename and/or record id.
+
+    One registry segment holds every tombstone, the in-memory rows are
+    tombstoned together and dropped by one compaction pass, and the graph is
+    rewritten once for the whole batch.
+    """
+    data = request.get_json(silent=True) or {}
+    filenames, ids = data.get("filenames", []), data.get("ids", [])
+    if not isinstance(filenames, list) or not isinstance(ids, list):
+        return jsonify({"error": "filenames and ids must be lists"}), 400
+    if not filenames and not ids:
+        return jsonify({"error": "filenames or ids required"}), 400
+    if len(filenames) + len(ids) > DELETE_BATCH_MAX:
+        return jsonify({"error": f"At most {DELETE_BATCH_MAX} items per batch"}), 400
+
+    try:
+        results: list[dict] = []
+        targets: dict[str, None] = {}
+        for item in filenames:
+            if not _valid_filename(item):
+                results.append({"item": item, "success": False, "error": "Invalid filename"})
+                continue
+            results.append({"item": item, "filename": item})
+            targets[item] = None
+        for item in ids:
+            filename = resources.filename_for_id(str(item))
+            if filename is None or not _valid_filename(filename):
+                results.append({"item": item, "success": False, "error": "Unknown id"})
+                continue
+            results.append({"item": item, "filename": filename})
+            targets[filename] = None
+
+        batch = list(targets)
+        print(f"[DELETE] Batch request to delete {len(batch)} files")
+        deleted_files = {filename: _delete_image_files(filename) for filename in batch}
+        if batch and (REGISTRY_PATH.exists() or registry_store.list_segments()):
+            resources.mark_applied(registry_store.append_deletions(batch))
+        removed = set(resources.tombstone(batch))
+        if removed:
+            resources.memory_compactor.submit(["tombstones"])
+        graph_compactor.submit(batch)
+        registry_store.compact_async(COMPACT_MIN_SEGMENTS)
+
+        for result in results:
+            if "filename" in result:
+                result.update(success=True, files=deleted_files[result["filename"]], memory_updated=result["filename"] in removed)
+        return jsonify(
+            {
+                "success": True,
+                "deleted": sum(1 for result in results if result["success"]),
+                "results": results,
+            }
+        )
+    except Exception as exc:
+        print(f"[DELETE] Batch error: {exc}")
+        return jsonify({"error": str(exc)}), 500
+
+
 @app.route("/")
 def serve_index():
     return send_from_directory(FRONTEND_DIR / "dist", "index.html")
@@ -574,6 +1577,27 @@ def serve_static(path):
     return serve_index()
 
 
+def serve_worker(workers: int) -> None:
+    """Per-process startup under the multi-process WSGI server (see wsgi.py)."""
+    global WORKER_PROCESSES
+    WORKER_PROCESSES = max(1, int(workers))
+    print(f"[BACKEND] Worker {os.getpid()} of {WORKER_PROCESSES} starting.")
+    resources.start_loading()
+    if WORKER_PROCESSES > 1:
+        threading.Thread(target=_sync_loop, name="registry-sync", daemon=True).start()
+
+
+def _sync_loop() -> None:
+    """Poll the registry stamp and apply other processes' writes (deletes, uploads) to this worker."""
+    while True:
+        time.sleep(SYNC_INTERVAL_SECONDS)
+        if resources.registry_loaded and registry_watcher.changed():
+            try:
+                resources.sync_from_store()
+            except Exception as exc:
+                print(f"[SYNC] Registry sync failed: {exc}")
+
+
 def run_vite_dev():
     print("[VITE] Starting Vite development server...")
     os.chdir(FRONTEND_DIR)
@@ -586,11 +1610,10 @@ def main():
     print("=" * 50)
 
     if not GRAPH_FILE.exists():
-        print("[PREP] graph_data.json not found. Generating...")
-        prep_script = ROOT_DIR / CFG["paths"]["graph_prep"]
-        subprocess.run([sys.executable, str(prep_script)])
+        print("[PREP] graph_data.json not found. Generating in the background...")
+        threading.Thread(target=_run_graph_prep, name="graph-prep", daemon=True).start()
 
-    resources.load_resources()
+    resources.start_loading()
 
     flask_thread = threading.Thread(
         target=lambda: app.run(host="0.0.0.0", port=5000, debug=False, use_reloader=False),
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Recall / latency of hybrid (image + caption text) fusion modes against image-only search.
+
+Runs against a live backend. Judgments come from `--judgments` (JSONL lines
+{"query": ..., "relevant": [ids]}) or are sampled from the registry: the
+query is the first `--words` words of a record's `full_description` (the
+caption its `text_embedding` was built from; legacy records carry it as
+`caption`) and the record itself is the relevant hit. A warm-up pass fills
+the expansion and query embedding caches, so the timed passes compare
+scoring + fusion only.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+import urllib.parse
+import urllib.request
+from pathlib import Path
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(REPO_ROOT))
+sys.path.append(str(REPO_ROOT / "01_backend"))
+
+from config import load_config  # noqa: E402
+from registry_store import RegistryStore  # noqa: E402
+
+
+def caption_text(rec: dict) -> str:
+    return str(rec.get("full_description") or rec.get("caption") or "")
+
+
+def sample_judgments(vectors_dir: Path, count: int, words: int, seed: int) -> list[dict]:
+    records, matrices = RegistryStore(vectors_dir).read_columns(("text_embedding",), fields=("full_description", "caption"))
+    text = matrices["text_embedding"]
+    has_text = (np.abs(text).max(axis=1) > 0).tolist() if text.shape[1] else [False] * len(records)
+    records = [rec for rec, ok in zip(records, has_text) if ok and caption_text(rec).strip()]
+    random.Random(seed).shuffle(records)
+    return [
+        {"query": " ".join(caption_text(rec).split()[:words]), "relevant": [rec.get("id", rec.get("name_of_file"))]}
+        for rec in records[:count]
+    ]
+
+
+def search(url: str, query: str, k: int, fusion: str) -> tuple[list[str], str, float]:
+    params = urllib.parse.urlencode({"q": query, "k": k, "fusion": fusion})
+    start = time.perf_counter()
+    with urllib.request.urlopen(f"{url}/api/search?{params}", timeout=120) as res:
+        body = json.loads(res.read().decode("utf-8"))
+    return [r["id"] for r in body.get("results", [])], body.get("fusion", "image"), (time.perf_counter() - start) * 1000
+
+
+def main() -> int:
+    cfg = load_config(REPO_ROOT)
+    parser = argparse.ArgumentParser(description="Compare hybrid fusion modes with image-only search.")
+    parser.add_argument("--url", default="http://localhost:5000", help="Backend base URL.")
+    parser.add_argument("--vectors", default=str(REPO_ROOT / cfg["paths"]["data_root"] / "vectors"), help="Vectors directory holding the registry.")
+    parser.add_argument("--judgments", default="", help="JSONL file of {query, relevant} lines (default: sample from the registry).")
+    parser.add_argument("--queries", type=int, default=100, help="Sampled queries when no judgments file is given.")
+    parser.add_argument("--words", type=int, default=6, help="Caption words per sampled query.")
+    parser.add_argument("-k", type=int, default=20, help="Recall cutoff.")
+    parser.add_argument("--modes", nargs="+", default=["image", "weighted", "rrf"], help="Fusion modes to compare.")
+    args = parser.parse_args()
+
+    if args.judgments:
+        with open(args.judgments, "r", encoding="utf-8") as f:
+            judgments = [json.loads(line) for line in f if line.strip()]
+    else:
+        judgments = sample_judgments(Path(args.vectors), args.queries, args.words, seed=0)
+    if not judgments:
+        print("No judgments (records need full_description and text_embedding).")
+        return 1
+
+    for item in judgments:
+        search(args.url, item["query"], 1, "weighted")
+
+    print(f"{len(judgments)} queries, recall@{args.k}")
+    for mode in args.modes:
+        hits = total = 0
+        latencies: list[float] = []
+        served = set()
+        for item in judgments:
+            ids, effective, ms = search(args.url, item["query"], args.k, mode)
+            relevant = set(item["relevant"])
+            hits += len(relevant.intersection(ids))
+            total += len(relevant)
+            latencies.append(ms)
+            served.add(effective)
+        latencies.sort()
+        note = "" if served == {mode} else f"  (served as {', '.join(sorted(served))})"
+        print(
+            f"  {mode:<8} recall={hits / max(total, 1):.3f}  "
+            f"mean={statistics.mean(latencies):.1f}ms  p50={latencies[len(latencies) // 2]:.1f}ms  "
+            f"p95={latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]:.1f}ms{note}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
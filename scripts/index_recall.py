@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Recall@k / latency self-check of the IVF and int8-quantized search indexes against the exact backend."""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(REPO_ROOT))
+sys.path.append(str(REPO_ROOT / "01_backend"))
+
+from config import load_config  # noqa: E402
+from registry_store import RegistryStore  # noqa: E402
+from vector_index import ExactIndex, Int8Codes, IVFIndex, recall_at_k  # noqa: E402
+
+
+def load_matrix(vectors_dir: Path) -> np.ndarray:
+    _, matrices = RegistryStore(vectors_dir).read_columns(("image_embedding",), fields=())
+    matrix = matrices["image_embedding"]
+    matrix = matrix[np.abs(matrix).max(axis=1) > 0] if matrix.shape[1] else matrix
+    return matrix / (np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-8)
+
+
+def timed_ms(index: ExactIndex | IVFIndex, queries: np.ndarray, k: int) -> float:
+    start = time.perf_counter()
+    for q in queries:
+        index.search(q, k)
+    return (time.perf_counter() - start) * 1000 / max(len(queries), 1)
+
+
+def main() -> int:
+    cfg = load_config(REPO_ROOT)
+    search_cfg = cfg.get("search", {})
+    parser = argparse.ArgumentParser(description="Compare IVF search recall and latency with exact search.")
+    parser.add_argument("--vectors", default=str(REPO_ROOT / cfg["paths"]["data_root"] / "vectors"), help="Vectors directory holding the registry.")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N clustered random unit vectors instead of the registry.")
+    parser.add_argument("--dim", type=int, default=768, help="Dimension for --synthetic.")
+    parser.add_argument("--queries", type=int, default=200, help="Number of query vectors.")
+    parser.add_argument("-k", type=int, default=200, help="Recall cutoff (search returns 200 results).")
+    parser.add_argument("--nlist", type=int, default=int(search_cfg.get("ivf_nlist", 0)), help="IVF lists (0 = 4*sqrt(N)).")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[int(search_cfg.get("ivf_nprobe", 16))], help="nprobe values to sweep.")
+    parser.add_argument("--rerank", type=int, nargs="+", default=[int(search_cfg.get("rerank_candidates", 400))], help="int8 re-rank depths to sweep.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.synthetic:
+        # Clustered unit vectors; uniform noise has no neighbourhood structure for IVF to exploit.
+        centers = rng.standard_normal((max(1, args.synthetic // 200), args.dim)).astype(np.float32)
+        matrix = centers[rng.integers(0, len(centers), args.synthetic)]
+        matrix = matrix + 0.6 * rng.standard_normal(matrix.shape).astype(np.float32) / np.sqrt(args.dim) * np.linalg.norm(centers, axis=1).mean()
+        matrix = (matrix / np.linalg.norm(matrix, axis=1, keepdims=True)).astype(np.float32)
+    else:
+        matrix = load_matrix(Path(args.vectors))
+    if len(matrix) == 0:
+        print("No embeddings found.")
+        return 1
+
+    # Queries are perturbed library rows, close to the text-query/image geometry the backend sees.
+    queries = matrix[rng.choice(len(matrix), min(args.queries, len(matrix)), replace=False)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    start = time.perf_counter()
+    ivf = IVFIndex.build(matrix, nlist=args.nlist, nprobe=args.nprobe[0])
+    print(f"Built IVF over {len(matrix)} x {matrix.shape[1]} ({len(ivf.centroids)} lists) in {time.perf_counter() - start:.2f}s")
+    print(f"exact        : {timed_ms(ExactIndex(matrix), queries, args.k):.2f} ms/query")
+    codes = Int8Codes.encode(matrix)
+    print(f"int8 codes   : {codes.nbytes / 2**20:.1f} MiB vs float32 {matrix.nbytes / 2**20:.1f} MiB")
+    for rerank in args.rerank:
+        quantized = ExactIndex(matrix, codes, rerank)
+        recall = recall_at_k(quantized, queries, args.k)
+        print(f"int8 rerank={rerank:<4}: {timed_ms(quantized, queries, args.k):.2f} ms/query, recall@{args.k}={recall:.3f}")
+    for nprobe in args.nprobe:
+        ivf.nprobe = max(1, min(nprobe, len(ivf.centroids)))
+        recall = recall_at_k(ivf, queries, args.k)
+        print(f"ivf nprobe={ivf.nprobe:<4}: {timed_ms(ivf, queries, args.k):.2f} ms/query, recall@{args.k}={recall:.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Concurrent /api/search load generator for tuning search.microbatch_* settings."""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Fire concurrent searches at a running backend.")
+    parser.add_argument("--url", default="http://localhost:5000", help="Backend base URL.")
+    parser.add_argument("--users", type=int, default=50, help="Concurrent client threads.")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per user.")
+    parser.add_argument("--queries", default="door,window,chair,table,stair,roof,column,wall", help="Comma-separated query pool.")
+    args = parser.parse_args()
+
+    pool = [q.strip() for q in args.queries.split(",") if q.strip()]
+    latencies: list[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def user(uid: int) -> None:
+        nonlocal errors
+        for i in range(args.requests):
+            # Suffix keeps most requests out of the result cache so the encoder path is measured.
+            query = f"{pool[(uid + i) % len(pool)]} {uid}-{i}"
+            url = f"{args.url}/api/search?{urllib.parse.urlencode({'q': query, 'k': 20})}"
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(url, timeout=60) as res:
+                    res.read()
+                ok = True
+            except Exception:
+                ok = False
+            with lock:
+                if ok:
+                    latencies.append((time.perf_counter() - start) * 1000)
+                else:
+                    errors += 1
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=user, args=(u,)) for u in range(args.users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    if not latencies:
+        print(f"All {errors} requests failed.")
+        return 1
+    latencies.sort()
+    print(f"{len(latencies)} ok / {errors} failed in {elapsed:.2f}s -> {len(latencies) / elapsed:.1f} req/s")
+    print(f"latency ms: p50={statistics.median(latencies):.1f} p99={latencies[int(len(latencies) * 0.99) - 1]:.1f} max={latencies[-1]:.1f}")
+    try:
+        with urllib.request.urlopen(f"{args.url}/api/stats", timeout=10) as res:
+            print("searchBatcher:", json.loads(res.read()).get("searchBatcher"))
+    except Exception:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,65 @@
+"""
+Production API launcher (no Vite): python serve.py
+
+`serving.server` picks the WSGI server:
+- `gunicorn` (auto on Linux/macOS): `gunicorn -c gunicorn.conf.py wsgi:app`,
+  `serving.workers` processes sharing the memory-mapped search arrays.
+- `waitress` (auto on Windows, where gunicorn does not run): one process
+  with `serving.threads` threads. Multi-process serving is not available on
+  Windows; `serving.workers` is ignored there.
+"""
+from __future__ import annotations
+
+import os
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from config import load_config  # noqa: E402
+
+SERVERS = ("gunicorn", "waitress")
+
+
+def choose_server(setting: str, platform: str = sys.platform) -> str:
+    """`serving.server` resolved for `platform`; `auto` means gunicorn except on Windows."""
+    setting = (setting or "auto").lower()
+    if setting == "auto":
+        return "waitress" if platform == "win32" else "gunicorn"
+    if setting not in SERVERS:
+        raise ValueError(f"serving.server must be auto, gunicorn or waitress (got {setting!r})")
+    if setting == "gunicorn" and platform == "win32":
+        raise ValueError("gunicorn does not run on Windows; use serving.server = waitress")
+    return setting
+
+
+def main() -> int:
+    serving = load_config(ROOT_DIR).get("serving", {})
+    try:
+        server = choose_server(str(serving.get("server", "auto")))
+    except ValueError as exc:
+        print(f"[SERVE] {exc}")
+        return 2
+
+    if server == "gunicorn":
+        os.chdir(ROOT_DIR)
+        os.execv(sys.executable, [sys.executable, "-m", "gunicorn", "-c", str(ROOT_DIR / "gunicorn.conf.py"), "wsgi:app"])
+
+    try:
+        from waitress import serve
+    except ImportError:
+        print("[SERVE] waitress is not installed (pip install -r requirements.txt).")
+        return 1
+    if int(serving.get("workers", 0)) > 1:
+        print("[SERVE] waitress serves from one process; serving.workers is ignored.")
+    import run_viz
+
+    run_viz.serve_worker(1)
+    serve(run_viz.app, listen=str(serving.get("bind", "0.0.0.0:5000")), threads=int(serving.get("threads", 4)))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
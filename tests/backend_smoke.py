@@ -5,6 +5,8 @@ import json
 import os
 import shutil
 import sys
+import threading
+import time
 from pathlib import Path
 
 import numpy as np
@@ -16,8 +18,24 @@ def main() -> int:
     if str(repo_root) not in sys.path:
         sys.path.insert(0, str(repo_root))
     import run_viz  # noqa: WPS433
+    from embedding_store import dense_matrix, load_embedding_matrix, stack_vectors  # noqa: WPS433
+    from expansion_cache import ExpansionCache  # noqa: WPS433
+    from facet_index import FacetIndex  # noqa: WPS433
+    from graph_payload import decode_graph_columns, write_graph_payload  # noqa: WPS433
+    from graph_repair import neighbors_csr, refill_neighbors, remap_neighbors  # noqa: WPS433
+    from graph_tiles import GraphTileCache, build_tile_pyramid, load_tile_pyramid, node_importance, write_tile_pyramid  # noqa: WPS433
+    from index_snapshot import IndexSnapshot  # noqa: WPS433
+    from PIL import Image  # noqa: WPS433
+    from thumbnails import ThumbnailCache  # noqa: WPS433
+    from file_lock import file_lock  # noqa: WPS433
+    from keyword_index import KeywordIndex, load_keyword_index  # noqa: WPS433
+    from registry_store import RegistryStore  # noqa: WPS433
+    from score_fusion import keyword_boosts  # noqa: WPS433
+    from serving import StampWatcher, plan_workers, torch_threads  # noqa: WPS433
+    from vector_index import ExactIndex, Int8Codes, IVFIndex, recall_at_k  # noqa: WPS433
 
     fixture_graph = Path(__file__).resolve().parent / "fixtures" / "pipeline" / "graph_fixture.json"
+    fixture_batch = Path(__file__).resolve().parent / "fixtures" / "pipeline" / "batch_fixture.json"
     if not fixture_graph.exists():
         print("Missing backend graph fixture.")
         return 1
@@ -31,10 +49,11 @@ def main() -> int:
         graph_target.write_text(fixture_graph.read_text(encoding="utf-8"), encoding="utf-8")
 
         run_viz.VECTORS_DIR = tmp_vectors
-        run_viz.resources.embeddings = np.array([[0.1, 0.2, 0.3, 0.4]], dtype=np.float32)
+        run_viz.resources.publish(IndexSnapshot.build([], np.array([[0.1, 0.2, 0.3, 0.4]], dtype=np.float32)))
         run_viz.resources.model = object()
         run_viz.resources.processor = object()
-        run_viz.resources.search = lambda query: {  # type: ignore[assignment]
+        run_viz.resources.index_built = True
+        run_viz.resources.search = lambda query, **options: {  # type: ignore[assignment]
             "query": query,
             "expandedQuery": query,
             "results": [{"id": "fixture-001", "score": 0.9}],
@@ -50,6 +69,19 @@ def main() -> int:
         if "status" not in health_json or "items" not in health_json:
             print("/health JSON contract mismatch")
             return 1
+        if not {"ready", "registry_loaded", "model_loaded", "index_built", "graph_prep"}.issubset(health_json):
+            print("/health did not report readiness states")
+            return 1
+
+        staged = run_viz.BackendResources()
+        staged._load_registry = lambda: time.sleep(0.3)  # type: ignore[assignment]
+        staged._load_models = lambda: time.sleep(0.3)  # type: ignore[assignment]
+        started = time.perf_counter()
+        for loader in staged.start_loading():
+            loader.join()
+        if time.perf_counter() - started > 0.5 or staged.loading:
+            print("Registry and model loading did not run in parallel")
+            return 1
 
         search = client.get("/api/search?q=fixture")
         if search.status_code != 200:
@@ -60,6 +92,17 @@ def main() -> int:
             print("/api/search JSON contract mismatch")
             return 1
 
+        if client.get("/api/search?q=fixture&k=0").status_code != 400:
+            print("/api/search accepted k=0")
+            return 1
+
+        if client.post("/api/search/batch", json={"queries": []}).status_code != 400:
+            print("/api/search/batch accepted an empty query list")
+            return 1
+        if client.post("/api/search/batch", json={"queries": ["q"] * (run_viz.SEARCH_BATCH_MAX_QUERIES + 1)}).status_code != 400:
+            print("/api/search/batch accepted an oversized batch")
+            return 1
+
         graph = client.get("/vectors/graph_data.json")
         if graph.status_code != 200:
             print(f"/vectors/graph_data.json status {graph.status_code}")
@@ -69,6 +112,608 @@ def main() -> int:
             print("/vectors graph JSON contract mismatch")
             return 1
 
+        write_graph_payload(graph_json["nodes"], graph_json["meta"], tmp_vectors)
+        columns = client.get("/api/graph/columns")
+        if columns.status_code != 200:
+            print(f"/api/graph/columns status {columns.status_code}")
+            return 1
+        decoded = decode_graph_columns(columns.data)
+        if decoded["count"] != 2 or decoded["columns"]["neighbors"].tolist() != [1, 0]:
+            print("/api/graph/columns payload mismatch")
+            return 1
+        gz_columns = client.get("/api/graph/columns", headers={"Accept-Encoding": "gzip"})
+        etag = gz_columns.headers.get("ETag")
+        if gz_columns.headers.get("Content-Encoding") != "gzip" or not etag:
+            print("/api/graph/columns did not serve precompressed gzip with an ETag")
+            return 1
+        revalidated = client.get("/api/graph/columns", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+        if revalidated.status_code != 304:
+            print(f"/api/graph/columns revalidation status {revalidated.status_code}")
+            return 1
+        metadata = client.get("/api/graph/metadata")
+        if metadata.status_code != 200 or [m["id"] for m in metadata.get_json()] != ["fixture-001", "fixture-002"]:
+            print("/api/graph/metadata contract mismatch")
+            return 1
+
+        write_tile_pyramid(graph_json["nodes"], tmp_vectors)
+        tile = client.get("/api/graph/tiles/0/0/0")
+        tile_json = tile.get_json() or {}
+        if tile.status_code != 200 or len(tile_json.get("nodes", [])) != 2 or not tile.headers.get("ETag"):
+            print(f"/api/graph/tiles/0/0/0 status {tile.status_code} or contract mismatch")
+            return 1
+        tile_revalidated = client.get("/api/graph/tiles/0/0/0", headers={"If-None-Match": tile.headers["ETag"]})
+        if tile_revalidated.status_code != 304:
+            print(f"/api/graph/tiles revalidation status {tile_revalidated.status_code}")
+            return 1
+        if client.get("/api/graph/tiles/1/5/0").status_code != 404:
+            print("/api/graph/tiles did not reject an out-of-range tile")
+            return 1
+        started = time.perf_counter()
+        huge_z = [client.get(f"/api/graph/tiles/{z}/0/0").status_code for z in (7, 31, 10 ** 9)]
+        if (
+            huge_z != [404, 404, 404]
+            or time.perf_counter() - started > 1.0
+            or GraphTileCache().get_tile(tmp_vectors, 10 ** 9, 0, 0) is not None
+        ):
+            print(f"/api/graph/tiles did not reject an out-of-range zoom: {huge_z}")
+            return 1
+        if run_viz.graph_tile_cache.get_tile_with_etag(tmp_vectors, 0, 0, 0)[1] != tile.headers["ETag"].strip('"'):
+            print("Tile ETag was not built from the state that served the tile")
+            return 1
+        write_tile_pyramid(graph_json["nodes"][:1], tmp_vectors, incremental=False)
+        torn = client.get("/api/graph/tiles/0/0/0")
+        if torn.status_code != 200 or len(torn.get_json()["nodes"]) != 2 or GraphTileCache().get_tile(tmp_vectors, 0, 0, 0) is not None:
+            print("Tile cache paired graph_tiles.npz with a graph_columns.bin for other nodes")
+            return 1
+        write_tile_pyramid(graph_json["nodes"], tmp_vectors, incremental=False)
+
+        rng = np.random.default_rng(3)
+        tile_coords = rng.uniform(-1, 1, (300, 2))
+        tile_lists = [rng.choice(300, 5, replace=False).tolist() for _ in range(300)]
+        tile_nodes = [{"id": f"t{i}", "x": c[0], "y": c[1], "neighbors": lst} for i, (c, lst) in enumerate(zip(tile_coords.tolist(), tile_lists))]
+        tiles_dir = tmp_vectors / "tiles_incremental"
+        tiles_dir.mkdir()
+        write_tile_pyramid(tile_nodes, tiles_dir, 4, 2, incremental=False)
+        # Drop a few nodes, add one, and rewire some lists so kept nodes change in-degree.
+        tile_nodes = [node for i, node in enumerate(tile_nodes) if i % 37] + [{"id": "t-new", "x": 0.1, "y": 0.1, "neighbors": [0, 1]}]
+        for node in tile_nodes[::10]:
+            node["neighbors"] = rng.choice(len(tile_nodes), 5, replace=False).tolist()
+        # Re-placed nodes keep their ids but move to other tiles.
+        for node in tile_nodes[3::25]:
+            node["x"], node["y"] = -node["x"], -node["y"]
+        write_tile_pyramid(tile_nodes, tiles_dir, 4, 2, incremental=True)
+        incremental_levels = load_tile_pyramid(tiles_dir / "graph_tiles.npz")[0]
+        rebuilt_levels = build_tile_pyramid(
+            np.array([[n["x"], n["y"]] for n in tile_nodes]),
+            node_importance([n["neighbors"] for n in tile_nodes], len(tile_nodes)),
+            4,
+            2,
+        )
+        if any(not np.array_equal(a[0], b[0]) or not np.array_equal(a[1], b[1]) for a, b in zip(incremental_levels, rebuilt_levels)):
+            print("Incremental tile update drifted from a full rebuild")
+            return 1
+
+        tmp_img = tmp_vectors / "img"
+        tmp_img.mkdir()
+        Image.new("RGBA", (1024, 512), (200, 40, 40, 128)).save(tmp_img / "fixture-001.png")
+        run_viz.thumbnail_cache = ThumbnailCache(tmp_img, tmp_img / "thumb", max_bytes=1024 * 1024)
+        thumb = client.get("/img/thumb/256/fixture-001.png")
+        if thumb.status_code != 200 or thumb.mimetype != "image/webp":
+            print(f"/img/thumb/256 status {thumb.status_code} ({thumb.mimetype})")
+            return 1
+        with Image.open(tmp_img / "thumb" / "256" / "fixture-001.png.webp") as generated:
+            if generated.size != (256, 128) or generated.mode != "RGBA":
+                print(f"/img/thumb/256 produced {generated.size} {generated.mode}")
+                return 1
+        if client.get("/img/thumb/100/fixture-001.png").status_code != 404:
+            print("/img/thumb accepted an unconfigured size")
+            return 1
+        Image.new("RGB", (64, 64), (0, 0, 255)).save(tmp_img / "fixture-001.jpg")
+        if run_viz.thumbnail_cache.get(128, "fixture-001.jpg") == run_viz.thumbnail_cache.get(128, "fixture-001.png"):
+            print("Thumbnails of fixture-001.png and fixture-001.jpg share a variant file")
+            return 1
+        (tmp_img / "broken.png").write_bytes(b"\x89PNG\r\n\x1a\n not an image")
+        broken = client.get("/img/thumb/256/broken.png")
+        if broken.status_code != 200 or broken.data != (tmp_img / "broken.png").read_bytes():
+            print(f"Undecodable source did not fall back to the original: {broken.status_code}")
+            return 1
+        cache_get, evicted = run_viz.thumbnail_cache.get, []
+
+        def get_then_evict(size: int, filename: str):
+            path = cache_get(size, filename)
+            if path is not None and not evicted:
+                evicted.append(path)
+                path.unlink()
+            return path
+
+        run_viz.thumbnail_cache.get = get_then_evict  # type: ignore[assignment]
+        try:
+            raced = client.get("/img/thumb/256/fixture-001.png")
+        finally:
+            run_viz.thumbnail_cache.get = cache_get  # type: ignore[assignment]
+        if raced.status_code != 200 or raced.mimetype != "image/webp" or not evicted:
+            print(f"Thumbnail evicted before it was sent was not regenerated: {raced.status_code}")
+            return 1
+        if len(run_viz.thumbnail_cache.discard("fixture-001.png")) != 2:
+            print("Thumbnail variants were not discarded")
+            return 1
+
+        batch = json.loads(fixture_batch.read_text(encoding="utf-8"))
+        local = run_viz.BackendResources()
+        first = np.array([batch[0]["image_embedding"]], dtype=np.float32)
+        before = local.publish(IndexSnapshot.build([batch[0]], first, vector_index=ExactIndex(first)))
+        if not local.append_records([batch[1]]) or len(local.registry) != 2 or len(local.vector_index) != 2:
+            print("append_records did not extend registry, embeddings and index")
+            return 1
+        if (
+            len(before.registry) != 1
+            or len(before.vector_index) != 1
+            or before.keyword_index.count != 1
+            or before.facet_index.count != 1
+            or before.row_for_id(str(batch[1]["id"])) is not None
+        ):
+            print("append_records modified the snapshot it was built from")
+            return 1
+        if local.append_records([batch[1]]):
+            print("append_records accepted a duplicate record instead of requesting a reload")
+            return 1
+        if any("image_embedding" in rec or "text_embedding" in rec for rec in local.registry[1:]):
+            print("append_records kept embedding lists on the registry records")
+            return 1
+
+        streamed_store = RegistryStore(tmp_vectors / "streamed")
+        streamed_store.append_records(batch + [{"id": "broken", "name_of_file": "broken.png", "image_embedding": ["x"]}])
+        streamed_store.compact()
+        live_store, live_registry_path = run_viz.registry_store, run_viz.REGISTRY_PATH
+        run_viz.registry_store, run_viz.REGISTRY_PATH = streamed_store, streamed_store.base_path
+        try:
+            streamed = run_viz.BackendResources()
+            streamed._load_registry()
+        finally:
+            run_viz.registry_store, run_viz.REGISTRY_PATH = live_store, live_registry_path
+        if (
+            not streamed.index_built
+            or [rec["id"] for rec in streamed.registry] != [rec["id"] for rec in batch]
+            or any("image_embedding" in rec or "text_embedding" in rec for rec in streamed.registry)
+            or not isinstance(streamed.embeddings, np.memmap)
+            or not np.allclose(streamed.embeddings, dense_matrix(batch, "image_embedding"))
+            or streamed.text_embeddings is None
+            or not np.allclose(streamed.text_embeddings, dense_matrix(batch, "text_embedding"))
+        ):
+            print("Streamed registry load did not yield the fixture records and matrices")
+            return 1
+        if not isinstance(streamed.keyword_index._post_rows, np.memmap):
+            print("Keyword postings were not memory-mapped from the vectors directory")
+            return 1
+        mapped_keywords = load_keyword_index(streamed.registry, tmp_vectors)
+        if [a.tolist() for a in mapped_keywords.match("fixture-002 windows")] != [a.tolist() for a in KeywordIndex(streamed.registry).match("fixture-002 windows")]:
+            print("Memory-mapped keyword index disagrees with a freshly built one")
+            return 1
+        grown = mapped_keywords.copy()
+        grown.add(batch + [{"name_of_file": "new-token.png", "provider": "Fixtureprovider"}])
+        rebuilt = KeywordIndex(streamed.registry + batch + [{"name_of_file": "new-token.png", "provider": "Fixtureprovider"}])
+        if any(not np.array_equal(getattr(grown, name), getattr(rebuilt, name)) for name in ("_post_tokens", "_post_rows", "_offsets")):
+            print("Incremental keyword postings merge disagrees with a full rebuild")
+            return 1
+
+        reads: list[int] = []
+
+        def flaky_read_columns(*args, **kwargs):
+            reads.append(1)
+            if len(reads) == 1:
+                raise OSError("simulated registry read failure")
+            return RegistryStore.read_columns(streamed_store, *args, **kwargs)
+
+        streamed_store.read_columns = flaky_read_columns  # type: ignore[method-assign]
+        live_retry, run_viz.REGISTRY_RETRY_SECONDS = run_viz.REGISTRY_RETRY_SECONDS, 0.05
+        run_viz.registry_store, run_viz.REGISTRY_PATH = streamed_store, streamed_store.base_path
+        try:
+            published = streamed.snapshot
+            streamed._load_registry()
+            kept = streamed.snapshot is published and streamed.index_built and streamed.live_count == 2
+            streamed._reload_retry.join(timeout=10)
+            retried = len(reads) == 2 and streamed.snapshot is not published and streamed.index_built and streamed.live_count == 2
+        finally:
+            del streamed_store.read_columns
+            run_viz.REGISTRY_RETRY_SECONDS = live_retry
+            run_viz.registry_store, run_viz.REGISTRY_PATH = live_store, live_registry_path
+        if not (kept and retried):
+            print(f"Failed registry reload dropped the published library or was not retried: kept={kept} retried={retried}")
+            return 1
+
+        watcher = StampWatcher(streamed_store.read_stamp)
+        watcher.mark()
+        run_viz.registry_store, run_viz.REGISTRY_PATH = streamed_store, streamed_store.base_path
+        try:
+            peer = run_viz.BackendResources()
+            peer._load_registry()
+            streamed_store.append_deletions(["fixture-002.png"])
+            peer.sync_from_store()
+            synced = peer.live_count == 1 and len(peer.registry) == 2 and watcher.changed() and not watcher.changed()
+            streamed_store.compact()
+            peer.sync_from_store()
+            kept_after_compaction = peer.tombstoned == 1 and len(peer.registry) == 2
+            streamed_store.append_deletions(["fixture-001.png"])
+            streamed_store.compact()
+            peer.sync_from_store()
+            reloaded = len(peer.registry) == 0
+        finally:
+            run_viz.registry_store, run_viz.REGISTRY_PATH = live_store, live_registry_path
+        if not (synced and kept_after_compaction and reloaded):
+            print(f"Cross-process sync mismatch: synced={synced} compaction={kept_after_compaction} reload={reloaded}")
+            return 1
+        if plan_workers(0, cpu_count=8) != 8 or plan_workers(8, cpu_count=8, memory_budget_mb=4000, encoder_mb=1200) != 3 or torch_threads(3, cpu_count=8) != 2:
+            print("Serving worker plan mismatch")
+            return 1
+        from serve import choose_server  # noqa: WPS433
+
+        if choose_server("auto", "win32") != "waitress" or choose_server("auto", "linux") != "gunicorn":
+            print("Serving launcher picked the wrong server")
+            return 1
+        with file_lock(tmp_vectors / "smoke.lock"):
+            try:
+                with file_lock(tmp_vectors / "smoke.lock", timeout=0.1):
+                    print("file_lock was acquired twice")
+                    return 1
+            except TimeoutError:
+                pass
+            with file_lock(tmp_vectors / "smoke.lock", blocking=False) as acquired:
+                if acquired:
+                    print("Non-blocking file_lock acquired a held lock")
+                    return 1
+        import subprocess  # noqa: WPS433
+        import file_lock as file_lock_module  # noqa: WPS433
+
+        exited = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True, text=True, check=True)
+        lock_path = tmp_vectors / "owned.lock"
+        lock_path.write_text(f"{exited.stdout.strip()} {file_lock_module.HOST} dead", encoding="utf-8")
+        with file_lock(lock_path, timeout=2):
+            pass
+        lock_path.write_text(f"{os.getpid()} {file_lock_module.HOST} live", encoding="utf-8")
+        try:
+            with file_lock(lock_path, timeout=0.2):
+                print("file_lock broke a lock whose holder is alive")
+                return 1
+        except TimeoutError:
+            pass
+        os.utime(lock_path, (time.time() - 3600, time.time() - 3600))
+        with file_lock(lock_path, timeout=2, stale_seconds=60):
+            lock_path.unlink()
+            lock_path.write_text(f"{os.getpid()} {file_lock_module.HOST} successor", encoding="utf-8")
+        if not lock_path.exists() or "successor" not in lock_path.read_text(encoding="utf-8"):
+            print("file_lock did not break a lock without heartbeat, or released a lock it no longer held")
+            return 1
+        lock_path.unlink()
+
+        # Every path the delete route writes (images, registry segments, graph files) points into tmp_vectors
+        # until its background passes have finished.
+        live_globals = (run_viz.resources, run_viz.registry_store, run_viz.REGISTRY_PATH, run_viz.GRAPH_FILE, run_viz.DATA_DIR_ROOT)
+        run_viz.resources, run_viz.registry_store, run_viz.REGISTRY_PATH = streamed, streamed_store, streamed_store.base_path
+        run_viz.GRAPH_FILE, run_viz.DATA_DIR_ROOT = tmp_vectors / "streamed" / "graph_data.json", tmp_vectors
+        try:
+            batch_delete = client.post(
+                "/api/delete/batch",
+                json={"filenames": ["fixture-002.png", "../escape.png"], "ids": ["fixture-001", "missing-id"]},
+            ).get_json()
+            flushed = streamed.memory_compactor.flush(timeout=10) and run_viz.graph_compactor.flush(timeout=10)
+            if streamed_store._compact_thread is not None:
+                streamed_store._compact_thread.join(timeout=10)
+        finally:
+            run_viz.resources, run_viz.registry_store, run_viz.REGISTRY_PATH, run_viz.GRAPH_FILE, run_viz.DATA_DIR_ROOT = live_globals
+        if (
+            batch_delete["deleted"] != 2
+            or [r["success"] for r in batch_delete["results"]] != [True, False, True, False]
+            or batch_delete["results"][2]["filename"] != "fixture-001.png"
+            or not all(r["memory_updated"] for r in batch_delete["results"] if r["success"])
+            or streamed.live_count != 0
+            or not flushed
+            or streamed.memory_compactor.stats()["passes"] != 1
+            or len(streamed.registry) != 0
+            or (tmp_img / "fixture-001.png").exists()
+        ):
+            print(f"Batch delete mismatch: {batch_delete}")
+            return 1
+        if client.post("/api/delete/batch", json={}).status_code != 400:
+            print("/api/delete/batch accepted an empty request")
+            return 1
+        rows, counts = local.keyword_index.match("fixture-002 fixtureprovider")
+        if rows.tolist() != [0, 1] or counts.tolist() != [1, 2]:
+            print(f"Keyword index mismatch: rows={rows.tolist()} counts={counts.tolist()}")
+            return 1
+        query_emb = local.embeddings[1]
+        first = local.rank("windows", query_emb, k=1, fields=["final_category", "image_embedding"])
+        second = local.rank("windows", query_emb, k=1, offset=1)
+        if (
+            first["total"] != 2
+            or first["nextOffset"] != 1
+            or second["nextOffset"] is not None
+            or first["results"][0] != {"id": "fixture-002", "score": first["results"][0]["score"], "final_category": "Windows"}
+            or [r["id"] for r in local.rank("windows", query_emb)["results"]] != ["fixture-002", second["results"][0]["id"]]
+        ):
+            print(f"Search paging/projection mismatch: {first} / {second}")
+            return 1
+        doors = local.rank("windows", query_emb, filters={"final_category": ["Doors"]}, fields=["final_category"])
+        either = local.rank("windows", query_emb, filters={"final_category": ["Doors", "Windows"], "provider": ["FixtureProvider"]})
+        if (
+            doors["total"] != 1
+            or doors["results"][0]["final_category"] != "Doors"
+            or either["total"] != 2
+            or local.rank("windows", query_emb, filters={"final_category": ["Missing"]})["total"] != 0
+        ):
+            print(f"Facet filter pushdown mismatch: {doors} / {either}")
+            return 1
+        if local.rank("windows", query_emb, min_score=10.0)["total"] != 0:
+            print("min_score did not filter results")
+            return 1
+
+        rng = np.random.default_rng(0)
+        dense = rng.standard_normal((500, 32)).astype(np.float32)
+        dense /= np.linalg.norm(dense, axis=1, keepdims=True)
+        quantized = ExactIndex(dense, Int8Codes.encode(dense), rerank=50)
+        probes = dense[:20]
+        if recall_at_k(quantized, probes, 10) != 1.0 or quantized.codes.nbytes * 3 > dense.nbytes:
+            print("int8 scan + float32 re-rank lost exact top-10 results or did not shrink the matrix")
+            return 1
+        quantized.remove(0, np.delete(dense, 0, axis=0))
+        if len(quantized.codes) != 499:
+            print("int8 codes were not updated on delete")
+            return 1
+
+        calls = []
+        release = threading.Event()
+        stored = threading.Event()
+
+        def slow_expand() -> str:
+            calls.append(1)
+            release.wait(10)
+            return "expanded door"
+
+        cache_path = tmp_vectors / "expansions.json"
+        cache = ExpansionCache(cache_path, max_entries=2, budget_seconds=0.05, save_delay_ms=20)
+        cache_put = cache.put
+        cache.put = lambda key, value: (cache_put(key, value), stored.set())  # type: ignore[assignment]
+        outcomes = []
+        waiters = [threading.Thread(target=lambda: outcomes.append(cache.get_or_compute("door", "door", slow_expand))) for _ in range(3)]
+        for waiter in waiters:
+            waiter.start()
+        for waiter in waiters:
+            waiter.join()
+        release.set()
+        if not stored.wait(10) or not cache.flush(10):
+            print("Expansion finished after the budget was never stored")
+            return 1
+        if len(calls) != 1 or outcomes != [("door", "timeout")] * 3 or cache.stats()["coalesced"] != 2:
+            print(f"Expansion single-flight/budget mismatch: calls={len(calls)} outcomes={outcomes}")
+            return 1
+        forwards = []
+        local.expand_query = lambda query: query  # type: ignore[assignment]
+        local.encode_queries = lambda pairs: forwards.append(len(pairs)) or np.stack([query_emb] * len(pairs))  # type: ignore[assignment]
+        local.search_batcher.window_seconds = 0.05
+        concurrent = []
+        searchers = [threading.Thread(target=lambda q=q: concurrent.append(local.search(q, k=1))) for q in ("alpha", "beta", "gamma", "delta")]
+        for searcher in searchers:
+            searcher.start()
+        for searcher in searchers:
+            searcher.join()
+        if len(concurrent) != 4 or sum(forwards) != 4 or len(forwards) >= 4:
+            print(f"Concurrent searches were not micro-batched: forwards={forwards}")
+            return 1
+
+        reloaded = ExpansionCache(cache_path, max_entries=2)
+        if reloaded.get_or_compute("door", "door", slow_expand) != ("expanded door", "hit") or len(calls) != 1:
+            print("Expansion cache was not persisted across instances")
+            return 1
+        burst = ExpansionCache(tmp_vectors / "expansions-burst.json", max_entries=8, save_delay_ms=200)
+        for i in range(6):
+            burst.put(f"q{i}", f"expanded q{i}")
+        burst.put("q0", "expanded q0 again")
+        saved = json.loads((tmp_vectors / "expansions-burst.json").read_text(encoding="utf-8")) if burst.flush(10) else {}
+        if burst.stats()["writes"] >= 7 or len(saved) != 6 or saved.get("q0", [None])[0] != "expanded q0 again":
+            print(f"Expansion cache writes were not debounced into the latest copy: writes={burst.stats()['writes']} saved={saved}")
+            return 1
+        if "hits" not in (client.get("/api/stats").get_json() or {}).get("expansionCache", {}):
+            print("/api/stats did not report expansion cache counters")
+            return 1
+
+        encoded = []
+        local.expand_query = lambda query: query  # type: ignore[assignment]
+        local.encode_queries = lambda pairs: encoded.extend(q for q, _ in pairs) or np.stack([query_emb] * len(pairs))  # type: ignore[assignment]
+        cold = local.search("windows", k=2)
+        warm = local.search("windows", k=2)
+        if encoded != ["windows"] or warm != cold or local.search_cache.results.hits != 1:
+            print(f"Search cache did not serve the repeated query: encoded={encoded}")
+            return 1
+        batch_results = local.search_batch(["windows", "doors", "fixtureprovider", "windows"], k=2)
+        if list(batch_results) != ["windows", "doors", "fixtureprovider"] or encoded != ["windows", "doors", "fixtureprovider"]:
+            print(f"Batch search did not dedupe queries / reuse cached embeddings: encoded={encoded}")
+            return 1
+        if any(batch_results[q]["results"] != local.rank(q, query_emb, k=2)["results"] for q in ("doors", "fixtureprovider")):
+            print("Batch GEMM scoring disagrees with single-query ranking")
+            return 1
+        if local.search("windows", k=2, fusion="weighted")["fusion"] != "image":
+            print("Hybrid fusion was used without caption vectors or a text encoder")
+            return 1
+        local.publish(local.snapshot.replace(text_embeddings=dense_matrix(batch, "text_embedding")))
+        local.text_model = object()
+        local.encode_text_queries = lambda pairs: np.stack([local.text_embeddings[0]] * len(pairs))  # type: ignore[assignment]
+        weighted = local.search("lintel", k=2, fusion="weighted")
+        rrf = local.search("lintel", k=2, fusion="rrf")
+        image_only = local.search("lintel", k=2, fusion="image")
+        if (
+            weighted["fusion"] != "weighted"
+            or rrf["fusion"] != "rrf"
+            or weighted["results"][0]["score"] == image_only["results"][0]["score"]
+            or not all(r["score"] < 0.1 for r in rrf["results"])
+        ):
+            print(f"Hybrid fusion mismatch: weighted={weighted} rrf={rrf}")
+            return 1
+        rrf_keyword = local.search("windows", k=2, fusion="rrf")
+        rrf_cap = 3.0 / (run_viz.FUSION_RRF_K + 1)
+        if (
+            not keyword_boosts(np.array([2, 1, 2]), "rrf", 60).tolist() == np.float32([1 / 61, 1 / 63, 1 / 61]).tolist()
+            or not rrf_keyword["results"]
+            or not all(r["score"] <= rrf_cap + 1e-6 for r in rrf_keyword["results"])
+        ):
+            print(f"Keyword boost left the RRF score range: {rrf_keyword}")
+            return 1
+        if client.get("/api/search?q=fixture&fusion=bogus").status_code != 400:
+            print("/api/search accepted an unknown fusion mode")
+            return 1
+
+        mapped = load_embedding_matrix(stack_vectors(batch, "text_embedding"), "text_embedding", ["a", "b"], tmp_vectors)
+        stamp = (tmp_vectors / "search_text_matrix.npy").stat().st_mtime_ns
+        remapped = load_embedding_matrix(stack_vectors(batch, "text_embedding"), "text_embedding", ["a", "b"], tmp_vectors)
+        if (
+            not isinstance(remapped, np.memmap)
+            or (tmp_vectors / "search_text_matrix.npy").stat().st_mtime_ns != stamp
+            or not np.allclose(mapped, local.text_embeddings)
+            or len(load_embedding_matrix(stack_vectors(batch[:1], "text_embedding"), "text_embedding", ["a"], tmp_vectors)) != 1
+        ):
+            print("Embedding matrix was not memory-mapped, reused, or rebuilt on change")
+            return 1
+
+        via_index = local.similar("fixture-002", k=1)
+        via_neighbors = local.similar("fixture-002", k=1, neighbor_ids=["fixture-001"])
+        if (
+            via_index["source"] != "index"
+            or via_neighbors["source"] != "neighbors"
+            or [r["id"] for r in via_index["results"]] != ["fixture-001"]
+            or via_neighbors["results"] != via_index["results"]
+            or local.similar("missing-id") is not None
+        ):
+            print(f"Similar-by-id mismatch: {via_index} / {via_neighbors}")
+            return 1
+        paged = run_viz.BackendResources()
+        paged_embs = np.random.default_rng(3).normal(size=(6, 8)).astype(np.float32)
+        paged_embs /= np.linalg.norm(paged_embs, axis=1, keepdims=True)
+        paged.publish(IndexSnapshot.build([{"id": f"p{i}", "name_of_file": f"p{i}.png"} for i in range(6)], paged_embs, vector_index=ExactIndex(paged_embs)))
+        full_order = [r["id"] for r in paged.similar("p0", k=5)["results"]]
+        first_page = paged.similar("p0", k=2, neighbor_ids=full_order[:3])
+        second_page = paged.similar("p0", k=2, offset=first_page["nextOffset"] or 0, neighbor_ids=full_order[:3])
+        if (
+            first_page["source"] != "neighbors"
+            or second_page["source"] != "index"
+            or {first_page["total"], second_page["total"]} != {5}
+            or [r["id"] for r in first_page["results"] + second_page["results"]] != full_order[:4]
+        ):
+            print(f"Similar paging changed meaning between sources: {first_page} / {second_page}")
+            return 1
+        int8 = run_viz.BackendResources()
+        int8_embs = np.random.default_rng(4).normal(size=(300, 32)).astype(np.float32)
+        int8_embs /= np.linalg.norm(int8_embs, axis=1, keepdims=True)
+        int8_index = ExactIndex(int8_embs, Int8Codes.encode(int8_embs), rerank=5)
+        int8.publish(IndexSnapshot.build([{"id": f"q{i}", "name_of_file": f"q{i}.png"} for i in range(300)], int8_embs, vector_index=int8_index))
+        exact_scores = int8_embs @ int8_embs[0]
+        exact_order = [f"q{i}" for i in np.argsort(-exact_scores, kind="stable")]
+        threshold = float(np.sort(exact_scores)[-12])
+        deep_page = int8.rank("", int8_embs[0], k=10, offset=10)
+        above = int8.rank("", int8_embs[0], k=20, min_score=threshold)
+        similar_page = int8.similar("q0", k=10, offset=10)
+        pages = (deep_page, above, similar_page)
+        if (
+            [r["id"] for r in deep_page["results"]] != exact_order[10:20]
+            or [r["id"] for r in similar_page["results"]] != exact_order[11:21]
+            or any(r["score"] != round(float(exact_scores[int(r["id"][1:])]), 4) for page in pages for r in page["results"])
+            or [r["id"] for r in above["results"]] != exact_order[:12]
+            or above["total"] != 12
+            or deep_page["total"] != 20
+        ):
+            print(f"int8 search paged or filtered on approximate scores: {deep_page} / {above} / {similar_page}")
+            return 1
+        if client.get("/api/similar/missing-id").status_code != 404:
+            print("/api/similar did not 404 on an unknown id")
+            return 1
+        if client.post("/api/search/image", data={}).status_code != 400:
+            print("/api/search/image accepted a request without an image")
+            return 1
+        encoded_before_delete = list(encoded)
+        generation = local.generation
+        before = local.snapshot
+
+        local.remove_from_memory("fixture-001.png")
+        if (
+            local.generation != generation + 1
+            or len(local.search("windows", k=2)["results"]) != 1
+            or encoded != encoded_before_delete
+            or local.similar("fixture-001") is not None
+        ):
+            print("Delete did not tombstone the row, invalidate cached results (or re-encoded a cached query embedding)")
+            return 1
+        if not local.memory_compactor.flush(timeout=10) or local.memory_compactor.stats()["passes"] != 1 or local.tombstoned or len(local.registry) != 1:
+            print("Background memory compaction did not drop the tombstoned row")
+            return 1
+        if local.text_embeddings is None or len(local.text_embeddings) != 1:
+            print("Caption vectors were not kept aligned on delete")
+            return 1
+        if local.facet_index.rows_for({"final_category": ["Windows"]}).tolist() != [0]:
+            print("Facet index was not updated on delete")
+            return 1
+        bare = FacetIndex([{"id": "bare"}, {"id": "lod-300", "lod": 300, "provider": "Acme"}])
+        if (
+            bare.rows_for({"final_category": ["Uncategorized"], "family_name": ["Generic Family"]}).tolist() != [0, 1]
+            or bare.rows_for({"provider": ["Unknown"]}).tolist() != [0]
+            or bare.rows_for({"lod_label": ["Unknown"]}).tolist() != [0]
+            or bare.rows_for({"lod_label": ["Medium-High"]}).tolist() != [1]
+        ):
+            print("Facet filters on displayed defaults (Uncategorized, Unknown, Generic Family, derived LOD) did not match")
+            return 1
+        if local.keyword_index.match("fixture-002")[0].tolist() != [0]:
+            print("Keyword index was not updated on delete")
+            return 1
+        if local.row_for_id("fixture-002") != 0 or [r["id"] for r in local.search("windows", k=2)["results"]] != ["fixture-002"]:
+            print("Row maps or search results are wrong after compaction")
+            return 1
+        if (
+            not before.alive.all()
+            or len(before.registry) != 2
+            or len(before.embeddings) != 2
+            or len(before.vector_index) != 2
+            or before.row_for_id("fixture-001") != 0
+            or before.keyword_index.match("fixture-002")[0].tolist() != [1]
+            or before.facet_index.rows_for({"final_category": ["Windows"]}).tolist() != [1]
+        ):
+            print("Tombstone or compaction modified a snapshot a search could still be reading")
+            return 1
+
+        ivf = IVFIndex.build(dense, nlist=8, nprobe=8)
+        ivf.remove(np.array([0, 5, 7]), np.delete(dense, [0, 5, 7], axis=0))
+        if sorted(ivf.list_rows.tolist()) != list(range(497)) or ivf.list_offsets[-1] != 497 or recall_at_k(ivf, dense[8:20], 10) != 1.0:
+            print("IVF index did not drop and renumber several rows in one pass")
+            return 1
+
+        knn = np.argsort(-(dense @ dense.T), axis=1)[:, 1:11]
+        graph_nodes = [{"neighbors": row.tolist() + [row[0].item(), "x"]} for row in knn]
+        kept = np.setdiff1d(np.arange(len(dense)), np.arange(0, len(dense), 5))
+        offsets, flat = remap_neighbors(*neighbors_csr(graph_nodes), kept)
+        new_index = {old: new for new, old in enumerate(kept.tolist())}
+        expected = [[new_index[v] for v in knn[old].tolist() if v in new_index] for old in kept.tolist()]
+        if [flat[offsets[i]:offsets[i + 1]].tolist() for i in range(len(kept))] != expected:
+            print("Vectorized neighbor remap disagrees with the per-node remap")
+            return 1
+        lost = np.flatnonzero(np.diff(offsets) < 10)
+        (offsets, flat), refilled = refill_neighbors(offsets, flat, lost, kept, dense, 10)
+        kept_dense = dense[kept]
+        exact = np.argsort(-(kept_dense @ kept_dense.T), axis=1)[:, 1:11]
+        if refilled != len(lost) or any(flat[offsets[i]:offsets[i + 1]].tolist() != exact[i].tolist() for i in lost.tolist()):
+            print("Neighbor refill did not match the exact top-k of the surviving nodes")
+            return 1
+        if any(flat[offsets[i]:offsets[i + 1]].tolist() != expected[i] for i in np.setdiff1d(np.arange(len(kept)), lost).tolist()):
+            print("Neighbor refill touched lists that lost nothing")
+            return 1
+
+        live_graph_file = run_viz.GRAPH_FILE
+        run_viz.GRAPH_FILE = graph_target
+        try:
+            nodes_before = len(json.loads(graph_target.read_text(encoding="utf-8"))["nodes"])
+            deleted = [node["img"].rsplit("/", 1)[1] for node in json.loads(graph_target.read_text(encoding="utf-8"))["nodes"][:1]]
+            run_viz.graph_compactor.submit(deleted + deleted)
+            run_viz.graph_compactor.flush(timeout=10)
+            if len(json.loads(graph_target.read_text(encoding="utf-8"))["nodes"]) != nodes_before - 1:
+                print("Background graph compaction did not drop the deleted node")
+                return 1
+        finally:
+            run_viz.GRAPH_FILE = live_graph_file
+
     finally:
         shutil.rmtree(tmp_vectors, ignore_errors=True)
 
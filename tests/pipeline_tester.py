@@ -5,8 +5,10 @@ import json
 import shutil
 import subprocess
 import sys
+import threading
 from pathlib import Path
 
+import numpy as np
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
 FIXTURE_DIR = REPO_ROOT / "tests" / "fixtures" / "pipeline"
@@ -14,7 +16,15 @@ STEP09_PATH = REPO_ROOT / "01_backend" / "img_pipeline" / "Step09_DataTools.py"
 LOCAL_TMP_ROOT = REPO_ROOT / "tests" / ".tmp"
 
 sys.path.insert(0, str(REPO_ROOT / "01_backend"))
-from schemas import validate_graph_data, validate_registry_records  # noqa: E402
+sys.path.insert(0, str(REPO_ROOT / "01_backend" / "img_pipeline"))
+sys.path.insert(0, str(REPO_ROOT / "scripts"))
+import file_lock as file_lock_module  # noqa: E402
+from file_lock import file_lock  # noqa: E402
+from registry_reader import iter_json_array  # noqa: E402
+from registry_store import RegistryStore  # noqa: E402
+from schemas import valid_rows, validate_graph_data, validate_registry_records  # noqa: E402
+from hybrid_eval import sample_judgments  # noqa: E402
+from Step08_OutputUtils import create_image_record  # noqa: E402
 
 
 def run_pipeline_contract_harness() -> int:
@@ -43,12 +53,49 @@ def run_pipeline_contract_harness() -> int:
             print(proc.stderr)
             return 1
 
+        store = RegistryStore(vectors_dir)
+        if len(store.list_segments()) != 1:
+            print("Step09 consolidate did not append exactly one registry segment.")
+            return 1
+        if len(store.read_records()) != 2:
+            print("Registry store merged view does not expose the consolidated records.")
+            return 1
+
+        cmd = [sys.executable, str(STEP09_PATH), "--root", str(temp_root), "--compact"]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print("Step09 compact failed:")
+            print(proc.stdout)
+            print(proc.stderr)
+            return 1
+
         master_path = vectors_dir / "master_registry.json"
         if not master_path.exists():
             print("master_registry.json was not generated.")
             return 1
+        if store.list_segments():
+            print("Compaction left folded registry segments behind.")
+            return 1
 
         merged = json.loads(master_path.read_text(encoding="utf-8"))
+        for chunk_chars in (7, 64, 1 << 20):
+            if list(iter_json_array(master_path, chunk_chars)) != merged:
+                print(f"Streaming registry reader (chunk={chunk_chars}) disagrees with json.load.")
+                return 1
+        projected = store.read_records(fields=["final_category"])
+        if any(set(rec) - {"final_category", "id", "name_of_file", "original_path", "filename"} for rec in projected):
+            print("Registry field selection kept unrequested fields.")
+            return 1
+        column_records, matrices = store.read_columns(("image_embedding", "text_embedding"))
+        expected = np.array([rec["image_embedding"] for rec in merged], dtype=np.float32)
+        if (
+            any("image_embedding" in rec or "text_embedding" in rec for rec in column_records)
+            or [rec["id"] for rec in column_records] != [rec["id"] for rec in merged]
+            or not np.array_equal(matrices["image_embedding"], expected)
+            or matrices["text_embedding"].shape[0] != len(merged)
+        ):
+            print("Registry columns do not match the per-record embedding lists.")
+            return 1
         valid_records, skipped = validate_registry_records(merged)
         if skipped != 0:
             print(f"Expected all fixture records valid; skipped={skipped}")
@@ -56,9 +103,113 @@ def run_pipeline_contract_harness() -> int:
         if len(valid_records) != 2:
             print(f"Expected 2 records after consolidation, found {len(valid_records)}")
             return 1
+        strict_records, strict_skipped = validate_registry_records(merged, strict=True)
+        if strict_skipped != 0 or [r["id"] for r in strict_records] != [r["id"] for r in valid_records]:
+            print("Fast and strict registry validation disagree on the fixture records.")
+            return 1
+        malformed = [
+            {"id": "", "image_embedding": [0.1]},
+            {"id": "no-embedding", "image_embedding": []},
+            {"id": "text-embedding", "image_embedding": ["a"]},
+            {"id": "bad-category", "image_embedding": [0.1], "final_category": 3},
+        ]
+        for strict in (False, True):
+            if validate_registry_records(malformed + merged, strict=strict)[1] != len(malformed):
+                print(f"Registry validation (strict={strict}) did not skip malformed records.")
+                return 1
+        stacked = np.array([[0.1, 0.2], [np.nan, 0.2], [0.0, 0.0]], dtype=np.float32)
+        if valid_rows(stacked).tolist() != [True, False, False]:
+            print("Vectorized embedding check did not flag non-finite / empty rows.")
+            return 1
+
+        store.append_deletions(["fixture-001.png"])
+        remaining = store.read_records()
+        if [rec.get("id") for rec in remaining] != ["fixture-002"]:
+            print("Registry tombstone was not applied in the merged view.")
+            return 1
+        store.compact()
+        compacted = json.loads(master_path.read_text(encoding="utf-8"))
+        if len(compacted) != 1 or store.list_segments():
+            print("Compaction did not drop the tombstoned record.")
+            return 1
+
+        stray = temp_root / "fixture-003.json"
+        stray.write_text(json.dumps({"id": "fixture-003", "name_of_file": "fixture-003.png", "image_embedding": [0.1]}), encoding="utf-8")
+        for _ in range(2):
+            proc = subprocess.run([sys.executable, str(STEP09_PATH), "--root", str(temp_root), "--consolidate"], capture_output=True, text=True)
+            if proc.returncode != 0:
+                print(f"Step09 consolidate of a stray JSON failed: {proc.stderr}")
+                return 1
+            store.append_deletions(["fixture-003.png"])
+        puts = [seg for seg in store.list_segments() if store.read_segment_records(seg)]
+        if stray.exists() or len(puts) != 1 or [rec.get("id") for rec in store.read_records()] != ["fixture-002"]:
+            print("Stray JSON was not consolidated exactly once.")
+            return 1
+        store.compact()
+
+        racing_store = RegistryStore(temp_root / "racing")
+        stop = threading.Event()
+
+        def append_and_compact() -> None:
+            i = 0
+            while not stop.is_set():
+                racing_store.append_records([{"id": f"race-{i}", "name_of_file": f"race-{i}.png", "image_embedding": [0.1, 0.2]}])
+                racing_store.compact()
+                i += 1
+
+        writer = threading.Thread(target=append_and_compact, daemon=True)
+        writer.start()
+        counts, race_errors = [], []
+        try:
+            for _ in range(400):
+                try:
+                    records, matrices = racing_store.read_columns(["image_embedding"])
+                except FileNotFoundError as exc:
+                    race_errors.append(exc)
+                    continue
+                counts.append(len(records))
+                if matrices["image_embedding"].shape[0] != len(records):
+                    race_errors.append(ValueError("matrix rows do not match records"))
+        finally:
+            stop.set()
+            writer.join(timeout=10)
+        if race_errors or any(a > b for a, b in zip(counts, counts[1:])):
+            print(f"Registry reads racing compaction failed: errors={race_errors[:2]}")
+            return 1
+
+        # A live compaction keeps its lock; one left by a crashed process is taken over right away.
+        compact_lock = racing_store.segments_dir / ".compact.lock"
+        racing_store.append_records([{"id": "held", "name_of_file": "held.png", "image_embedding": [0.3, 0.4]}])
+        with file_lock(compact_lock):
+            if racing_store.compact() is not None or not racing_store.list_segments():
+                print("Compaction ran while another process held the compaction lock.")
+                return 1
+        crashed = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True, text=True, check=True)
+        compact_lock.write_text(f"{crashed.stdout.strip()} {file_lock_module.HOST} crashed", encoding="utf-8")
+        if racing_store.compact() is None or racing_store.list_segments() or compact_lock.exists():
+            print("Compaction did not take over the lock of a crashed process.")
+            return 1
+
+        captioned = create_image_record(
+            temp_root / "raw" / "window.png",
+            temp_root / "out" / "window.png",
+            "Double hung timber window with a stone lintel",
+            {"category": "Windows"},
+            text_embedding=[0.1, 0.2, 0.3],
+        )
+        eval_store = RegistryStore(temp_root / "hybrid_eval")
+        eval_store.append_records([captioned])
+        judgments = sample_judgments(eval_store.vectors_dir, count=5, words=3, seed=0)
+        if judgments != [{"query": "Double hung timber", "relevant": [captioned["id"]]}]:
+            print(f"hybrid_eval did not sample judgments from pipeline records: {judgments}")
+            return 1
 
         graph_payload = json.loads(graph_fixture.read_text(encoding="utf-8"))
         graph_validated, graph_skipped = validate_graph_data(graph_payload)
+        strict_graph, strict_graph_skipped = validate_graph_data(graph_payload, strict=True)
+        if strict_graph_skipped != graph_skipped or len(strict_graph["nodes"]) != len(graph_validated["nodes"]):
+            print("Fast and strict graph validation disagree on the fixture graph.")
+            return 1
         if graph_skipped != 0:
             print(f"Expected graph fixture to be fully valid; skipped={graph_skipped}")
             return 1
@@ -0,0 +1,19 @@
+"""
+Multi-process WSGI entry point for the backend API (Linux/macOS).
+
+Run: python serve.py (or gunicorn -c gunicorn.conf.py wsgi:app). gunicorn does
+not run on Windows, where serve.py serves run_viz.app from one waitress process.
+
+Each worker imports this module after the fork, loads its own registry and
+query encoder, and memory-maps the search matrices and keyword postings that
+every worker shares. `python run_viz.py` remains the development launcher
+(single process + Vite).
+"""
+from __future__ import annotations
+
+import os
+
+import run_viz
+
+run_viz.serve_worker(int(os.getenv("LOD_SERVING_WORKERS", "1")))
+app = run_viz.app